@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+from config import CASCADE_PATH, BENCHMARK_BASELINE_PATH, BENCHMARK_TOLERANCE
+from face_preprocessing import preprocess_face
+from face_analysis import get_pred_label, draw_label
+from profile_allocations import FullFrameDetector, synthetic_faces
+
+IMAGE_SIZES = [(320, 240), (640, 480), (1280, 720)]
+FACE_SIZES = [96, 160, 227]
+FACE_COUNTS = [1, 4]
+SAMPLE_RESULT = [{
+    'age': 31.4,
+    'gender': {'Woman': 12.5, 'Man': 87.5},
+    'dominant_emotion': 'happy',
+    'dominant_race': 'white',
+}]
+LABEL = get_pred_label(SAMPLE_RESULT)
+
+def time_stage(fn, repeats, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+def load_faces(image_dir, size):
+    faces = []
+    for name in sorted(os.listdir(image_dir)):
+        img = cv2.imread(os.path.join(image_dir, name))
+        if img is not None:
+            faces.append(cv2.resize(img, (size, size)))
+    return faces
+
+def tile_frame(faces, width, height):
+    # Lay the face crops out on a grey frame so detection cost scales with the face count
+    frame = np.full((height, width, 3), 127, dtype=np.uint8)
+    x = y = 0
+    for face in faces:
+        h, w = face.shape[:2]
+        if x + w > width:
+            x, y = 0, y + h
+        if y + h > height:
+            break
+        frame[y:y+h, x:x+w] = face
+        x += w
+    return frame
+
+def run_benchmarks(image_dir=None, repeats=20):
+    face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    results = {}
+
+    for width, height in IMAGE_SIZES:
+        for count in FACE_COUNTS:
+            faces = load_faces(image_dir, 96) if image_dir else synthetic_faces(count, 96)
+            frame = tile_frame(faces[:count], width, height)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            results[f"haar_detect[{width}x{height},{count}f]"] = time_stage(
+                lambda: face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4), repeats)
+
+    for size in FACE_SIZES:
+        faces = load_faces(image_dir, size) if image_dir else synthetic_faces(max(FACE_COUNTS), size)
+        for count in FACE_COUNTS:
+            batch = faces[:count]
+            # Real images go through the cascade as in the app; synthetic crops are the face
+            detector = face_cascade if image_dir else FullFrameDetector()
+            results[f"preprocess_face[{size}px,{count}f]"] = time_stage(
+                lambda: [preprocess_face(face, i+1, detector, show_visualizations=False)
+                         for i, face in enumerate(batch)], repeats)
+
+    face = synthetic_faces(1, 227)[0]
+    results["draw_label[227px]"] = time_stage(lambda: draw_label(face, LABEL), repeats * 5)
+    results["get_pred_label"] = time_stage(lambda: get_pred_label(SAMPLE_RESULT), repeats * 5)
+    return results
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'stage':<34} {'ms':>9} {'baseline':>9} {'change':>8}")
+    for stage, ms in results.items():
+        base = baseline.get(stage)
+        if base is None:
+            print(f"{stage:<34} {ms:9.3f} {'-':>9} {'new':>8}")
+            continue
+        change = ms / base - 1 if base > 0 else 0.0
+        flag = " REGRESSION" if change > tolerance else ""
+        print(f"{stage:<34} {ms:9.3f} {base:9.3f} {change:+7.1%}{flag}")
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Time FaceAnalyzer stages and compare against stored baselines")
+    parser.add_argument('--images', help='Directory of face images to use instead of synthetic crops')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=BENCHMARK_TOLERANCE,
+                        help='Allowed slowdown as a fraction of the baseline (default: %(default)s)')
+    parser.add_argument('--repeats', type=int, default=20, help='Timed repetitions per stage')
+    parser.add_argument('--update-baseline', action='store_true', help='Overwrite the baseline with this run')
+    args = parser.parse_args()
+
+    # Keep timings single-threaded-stable between runs
+    cv2.setNumThreads(1)
+    results = run_benchmarks(args.images, args.repeats)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        compare(results, {}, args.tolerance)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}.")
+        sys.exit(1)
+    print("No regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import USE_BUFFER_POOL, BUFFER_POOL_SIZE
+
+# Reusable NumPy buffers keyed by (name, shape, dtype) for OpenCV dst= arguments.
+# Only intermediates that do not outlive the call may use them; anything returned
+# to the caller is still freshly allocated. When disabled, get() returns None so
+# OpenCV allocates its own output as before. Buffers are private to the calling
+# thread, so capture and inference threads never share scratch memory.
+class BufferPool:
+    def __init__(self, max_buffers=BUFFER_POOL_SIZE, enabled=USE_BUFFER_POOL):
+        self.max_buffers = max_buffers
+        self.enabled = enabled
+        self._buffers = OrderedDict()
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        if not self.enabled:
+            return None
+        key = (threading.get_ident(), name, tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            buf = self._buffers.get(key)
+            if buf is None:
+                buf = np.empty(shape, dtype)
+                self.allocations += 1
+                self._buffers[key] = buf
+                # Face sizes vary from frame to frame, so evict least recently used shapes
+                if len(self._buffers) > self.max_buffers:
+                    self._buffers.popitem(last=False)
+            else:
+                self._buffers.move_to_end(key)
+                self.reuses += 1
+        return buf
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+            self.allocations = 0
+            self.reuses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'buffers': len(self._buffers),
+                'bytes': sum(buf.nbytes for buf in self._buffers.values()),
+                'allocations': self.allocations,
+                'reuses': self.reuses,
+            }
+
+frame_buffers = BufferPool()
+# Used where results must stay valid after the call (e.g. matplotlib keeps references)
+no_buffers = BufferPool(enabled=False)
@@ -0,0 +1,115 @@
+import os
+import csv
+import time
+import argparse
+import cv2
+import numpy as np
+from PIL import Image
+from config import TEMP_DIR, DEEPFACE_ACTIONS, ONNX_MODEL_DIR
+from image_utils import setup_temp_dir, cleanup_temp_dir
+import onnx_backend
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def load_eval_set(eval_dir):
+    faces = []
+    for name in sorted(os.listdir(eval_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        img = cv2.imread(os.path.join(eval_dir, name))
+        if img is None:
+            print(f"Skipping unreadable image: {name}")
+            continue
+        # Same 227x227 RGB crop the pipeline hands to the models
+        faces.append((name, cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), (227, 227))))
+    return faces
+
+def load_labels(labels_path):
+    # CSV with columns: filename, age, gender, emotion, race (blank cells are ignored)
+    labels = {}
+    with open(labels_path, newline='') as f:
+        for row in csv.DictReader(f):
+            labels[row['filename']] = row
+    return labels
+
+def run_deepface(face):
+    from deepface import DeepFace
+    path = os.path.join(TEMP_DIR, "eval_face.jpg")
+    Image.fromarray(face).save(path)
+    try:
+        return DeepFace.analyze(img_path=path, actions=DEEPFACE_ACTIONS, enforce_detection=False)
+    finally:
+        os.remove(path)
+
+def summarize(result):
+    gender_probs = result[0]['gender']
+    return {
+        'age': float(result[0]['age']),
+        'gender': max(gender_probs, key=gender_probs.get),
+        'emotion': result[0]['dominant_emotion'],
+        'race': result[0]['dominant_race'],
+    }
+
+def evaluate(backend_fn, faces, warmup=1):
+    for _, face in faces[:warmup]:
+        backend_fn(face)
+    predictions = {}
+    latencies = []
+    for name, face in faces:
+        start = time.perf_counter()
+        result = backend_fn(face)
+        latencies.append((time.perf_counter() - start) * 1000)
+        predictions[name] = summarize(result)
+    return predictions, np.array(latencies)
+
+def score(predictions, reference):
+    # Reference is either ground-truth labels or the DeepFace predictions
+    age_errors, hits = [], {'gender': [], 'emotion': [], 'race': []}
+    for name, pred in predictions.items():
+        ref = reference.get(name)
+        if not ref:
+            continue
+        if ref.get('age') not in (None, ''):
+            age_errors.append(abs(pred['age'] - float(ref['age'])))
+        for attr in hits:
+            if ref.get(attr) not in (None, ''):
+                hits[attr].append(pred[attr].lower() == str(ref[attr]).lower())
+    row = {'age_mae': np.mean(age_errors) if age_errors else float('nan')}
+    for attr, values in hits.items():
+        row[f'{attr}_acc'] = np.mean(values) if values else float('nan')
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare DeepFace and ONNX backends on a local evaluation set")
+    parser.add_argument('eval_dir', help='Directory of face images')
+    parser.add_argument('--labels', help='Optional CSV of ground-truth labels (filename,age,gender,emotion,race)')
+    parser.add_argument('--model-dir', default=ONNX_MODEL_DIR, help='Directory holding the exported .onnx files')
+    args = parser.parse_args()
+
+    faces = load_eval_set(args.eval_dir)
+    if not faces:
+        print("No images found in evaluation set.")
+        return
+
+    setup_temp_dir()
+    try:
+        backends = {'deepface': run_deepface}
+        for quantize in (False, True):
+            if os.path.exists(onnx_backend.model_path('age', quantize, args.model_dir)):
+                label = 'onnx-int8' if quantize else 'onnx-fp32'
+                backends[label] = lambda face, q=quantize: onnx_backend.analyze(face, q, args.model_dir)
+
+        runs = {name: evaluate(fn, faces) for name, fn in backends.items()}
+    finally:
+        cleanup_temp_dir()
+
+    reference = load_labels(args.labels) if args.labels else runs['deepface'][0]
+    print(f"Evaluated {len(faces)} faces against {'labels' if args.labels else 'DeepFace predictions'}")
+    print(f"{'backend':<10} {'mean ms':>8} {'p95 ms':>8} {'age MAE':>8} {'gender':>7} {'emotion':>8} {'race':>6}")
+    for name, (predictions, latencies) in runs.items():
+        row = score(predictions, reference)
+        print(f"{name:<10} {latencies.mean():8.1f} {np.percentile(latencies, 95):8.1f} {row['age_mae']:8.2f} "
+              f"{row['gender_acc']:7.2%} {row['emotion_acc']:8.2%} {row['race_acc']:6.2%}")
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,34 @@ import cv2
 
 TEMP_DIR = "temp_faces"
 CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-DEEPFACE_ACTIONS = ['age', 'gender', 'emotion', 'race']
\ No newline at end of file
+DEEPFACE_ACTIONS = ['age', 'gender', 'emotion', 'race']
+
+# Inference backend: 'deepface' (Keras/TensorFlow) or 'onnx' (onnxruntime)
+INFERENCE_BACKEND = 'deepface'
+ONNX_MODEL_DIR = "onnx_models"
+ONNX_QUANTIZE = False
+
+# Reuse preallocated NumPy buffers for per-face intermediates in the hot loop
+USE_BUFFER_POOL = True
+BUFFER_POOL_SIZE = 128
+
+# Webcam auto-capture period and shared inference workers for multi-camera mode
+AUTO_CAPTURE_INTERVAL = 15.0
+INFERENCE_WORKERS = 2
+MAX_PENDING_PER_STREAM = 4
+
+# Identity index: skip age/gender/race inference for faces already seen
+USE_IDENTITY_INDEX = False
+IDENTITY_INDEX_PATH = "identity_index.npz"
+IDENTITY_MODEL = "Facenet"
+IDENTITY_MATCH_THRESHOLD = 0.7
+IDENTITY_REFRESH_EVERY = 20
+
+# Stage benchmarks: baseline file and allowed slowdown before failing
+BENCHMARK_BASELINE_PATH = "benchmark_baseline.json"
+BENCHMARK_TOLERANCE = 0.25
+
+# Optional audit recording of the annotated webcam view (None disables it)
+RECORD_VIDEO_PATH = None
+RECORDER_FOURCC = 'mp4v'
+RECORDER_QUEUE_SIZE = 32
@@ -1,9 +1,14 @@
 import cv2
-from deepface import DeepFace
 from PIL import Image
 import os
-from config import TEMP_DIR, DEEPFACE_ACTIONS
+import threading
+from config import TEMP_DIR, DEEPFACE_ACTIONS, INFERENCE_BACKEND, USE_IDENTITY_INDEX
 from face_preprocessing import preprocess_face
+from buffer_pool import frame_buffers
+from identity_index import IdentityIndex, face_embedding, static_attributes
+
+_identity_index = None
+_identity_lock = threading.Lock()
 
 def get_pred_label(result):
     if not result or not result[0]:
@@ -17,20 +22,77 @@ def get_pred_label(result):
 
 def draw_label(image, label):
     # Ensure input image is in RGB format
-    if image.shape[2] == 3:  # Check if image has 3 channels
-        img_rgb = image.copy()  # Assume RGB, make a copy to avoid modifying original
-    else:
+    if image.shape[2] != 3:  # Check if image has 3 channels
         print("Warning: Input image to draw_label has unexpected channels.")
         return image
 
-    # Convert to BGR for OpenCV text drawing
-    img_bgr = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2BGR)
+    # Convert to BGR for OpenCV text drawing (into a scratch buffer, the original is untouched)
+    img_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR, dst=frame_buffers.get('label_bgr', image.shape))
     for i, line in enumerate(label.split('\n')):
         cv2.putText(img_bgr, line, (10, 30 + i*30), cv2.FONT_HERSHEY_SIMPLEX,
                     0.8, (255, 255, 0), 2, cv2.LINE_AA)
-    # Convert back to RGB for matplotlib display
+    # Convert back to RGB for matplotlib display (fresh array, the caller keeps it)
     return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
 
+def _analyze_pair(original_face, enhanced_face, face_idx, actions):
+    if INFERENCE_BACKEND == 'onnx':
+        import onnx_backend
+        return (onnx_backend.analyze(original_face, actions=actions),
+                onnx_backend.analyze(enhanced_face, actions=actions))
+
+    # Imported here so the ONNX backend never pays the TensorFlow startup cost
+    from deepface import DeepFace
+    original_path = os.path.join(TEMP_DIR, f"original_face_{face_idx}.jpg")
+    enhanced_path = os.path.join(TEMP_DIR, f"enhanced_face_{face_idx}.jpg")
+    Image.fromarray(original_face).save(original_path)
+    Image.fromarray(enhanced_face).save(enhanced_path)
+    try:
+        result_original = DeepFace.analyze(img_path=original_path, actions=actions, enforce_detection=False)
+        result_enhanced = DeepFace.analyze(img_path=enhanced_path, actions=actions, enforce_detection=False)
+        return result_original, result_enhanced
+    finally:
+        try:
+            os.remove(original_path)
+            os.remove(enhanced_path)
+        except OSError as e:
+            print(f"Error deleting temporary file: {e}")
+
+def get_identity_index():
+    global _identity_index
+    with _identity_lock:
+        if _identity_index is None:
+            _identity_index = IdentityIndex.load()
+        return _identity_index
+
+def save_identity_index():
+    if _identity_index is not None:
+        _identity_index.save()
+
+def run_analysis(original_face, enhanced_face, face_idx):
+    if not USE_IDENTITY_INDEX:
+        return _analyze_pair(original_face, enhanced_face, face_idx, DEEPFACE_ACTIONS)
+
+    index = get_identity_index()
+    embedding = face_embedding(original_face)
+    identity, score = index.match(embedding)
+    if identity is None or index.needs_refresh(identity):
+        result_original, result_enhanced = _analyze_pair(original_face, enhanced_face, face_idx, DEEPFACE_ACTIONS)
+        if identity is None:
+            # Looked up again under the index lock: another camera may have added this face meanwhile
+            identity = index.match_or_add(embedding, static_attributes(result_original))
+        else:
+            index.update(identity, embedding, static_attributes(result_original))
+    else:
+        # Known face: only emotion changes between sightings, reuse the stored attributes
+        print(f"Face {face_idx} matched identity {identity} (similarity {score:.2f}).")
+        index.update(identity, embedding)
+        result_original, result_enhanced = _analyze_pair(original_face, enhanced_face, face_idx, ['emotion'])
+        for result in (result_original, result_enhanced):
+            result[0].update(index.attributes[identity])
+    for result in (result_original, result_enhanced):
+        result[0]['identity'] = identity
+    return result_original, result_enhanced
+
 def analyze_faces(img, face_cascade, show_visualizations=True):
     img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
     gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
@@ -47,22 +109,10 @@ def analyze_faces(img, face_cascade, show_visualizations=True):
         if original_face is None or enhanced_face is None:
             continue
 
-        original_path = os.path.join(TEMP_DIR, f"original_face_{i}.jpg")
-        enhanced_path = os.path.join(TEMP_DIR, f"enhanced_face_{i}.jpg")
-        Image.fromarray(original_face).save(original_path)
-        Image.fromarray(enhanced_face).save(enhanced_path)
-
         try:
-            result_original = DeepFace.analyze(img_path=original_path, actions=DEEPFACE_ACTIONS, enforce_detection=False)
-            result_enhanced = DeepFace.analyze(img_path=enhanced_path, actions=DEEPFACE_ACTIONS, enforce_detection=False)
+            result_original, result_enhanced = run_analysis(original_face, enhanced_face, i)
             results.append((original_face, enhanced_face, result_original, result_enhanced))
         except Exception as e:
             print(f"DeepFace error for Face {i+1}: {e}")
-        finally:
-            try:
-                os.remove(original_path)
-                os.remove(enhanced_path)
-            except OSError as e:
-                print(f"Error deleting temporary file: {e}")
 
     return results
\ No newline at end of file
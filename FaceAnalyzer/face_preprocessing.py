@@ -1,11 +1,25 @@
+import threading
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
+from buffer_pool import frame_buffers, no_buffers
+
+KERNEL_SHARPENING = np.array([[0, -1, 0], [-1, 5,-1], [0, -1, 0]])
+_local = threading.local()
+
+def thread_clahe():
+    # CLAHE objects keep state between apply() calls, so each inference thread builds its own
+    if not hasattr(_local, 'clahe'):
+        _local.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+    return _local.clahe
 
 def preprocess_face(img, face_idx, face_cascade, show_visualizations=True):
     print(f"Preprocessing Face {face_idx}...")
+    # Matplotlib keeps references to displayed arrays, so only pool when nothing is shown
+    buffers = no_buffers if show_visualizations else frame_buffers
+
     # Convert to RGB
-    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=buffers.get('preprocess_rgb', img.shape))
 
     if show_visualizations:
         plt.figure(figsize=(5,5))
@@ -17,7 +31,7 @@ def preprocess_face(img, face_idx, face_cascade, show_visualizations=True):
         print(f"Displayed original image for Face {face_idx}")
 
     # Face detection (already done, but crop face for preprocessing)
-    gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY)
+    gray = cv2.cvtColor(img_rgb, cv2.COLOR_RGB2GRAY, dst=buffers.get('preprocess_gray', img_rgb.shape[:2]))
     faces = face_cascade.detectMultiScale(gray, 1.1, 4)
 
     if len(faces) == 0:
@@ -38,10 +52,11 @@ def preprocess_face(img, face_idx, face_cascade, show_visualizations=True):
         print(f"Displayed cropped face for Face {face_idx}")
 
     # Apply median filter
-    median_filtered = cv2.medianBlur(face, 5)
+    median_filtered = cv2.medianBlur(face, 5, dst=buffers.get('median', face.shape))
 
     # Apply bilateral filter
-    bilateral_filtered = cv2.bilateralFilter(median_filtered, d=9, sigmaColor=75, sigmaSpace=75)
+    bilateral_filtered = cv2.bilateralFilter(median_filtered, d=9, sigmaColor=75, sigmaSpace=75,
+                                             dst=buffers.get('bilateral', face.shape))
 
     if show_visualizations:
         fig, axes = plt.subplots(1, 2, figsize=(10, 5))
@@ -52,15 +67,14 @@ def preprocess_face(img, face_idx, face_cascade, show_visualizations=True):
         print(f"Displayed denoising steps for Face {face_idx}")
 
     # Enhancement: CLAHE and sharpening
-    lab = cv2.cvtColor(bilateral_filtered, cv2.COLOR_RGB2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-    cl = clahe.apply(l)
-    lab_clahe = cv2.merge((cl, a, b))
-    enhanced_clahe = cv2.cvtColor(lab_clahe, cv2.COLOR_LAB2RGB)
+    # Only the L channel changes, so it is equalized in place instead of split/merged
+    lab = cv2.cvtColor(bilateral_filtered, cv2.COLOR_RGB2LAB, dst=buffers.get('lab', face.shape))
+    l = cv2.extractChannel(lab, 0, dst=buffers.get('lab_l', face.shape[:2]))
+    cl = thread_clahe().apply(l, dst=buffers.get('lab_cl', face.shape[:2]))
+    lab_clahe = cv2.insertChannel(cl, lab, 0)
+    enhanced_clahe = cv2.cvtColor(lab_clahe, cv2.COLOR_LAB2RGB, dst=buffers.get('clahe_rgb', face.shape))
 
-    kernel_sharpening = np.array([[0, -1, 0], [-1, 5,-1], [0, -1, 0]])
-    sharpened = cv2.filter2D(enhanced_clahe, -1, kernel_sharpening)
+    sharpened = cv2.filter2D(enhanced_clahe, -1, KERNEL_SHARPENING, dst=buffers.get('sharpened', face.shape))
 
     if show_visualizations:
         fig, axes = plt.subplots(1, 3, figsize=(15, 5))
@@ -72,10 +86,11 @@ def preprocess_face(img, face_idx, face_cascade, show_visualizations=True):
         print(f"Displayed CLAHE and sharpening for Face {face_idx}")
 
     # Histogram Equalization
-    ycrcb = cv2.cvtColor(sharpened, cv2.COLOR_RGB2YCrCb)
-    y, cr, cb = cv2.split(ycrcb)
-    y_eq = cv2.equalizeHist(y)
-    enhanced_final = cv2.cvtColor(cv2.merge([y_eq, cr, cb]), cv2.COLOR_YCrCb2RGB)
+    ycrcb = cv2.cvtColor(sharpened, cv2.COLOR_RGB2YCrCb, dst=buffers.get('ycrcb', face.shape))
+    y = cv2.extractChannel(ycrcb, 0, dst=buffers.get('ycrcb_y', face.shape[:2]))
+    y_eq = cv2.equalizeHist(y, dst=buffers.get('ycrcb_y_eq', face.shape[:2]))
+    enhanced_final = cv2.cvtColor(cv2.insertChannel(y_eq, ycrcb, 0), cv2.COLOR_YCrCb2RGB,
+                                  dst=buffers.get('equalized', face.shape))
 
     if show_visualizations:
         fig, axes = plt.subplots(1, 2, figsize=(10, 5))
@@ -85,7 +100,7 @@ def preprocess_face(img, face_idx, face_cascade, show_visualizations=True):
         plt.pause(0.001)
         print(f"Displayed histogram equalization for Face {face_idx}")
 
-    # Resize to model's expected input
+    # Resize to model's expected input (fresh arrays, callers keep them)
     resized = cv2.resize(enhanced_final, (227, 227))
 
     if show_visualizations:
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import argparse
+import threading
+import cv2
+import numpy as np
+from config import IDENTITY_INDEX_PATH, IDENTITY_MODEL, IDENTITY_MATCH_THRESHOLD, IDENTITY_REFRESH_EVERY
+
+# Attributes that do not change between sightings of the same person
+STATIC_KEYS = ['age', 'gender', 'dominant_gender', 'race', 'dominant_race']
+
+def face_embedding(face_rgb, model_name=IDENTITY_MODEL):
+    from deepface import DeepFace
+    # DeepFace treats NumPy inputs as BGR
+    representation = DeepFace.represent(img_path=cv2.cvtColor(face_rgb, cv2.COLOR_RGB2BGR),
+                                        model_name=model_name, enforce_detection=False)
+    return np.asarray(representation[0]['embedding'], dtype=np.float32)
+
+def static_attributes(result):
+    attributes = {}
+    for key in STATIC_KEYS:
+        value = result[0][key]
+        if isinstance(value, dict):
+            attributes[key] = {label: float(p) for label, p in value.items()}
+        elif isinstance(value, str):
+            attributes[key] = value
+        else:
+            attributes[key] = float(value)
+    return attributes
+
+class IdentityIndex:
+    # Unit-norm embeddings live in one preallocated float32 matrix so a lookup is a
+    # single matrix-vector product; attributes are kept in a parallel list.
+    # The width comes from the first embedding unless given, since it depends on the model.
+    def __init__(self, model_name=IDENTITY_MODEL, dim=None, capacity=1024):
+        self.model_name = model_name
+        self.dim = dim
+        self.size = 0
+        self._capacity = capacity
+        self._embeddings = None if dim is None else np.empty((capacity, dim), dtype=np.float32)
+        self.attributes = []
+        self.sightings = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def _normalize(self, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        if self.dim is not None and embedding.size != self.dim:
+            raise ValueError(f"{embedding.size}-d embedding for an index of {self.dim}-d "
+                             f"{self.model_name} embeddings")
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def _grow(self):
+        grown = np.empty((self._embeddings.shape[0] * 2, self.dim), dtype=np.float32)
+        grown[:self.size] = self._embeddings[:self.size]
+        self._embeddings = grown
+
+    def _scores(self, query):
+        # Cosine similarity to every identity; the caller holds the lock
+        return self._embeddings[:self.size] @ query if self.size else np.empty(0, dtype=np.float32)
+
+    def _add(self, embedding, attributes):
+        if self._embeddings is None:
+            self.dim = embedding.size
+            self._embeddings = np.empty((self._capacity, self.dim), dtype=np.float32)
+        elif self.size == self._embeddings.shape[0]:
+            self._grow()
+        self._embeddings[self.size] = embedding
+        self.attributes.append(attributes)
+        self.sightings.append(1)
+        self.size += 1
+        return self.size - 1
+
+    def _update(self, identity, embedding, attributes):
+        count = self.sightings[identity]
+        self._embeddings[identity] = self._normalize(self._embeddings[identity] * count + embedding)
+        self.sightings[identity] = count + 1
+        if attributes is not None:
+            self.attributes[identity] = attributes
+
+    def add(self, embedding, attributes):
+        with self._lock:
+            return self._add(self._normalize(embedding), attributes)
+
+    def match_or_add(self, embedding, attributes, threshold=IDENTITY_MATCH_THRESHOLD):
+        # Lookup and insert in one step, so two cameras that miss on the same new face
+        # do not both add it: the later one updates the identity the first one added
+        embedding = self._normalize(embedding)
+        with self._lock:
+            scores = self._scores(embedding)
+            if scores.size and scores.max() >= threshold:
+                identity = int(scores.argmax())
+                self._update(identity, embedding, attributes)
+                return identity
+            return self._add(embedding, attributes)
+
+    def update(self, identity, embedding, attributes=None):
+        # Running mean of the embedding keeps the identity stable across poses
+        embedding = self._normalize(embedding)
+        with self._lock:
+            self._update(identity, embedding, attributes)
+
+    def search(self, embedding, k=1):
+        # Returns (ids, cosine similarities) of the k nearest identities, best first
+        query = self._normalize(embedding)
+        with self._lock:
+            scores = self._scores(query)
+        if scores.size == 0:
+            return np.empty(0, dtype=np.int64), scores
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def match(self, embedding, threshold=IDENTITY_MATCH_THRESHOLD):
+        ids, scores = self.search(embedding, k=1)
+        if ids.size and scores[0] >= threshold:
+            return int(ids[0]), float(scores[0])
+        return None, float(scores[0]) if scores.size else 0.0
+
+    def save(self, path=IDENTITY_INDEX_PATH):
+        with self._lock:
+            embeddings = self._embeddings[:self.size] if self.size else np.empty((0, self.dim or 0))
+            np.savez(path,
+                     model=np.array(self.model_name),
+                     embeddings=embeddings.astype(np.float16),
+                     sightings=np.asarray(self.sightings, dtype=np.int32),
+                     attributes=np.array(json.dumps(self.attributes)))
+
+    @classmethod
+    def load(cls, path=IDENTITY_INDEX_PATH, model_name=IDENTITY_MODEL):
+        # model_name=None accepts the index of any model
+        if not os.path.exists(path):
+            return cls(model_name)
+        data = np.load(path)
+        saved = str(data['model']) if 'model' in data.files else None
+        if model_name is not None and saved != model_name:
+            raise ValueError(f"{path} holds {saved or 'unlabelled'} embeddings, not {model_name}; "
+                             f"delete it or set IDENTITY_MODEL to match")
+        embeddings = data['embeddings'].astype(np.float32)
+        index = cls(saved, embeddings.shape[1] if embeddings.size else None, capacity=max(1024, len(embeddings)))
+        if embeddings.size:
+            index._embeddings[:len(embeddings)] = embeddings
+        index.size = len(embeddings)
+        index.sightings = data['sightings'].tolist()
+        index.attributes = json.loads(str(data['attributes']))
+        return index
+
+    def needs_refresh(self, identity, refresh_every=IDENTITY_REFRESH_EVERY):
+        return refresh_every > 0 and self.sightings[identity] % refresh_every == 0
+
+def benchmark(sizes=(10000, 50000, 100000), dim=128, queries=200, k=5):
+    rng = np.random.default_rng(0)
+    print(f"{'identities':>10} {'top-1 us':>9} {'top-5 us':>9} {'MB':>6}")
+    for size in sizes:
+        index = IdentityIndex(dim=dim, capacity=size)
+        vectors = rng.standard_normal((size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index._embeddings[:size] = vectors
+        index.size = size
+        index.attributes = [{}] * size
+        index.sightings = [1] * size
+        probes = rng.standard_normal((queries, dim)).astype(np.float32)
+
+        timings = []
+        for top_k in (1, k):
+            start = time.perf_counter()
+            for probe in probes:
+                index.search(probe, top_k)
+            timings.append((time.perf_counter() - start) / queries * 1e6)
+        print(f"{size:>10} {timings[0]:9.1f} {timings[1]:9.1f} {index._embeddings.nbytes / 2**20:6.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or benchmark the face identity index")
+    parser.add_argument('--benchmark', action='store_true', help='Time top-k lookups at 10k-100k identities')
+    parser.add_argument('--path', default=IDENTITY_INDEX_PATH, help='Index file to inspect')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        index = IdentityIndex.load(args.path, model_name=None)
+        print(f"{len(index)} {index.model_name or 'unlabelled'} identities in {args.path}")
+        for identity, (attributes, seen) in enumerate(zip(index.attributes, index.sightings)):
+            print(f"{identity}: seen {seen}x, {attributes.get('dominant_gender')}, "
+                  f"{attributes.get('age', 0):.0f} yrs, {attributes.get('dominant_race')}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 import os
 import shutil
 import cv2
-from config import TEMP_DIR, CASCADE_PATH
+from config import TEMP_DIR, CASCADE_PATH, RECORD_VIDEO_PATH
 from image_utils import setup_temp_dir, cleanup_temp_dir, upload_image
 from webcam_utils import open_webcam, process_webcam
+from multi_camera import process_streams
+from video_recorder import VideoRecorder
 from visualization import display_final_results
-from face_analysis import analyze_faces
+from face_analysis import analyze_faces, save_identity_index
 
 def main():
     # Setup temporary directory
@@ -15,7 +17,8 @@ def main():
     print("Choose input method:")
     print("1. Webcam (track faces, press 's' to capture)")
     print("2. Upload a single picture")
-    choice = input("Enter 1 or 2: ")
+    print("3. Multiple cameras or video files (shared inference pool)")
+    choice = input("Enter 1, 2 or 3: ")
 
     # Load Haar Cascade for face detection
     face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
@@ -38,22 +41,43 @@ def main():
             display_final_results(results)
         else:
             print("No valid faces processed.")
-        
+
+        save_identity_index()
+        cleanup_temp_dir()
+        exit()
+
+    if choice == "3":
+        # Multi-camera mode
+        sources = input("Camera indices and/or video paths, comma separated: ").split(',')
+        streams = process_streams([source.strip() for source in sources if source.strip()])
+        results = [face for stream in streams for face in stream.stored_faces]
+        if results:
+            display_final_results(results)
+        else:
+            print("No faces captured for processing.")
+
+        save_identity_index()
         cleanup_temp_dir()
         exit()
 
     # Webcam mode
     cap, webcam_index = open_webcam()
-    results = process_webcam(cap, face_cascade)
+    recorder = None
+    if RECORD_VIDEO_PATH:
+        recorder = VideoRecorder(RECORD_VIDEO_PATH, fps=cap.get(cv2.CAP_PROP_FPS) or 30.0)
+    results = process_webcam(cap, face_cascade, recorder)
     
     # Release webcam and display results
     cap.release()
+    if recorder is not None:
+        recorder.close()
     cv2.destroyAllWindows()
     if results:
         display_final_results(results)
     else:
         print("No faces captured for processing.")
-    
+
+    save_identity_index()
     cleanup_temp_dir()
 
 if __name__ == "__main__":
@@ -0,0 +1,327 @@
+import time
+import argparse
+import threading
+from collections import deque
+import cv2
+import numpy as np
+from config import CASCADE_PATH, AUTO_CAPTURE_INTERVAL, INFERENCE_WORKERS, MAX_PENDING_PER_STREAM
+from buffer_pool import frame_buffers
+from face_preprocessing import preprocess_face
+from face_analysis import get_pred_label, run_analysis, save_identity_index
+from webcam_utils import is_same_face
+from image_utils import setup_temp_dir, cleanup_temp_dir
+
+_local = threading.local()
+
+def thread_cascade():
+    # CascadeClassifier is not safe to share between threads, so each thread loads its own
+    if not hasattr(_local, 'face_cascade'):
+        _local.face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    return _local.face_cascade
+
+def open_source(source):
+    # Integers (or digit strings) are camera indices, anything else is a video file to replay
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        print(f"Error: Could not open capture source {source}.")
+        return None
+    return cap
+
+def analyze_face(face_rgb, tag):
+    original_face, enhanced_face = preprocess_face(face_rgb, tag, thread_cascade(), show_visualizations=False)
+    if original_face is None or enhanced_face is None:
+        return None
+    result_original, result_enhanced = run_analysis(original_face, enhanced_face, tag)
+    return original_face, enhanced_face, result_original, result_enhanced
+
+class StreamMetrics:
+    def __init__(self):
+        self.frames = 0
+        self.start_time = None
+        self.end_time = None
+        self.frame_ms = []
+        self.inference_ms = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def record_frame(self, ms):
+        now = time.perf_counter()
+        if self.start_time is None:
+            self.start_time = now
+        self.end_time = now
+        self.frames += 1
+        self.frame_ms.append(ms)
+
+    def record_inference(self, ms):
+        with self._lock:
+            self.inference_ms.append(ms)
+
+    def summary(self):
+        elapsed = (self.end_time - self.start_time) if self.frames > 1 else 0.0
+        with self._lock:
+            inference = np.array(self.inference_ms)
+        return {
+            'frames': self.frames,
+            'fps': (self.frames - 1) / elapsed if elapsed > 0 else 0.0,
+            'frame_ms': float(np.mean(self.frame_ms)) if self.frame_ms else 0.0,
+            'inference_ms': float(inference.mean()) if inference.size else 0.0,
+            'inference_p95_ms': float(np.percentile(inference, 95)) if inference.size else 0.0,
+            'inferences': int(inference.size),
+            'dropped': self.dropped,
+        }
+
+class FairInferencePool:
+    # Worker threads shared by all streams. Each stream has its own bounded queue and
+    # workers take jobs round-robin across streams, so a busy camera cannot starve the others.
+    def __init__(self, num_workers=INFERENCE_WORKERS, max_pending=MAX_PENDING_PER_STREAM):
+        self.max_pending = max_pending
+        self._queues = {}
+        self._order = []
+        self._cursor = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._workers = [threading.Thread(target=self._work, name=f"inference-{i}", daemon=True)
+                         for i in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def register(self, stream_id):
+        with self._cond:
+            self._queues[stream_id] = deque()
+            self._order.append(stream_id)
+
+    def submit(self, stream_id, job):
+        # Returns False (job dropped) when the stream already has max_pending jobs queued
+        with self._cond:
+            queue = self._queues[stream_id]
+            if len(queue) >= self.max_pending:
+                return False
+            queue.append(job)
+            self._cond.notify()
+            return True
+
+    def _next_job(self):
+        for step in range(len(self._order)):
+            index = (self._cursor + step) % len(self._order)
+            queue = self._queues[self._order[index]]
+            if queue:
+                self._cursor = index + 1
+                return queue.popleft()
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._cond.wait()
+                    job = self._next_job()
+                if job is None:
+                    return
+            job()
+
+    def pending(self):
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def shutdown(self, drain=True):
+        if drain:
+            while self.pending():
+                time.sleep(0.01)
+        with self._cond:
+            self._stopped = True
+            if not drain:
+                for queue in self._queues.values():
+                    queue.clear()
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+class CameraStream(threading.Thread):
+    # Capture, detection and overlay for one source; inference is handed to the shared pool
+    def __init__(self, stream_id, cap, pool, stop_event, analyze_fn=analyze_face,
+                 capture_interval=AUTO_CAPTURE_INTERVAL, realtime=False, keep_frames=False):
+        super().__init__(name=f"stream-{stream_id}", daemon=True)
+        self.stream_id = stream_id
+        self.cap = cap
+        self.pool = pool
+        self.stop_event = stop_event
+        self.analyze_fn = analyze_fn
+        self.capture_interval = capture_interval
+        self.realtime = realtime
+        self.keep_frames = keep_frames
+        self.metrics = StreamMetrics()
+        self.stored_faces = []
+        self.latest_frame = None
+        self.frame_lock = threading.Lock()
+        # Per-stream tracker state: face box key -> (label_original, label_enhanced)
+        self.last_predictions = {}
+        self.predictions_lock = threading.Lock()
+        self.pool.register(stream_id)
+
+    def _match(self, box):
+        for prev_key in self.last_predictions:
+            if is_same_face(box, tuple(map(int, prev_key.split('_')))):
+                return prev_key
+        return None
+
+    def _make_job(self, face_rgb, face_key, tag):
+        submitted = time.perf_counter()
+
+        def job():
+            try:
+                result = self.analyze_fn(face_rgb, tag)
+            except Exception as e:
+                print(f"Inference error on stream {self.stream_id}: {e}")
+                result = None
+            self.metrics.record_inference((time.perf_counter() - submitted) * 1000)
+            with self.predictions_lock:
+                if result is None:
+                    self.last_predictions[face_key] = ("Error in Prediction", "Error in Prediction")
+                    return
+                original_face, enhanced_face, result_original, result_enhanced = result
+                self.last_predictions[face_key] = (get_pred_label(result_original), get_pred_label(result_enhanced))
+                self.stored_faces.append(result)
+        return job
+
+    def run(self):
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.realtime else 0
+        frame_period = 1.0 / fps if fps and fps > 0 else 0.0
+        last_capture_time = time.time() - self.capture_interval
+        capture_count = 0
+        frame = None
+        face_cascade = thread_cascade()
+
+        while not self.stop_event.is_set():
+            frame_start = time.perf_counter()
+            ret, frame = self.cap.read(frame)
+            if not ret:
+                break
+
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=frame_buffers.get('stream_gray', frame.shape[:2]))
+            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4)
+
+            current_time = time.time()
+            auto_capture = (current_time - last_capture_time >= self.capture_interval) and len(faces) > 0
+            if auto_capture:
+                last_capture_time = current_time
+                capture_count += 1
+
+            with self.predictions_lock:
+                frame_predictions = {}
+                for i, (x, y, w, h) in enumerate(faces):
+                    face_key = f"{x}_{y}_{w}_{h}"
+                    matched_key = self._match((x, y, w, h))
+                    if matched_key and not auto_capture:
+                        frame_predictions[face_key] = self.last_predictions[matched_key]
+                    else:
+                        frame_predictions[face_key] = ("Processing...", "Processing...")
+                    if auto_capture:
+                        # The crop is copied out of the frame, which is reused by the next read
+                        face_rgb = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB)
+                        job = self._make_job(face_rgb, face_key, f"{self.stream_id}_{capture_count}_{i}")
+                        if not self.pool.submit(self.stream_id, job):
+                            self.metrics.dropped += 1
+                # Keep only the faces still in view, as process_webcam does
+                self.last_predictions = frame_predictions
+
+            for i, (x, y, w, h) in enumerate(faces):
+                label_original, label_enhanced = frame_predictions[f"{x}_{y}_{w}_{h}"]
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                cv2.putText(frame, f"Face {i+1}", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.8, (0, 255, 0), 2, cv2.LINE_AA)
+                y_offset = y - 100 if y - 100 > 0 else 20
+                for j, line in enumerate(label_original.split('\n')):
+                    cv2.putText(frame, f"O: {line}", (x, y_offset + j*20), cv2.FONT_HERSHEY_SIMPLEX,
+                                0.6, (255, 255, 0), 2, cv2.LINE_AA)
+                for j, line in enumerate(label_enhanced.split('\n')):
+                    cv2.putText(frame, f"E: {line}", (x, y_offset + (j+2)*20), cv2.FONT_HERSHEY_SIMPLEX,
+                                0.6, (255, 255, 0), 2, cv2.LINE_AA)
+            if len(faces) == 0:
+                cv2.putText(frame, "No Face Detected", (10, 50), cv2.FONT_HERSHEY_SIMPLEX,
+                            1.0, (0, 0, 255), 2, cv2.LINE_AA)
+
+            if self.keep_frames:
+                with self.frame_lock:
+                    self.latest_frame = frame.copy()
+
+            elapsed = time.perf_counter() - frame_start
+            self.metrics.record_frame(elapsed * 1000)
+            if frame_period > elapsed:
+                time.sleep(frame_period - elapsed)
+
+        self.cap.release()
+
+def process_streams(sources, num_workers=INFERENCE_WORKERS, display=True, realtime=False,
+                    capture_interval=AUTO_CAPTURE_INTERVAL, analyze_fn=analyze_face):
+    pool = FairInferencePool(num_workers)
+    stop_event = threading.Event()
+    streams = []
+    for stream_id, source in enumerate(sources):
+        cap = open_source(source)
+        if cap is None:
+            continue
+        streams.append(CameraStream(stream_id, cap, pool, stop_event, analyze_fn,
+                                    capture_interval, realtime, keep_frames=display))
+    if not streams:
+        pool.shutdown(drain=False)
+        return []
+
+    print(f"Processing {len(streams)} streams with {num_workers} inference workers. Press 'q' to quit.")
+    for stream in streams:
+        stream.start()
+
+    try:
+        while any(stream.is_alive() for stream in streams):
+            if display:
+                # GUI calls must stay on the main thread
+                for stream in streams:
+                    with stream.frame_lock:
+                        frame = stream.latest_frame
+                    if frame is not None:
+                        cv2.imshow(f"Camera {stream.stream_id} - Press q to Quit", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            else:
+                time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        for stream in streams:
+            stream.join()
+        pool.shutdown(drain=True)
+        if display:
+            cv2.destroyAllWindows()
+
+    print_metrics(streams)
+    return streams
+
+def print_metrics(streams):
+    print(f"{'stream':<7} {'frames':>7} {'fps':>7} {'frame ms':>9} {'infer ms':>9} {'p95 ms':>8} {'done':>5} {'dropped':>8}")
+    for stream in streams:
+        m = stream.metrics.summary()
+        print(f"{stream.stream_id:<7} {m['frames']:7d} {m['fps']:7.1f} {m['frame_ms']:9.2f} "
+              f"{m['inference_ms']:9.1f} {m['inference_p95_ms']:8.1f} {m['inferences']:5d} {m['dropped']:8d}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze several cameras or replayed videos concurrently")
+    parser.add_argument('sources', nargs='+', help='Camera indices and/or video file paths')
+    parser.add_argument('--workers', type=int, default=INFERENCE_WORKERS, help='Shared inference worker threads')
+    parser.add_argument('--interval', type=float, default=AUTO_CAPTURE_INTERVAL, help='Seconds between auto-captures per stream')
+    parser.add_argument('--headless', action='store_true', help='Do not open preview windows')
+    parser.add_argument('--realtime', action='store_true', help='Pace video files at their native frame rate')
+    args = parser.parse_args()
+
+    setup_temp_dir()
+    try:
+        process_streams(args.sources, args.workers, display=not args.headless,
+                        realtime=args.realtime, capture_interval=args.interval)
+    finally:
+        save_identity_index()
+        cleanup_temp_dir()
+
+if __name__ == "__main__":
+    main()
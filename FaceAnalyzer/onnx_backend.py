@@ -0,0 +1,122 @@
+import os
+import argparse
+import threading
+import cv2
+import numpy as np
+from config import ONNX_MODEL_DIR, ONNX_QUANTIZE
+
+# Label order matches the DeepFace demography clients
+GENDER_LABELS = ["Woman", "Man"]
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+RACE_LABELS = ["asian", "indian", "black", "white", "middle eastern", "latino hispanic"]
+MODEL_NAMES = ['age', 'gender', 'emotion', 'race']
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def model_path(name, quantize=ONNX_QUANTIZE, model_dir=ONNX_MODEL_DIR):
+    suffix = ".int8.onnx" if quantize else ".onnx"
+    return os.path.join(model_dir, name + suffix)
+
+def _load_keras_models():
+    # Imported lazily so the ONNX runtime path never pulls in TensorFlow
+    from deepface.models.demography import Age, Gender, Emotion, Race
+    return {
+        'age': Age.ApparentAgeClient().model,
+        'gender': Gender.GenderClient().model,
+        'emotion': Emotion.EmotionClient().model,
+        'race': Race.RaceClient().model,
+    }
+
+def export_models(model_dir=ONNX_MODEL_DIR, quantize=False):
+    import tensorflow as tf
+    import tf2onnx
+
+    os.makedirs(model_dir, exist_ok=True)
+    for name, model in _load_keras_models().items():
+        fp32_path = model_path(name, quantize=False, model_dir=model_dir)
+        spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, output_path=fp32_path)
+        print(f"Exported {name} model to {fp32_path}")
+        if quantize:
+            quantize_model(name, model_dir)
+
+def quantize_model(name, model_dir=ONNX_MODEL_DIR):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    fp32_path = model_path(name, quantize=False, model_dir=model_dir)
+    int8_path = model_path(name, quantize=True, model_dir=model_dir)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Quantized {name} model to {int8_path}")
+
+def get_session(name, quantize=ONNX_QUANTIZE, model_dir=ONNX_MODEL_DIR):
+    key = (name, quantize, model_dir)
+    # Sessions are shared by all inference threads; only creation needs the lock
+    with _sessions_lock:
+        if key not in _sessions:
+            import onnxruntime as ort
+
+            path = model_path(name, quantize, model_dir)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX model not found: {path}. Run 'python onnx_backend.py --export' first.")
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            _sessions[key] = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        return _sessions[key]
+
+def _run(name, batch, quantize, model_dir):
+    session = get_session(name, quantize, model_dir)
+    input_name = session.get_inputs()[0].name
+    return session.run(None, {input_name: batch})[0][0]
+
+def _prepare_inputs(face_rgb):
+    # DeepFace feeds its models BGR pixels scaled to [0, 1]
+    face_bgr = cv2.cvtColor(face_rgb, cv2.COLOR_RGB2BGR)
+    color = cv2.resize(face_bgr, (224, 224)).astype(np.float32) / 255.0
+    gray = cv2.resize(cv2.cvtColor(face_bgr, cv2.COLOR_BGR2GRAY), (48, 48)).astype(np.float32) / 255.0
+    return color[np.newaxis], gray[np.newaxis, :, :, np.newaxis]
+
+def analyze(face_rgb, quantize=ONNX_QUANTIZE, model_dir=ONNX_MODEL_DIR, actions=MODEL_NAMES):
+    # Returns the same structure as DeepFace.analyze so get_pred_label works unchanged
+    color, gray = _prepare_inputs(face_rgb)
+    result = {}
+
+    if 'age' in actions:
+        age_probs = _run('age', color, quantize, model_dir)
+        result['age'] = float(np.sum(age_probs * np.arange(len(age_probs))))
+    if 'gender' in actions:
+        gender_probs = _run('gender', color, quantize, model_dir) * 100
+        gender = {label: float(p) for label, p in zip(GENDER_LABELS, gender_probs)}
+        result['gender'] = gender
+        result['dominant_gender'] = max(gender, key=gender.get)
+    if 'emotion' in actions:
+        emotion_probs = _run('emotion', gray, quantize, model_dir)
+        emotion_probs = emotion_probs / emotion_probs.sum() * 100
+        emotion = {label: float(p) for label, p in zip(EMOTION_LABELS, emotion_probs)}
+        result['emotion'] = emotion
+        result['dominant_emotion'] = max(emotion, key=emotion.get)
+    if 'race' in actions:
+        race_probs = _run('race', color, quantize, model_dir)
+        race_probs = race_probs / race_probs.sum() * 100
+        race = {label: float(p) for label, p in zip(RACE_LABELS, race_probs)}
+        result['race'] = race
+        result['dominant_race'] = max(race, key=race.get)
+    return [result]
+
+def main():
+    parser = argparse.ArgumentParser(description="Export DeepFace attribute models to ONNX")
+    parser.add_argument('--export', action='store_true', help='Export the Keras models to ONNX')
+    parser.add_argument('--quantize', action='store_true', help='Also write int8 dynamically quantized models')
+    parser.add_argument('--model-dir', default=ONNX_MODEL_DIR, help='Output directory for the .onnx files')
+    args = parser.parse_args()
+
+    if args.export:
+        export_models(args.model_dir, quantize=args.quantize)
+    elif args.quantize:
+        for name in MODEL_NAMES:
+            quantize_model(name, args.model_dir)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import gc
+import time
+import argparse
+import tracemalloc
+import cv2
+import numpy as np
+from buffer_pool import frame_buffers
+from face_preprocessing import preprocess_face
+from face_analysis import draw_label
+from config import CASCADE_PATH
+
+LABEL = "Man, 31 yrs\nhappy, white"
+
+class FullFrameDetector:
+    # Stands in for the Haar cascade on synthetic frames: the whole crop is the face
+    def detectMultiScale(self, gray, *args, **kwargs):
+        h, w = gray.shape[:2]
+        return np.array([[0, 0, w, h]])
+
+def synthetic_faces(count, size, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(count)]
+
+def run_frames(faces, face_cascade, frames, trace_memory=False):
+    collections = [0, 0, 0]
+    def on_gc(phase, info):
+        if phase == 'start':
+            collections[info['generation']] += 1
+
+    gc.callbacks.append(on_gc)
+    # tracemalloc slows every allocation down, so timed runs leave it off
+    if trace_memory:
+        tracemalloc.start()
+    peaks = []
+    start = time.perf_counter()
+    try:
+        for _ in range(frames):
+            if trace_memory:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            for i, face in enumerate(faces):
+                original_face, enhanced_face = preprocess_face(face, i+1, face_cascade, show_visualizations=False)
+                if original_face is not None:
+                    draw_label(original_face, LABEL)
+                    draw_label(enhanced_face, LABEL)
+            if trace_memory:
+                peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        elapsed = time.perf_counter() - start
+        if trace_memory:
+            tracemalloc.stop()
+        gc.callbacks.remove(on_gc)
+
+    return {
+        'ms_per_frame': elapsed / frames * 1000,
+        'peak_kb_per_frame': np.mean(peaks) / 1024 if peaks else None,
+        'gc_collections': collections,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-frame allocations with and without the buffer pool")
+    parser.add_argument('--image', help='Face image to use instead of synthetic crops (detected with the Haar cascade)')
+    parser.add_argument('--faces', type=int, default=3, help='Faces per frame (default: 3)')
+    parser.add_argument('--size', type=int, default=160, help='Synthetic face crop size in pixels (default: 160)')
+    parser.add_argument('--frames', type=int, default=200, help='Frames to process per run (default: 200)')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs per mode, alternating between modes (default: 5)')
+    args = parser.parse_args()
+
+    if args.image:
+        img = cv2.imread(args.image)
+        if img is None:
+            print(f"Error: Could not load {args.image}.")
+            return
+        faces = [img] * args.faces
+        face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    else:
+        faces = synthetic_faces(args.faces, args.size)
+        face_cascade = FullFrameDetector()
+
+    modes = (("before (no pool)", False), ("after (pooled)", True))
+    results = {enabled: {'ms': [], 'gc': [0, 0, 0]} for _, enabled in modes}
+    for enabled in (False, True):
+        frame_buffers.clear()
+        frame_buffers.enabled = enabled
+        # Warm-up frame so first-use allocations are not counted against the steady state
+        run_frames(faces, face_cascade, 1)
+        results[enabled]['peak_kb'] = run_frames(faces, face_cascade, args.frames, trace_memory=True)['peak_kb_per_frame']
+
+    # Alternate the modes so drift in clock speed or cache state hits both equally
+    for _ in range(args.repeats):
+        for _, enabled in modes:
+            frame_buffers.enabled = enabled
+            stats = run_frames(faces, face_cascade, args.frames)
+            results[enabled]['ms'].append(stats['ms_per_frame'])
+            results[enabled]['gc'] = [a + b for a, b in zip(results[enabled]['gc'], stats['gc_collections'])]
+
+    total_frames = args.frames * args.repeats
+    for label, enabled in modes:
+        r = results[enabled]
+        print(f"{label:<17} {np.median(r['ms']):7.2f} ms/frame (min {min(r['ms']):.2f}, max {max(r['ms']):.2f})  "
+              f"{r['peak_kb']:9.1f} KiB peak/frame  "
+              f"GC gen0/gen1/gen2: {'/'.join(map(str, r['gc']))} in {total_frames} frames")
+    print(f"pool: {frame_buffers.stats()}")
+
+if __name__ == "__main__":
+    main()
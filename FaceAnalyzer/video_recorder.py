@@ -0,0 +1,75 @@
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+from config import RECORDER_QUEUE_SIZE, RECORDER_FOURCC
+
+class VideoRecorder:
+    # Encodes annotated frames on a background thread. write() copies the frame into one
+    # of at most max_queue preallocated buffers and returns immediately; when all buffers
+    # are waiting to be encoded the frame is dropped instead of stalling the capture loop.
+    def __init__(self, path, fps=30.0, fourcc=RECORDER_FOURCC, max_queue=RECORDER_QUEUE_SIZE):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.max_queue = max_queue
+        self._pending = queue.Queue()
+        self._free = queue.Queue()
+        self._allocated = 0
+        self._writer = None
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.encode_seconds = 0.0
+        self._thread = threading.Thread(target=self._encode_loop, name="video-recorder", daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        try:
+            buf = self._free.get_nowait()
+        except queue.Empty:
+            if self._allocated >= self.max_queue:
+                self.frames_dropped += 1
+                return False
+            buf = np.empty_like(frame)
+            self._allocated += 1
+        if buf.shape != frame.shape:
+            buf = np.empty_like(frame)
+        np.copyto(buf, frame)
+        self._pending.put(buf)
+        return True
+
+    def _encode_loop(self):
+        while True:
+            buf = self._pending.get()
+            if buf is None:
+                break
+            if self._writer is None:
+                # Frame size is only known once the first frame arrives
+                h, w = buf.shape[:2]
+                self._writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (w, h))
+                if not self._writer.isOpened():
+                    print(f"Error: Could not open video writer for {self.path}.")
+            start = time.perf_counter()
+            self._writer.write(buf)
+            self.encode_seconds += time.perf_counter() - start
+            self.frames_written += 1
+            self._free.put(buf)
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+        if self._writer is not None:
+            self._writer.release()
+        stats = self.stats()
+        print(f"Recorded {stats['written']} frames to {self.path} "
+              f"({stats['encode_fps']:.1f} fps encode throughput, {stats['dropped']} dropped).")
+        return stats
+
+    def stats(self):
+        return {
+            'written': self.frames_written,
+            'dropped': self.frames_dropped,
+            'encode_fps': self.frames_written / self.encode_seconds if self.encode_seconds > 0 else 0.0,
+            'queued': self._pending.qsize(),
+        }
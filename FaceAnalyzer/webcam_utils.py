@@ -1,11 +1,9 @@
 import cv2
 import time
 from face_preprocessing import preprocess_face
-from face_analysis import get_pred_label, draw_label
-from PIL import Image
-import os
-from config import TEMP_DIR, DEEPFACE_ACTIONS
-from deepface import DeepFace
+from face_analysis import get_pred_label, draw_label, run_analysis
+from buffer_pool import frame_buffers
+from config import AUTO_CAPTURE_INTERVAL
 
 def open_webcam():
     for index in [0, 1, 2]:
@@ -24,26 +22,29 @@ def is_same_face(face1, face2, threshold=50):
             abs(w1 - w2) < threshold and
             abs(h1 - h2) < threshold)
 
-def process_webcam(cap, face_cascade):
+def process_webcam(cap, face_cascade, recorder=None):
     stored_faces = []
     capture_triggered = False
     error_message = ""
     last_capture_time = time.time()
     last_predictions = {}
 
+    frame = None
+
     print("Starting webcam... Press 's' to capture detected faces manually, 'q' to quit.")
 
     while True:
-        ret, frame = cap.read()
+        # Decode into the previous frame's array instead of allocating a new one
+        ret, frame = cap.read(frame)
         if not ret:
             print("Error: Could not read frame.")
             break
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=frame_buffers.get('webcam_gray', frame.shape[:2]))
         faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4)
 
         current_time = time.time()
-        auto_capture = (current_time - last_capture_time >= 15.0) and len(faces) > 0
+        auto_capture = (current_time - last_capture_time >= AUTO_CAPTURE_INTERVAL) and len(faces) > 0
 
         if len(faces) > 0:
             frame_predictions = {}
@@ -66,21 +67,15 @@ def process_webcam(cap, face_cascade):
                     label_original = "Processing..."
                     label_enhanced = "Processing..."
                     if auto_capture:
-                        face_rgb = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB)
+                        face_rgb = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB, dst=frame_buffers.get('webcam_face_rgb', (h, w, 3)))
                         original_face, enhanced_face = preprocess_face(face_rgb, i+1, face_cascade, show_visualizations=False)
                         if original_face is None or enhanced_face is None:
                             label_original = "Processing Error"
                             label_enhanced = "Processing Error"
                         else:
                             print(f"Storing face {i+1} in RGB format for final plot.")
-                            original_path = os.path.join(TEMP_DIR, f"original_face_{i}.jpg")
-                            enhanced_path = os.path.join(TEMP_DIR, f"enhanced_face_{i}.jpg")
-                            Image.fromarray(original_face).save(original_path)
-                            Image.fromarray(enhanced_face).save(enhanced_path)
-
                             try:
-                                result_original = DeepFace.analyze(img_path=original_path, actions=DEEPFACE_ACTIONS, enforce_detection=False)
-                                result_enhanced = DeepFace.analyze(img_path=enhanced_path, actions=DEEPFACE_ACTIONS, enforce_detection=False)
+                                result_original, result_enhanced = run_analysis(original_face, enhanced_face, i)
                                 label_original = get_pred_label(result_original)
                                 label_enhanced = get_pred_label(result_enhanced)
                                 stored_faces.append((original_face, enhanced_face, result_original, result_enhanced))
@@ -88,12 +83,6 @@ def process_webcam(cap, face_cascade):
                                 print(f"DeepFace error for Face {i+1}: {e}")
                                 label_original = "Error in Prediction"
                                 label_enhanced = "Error in Prediction"
-                            finally:
-                                try:
-                                    os.remove(original_path)
-                                    os.remove(enhanced_path)
-                                except OSError as e:
-                                    print(f"Error deleting temporary file: {e}")
 
                 frame_predictions[face_key] = (label_original, label_enhanced)
 
@@ -108,7 +97,7 @@ def process_webcam(cap, face_cascade):
             if auto_capture:
                 last_predictions = frame_predictions
                 last_capture_time = current_time
-                print("Processed and captured faces after 15 seconds.")
+                print(f"Processed and captured faces after {AUTO_CAPTURE_INTERVAL:.0f} seconds.")
 
             error_message = ""
         else:
@@ -117,6 +106,9 @@ def process_webcam(cap, face_cascade):
                         1.0, (0, 0, 255), 2, cv2.LINE_AA)
 
         cv2.imshow('Face Tracking - Press s to Capture, q to Quit', frame)
+        if recorder is not None:
+            # Never blocks: the frame is dropped if the encoder is behind
+            recorder.write(frame)
 
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
@@ -125,20 +117,14 @@ def process_webcam(cap, face_cascade):
             if len(faces) > 0:
                 capture_triggered = True
                 for i, (x, y, w, h) in enumerate(faces):
-                    face_rgb = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB)
+                    face_rgb = cv2.cvtColor(frame[y:y+h, x:x+w], cv2.COLOR_BGR2RGB, dst=frame_buffers.get('webcam_face_rgb', (h, w, 3)))
                     original_face, enhanced_face = preprocess_face(face_rgb, i+1, face_cascade, show_visualizations=False)
                     if original_face is None or enhanced_face is None:
                         continue
 
                     print(f"Storing manually captured face {i+1} in RGB format.")
-                    original_path = os.path.join(TEMP_DIR, f"original_face_{i}.jpg")
-                    enhanced_path = os.path.join(TEMP_DIR, f"enhanced_face_{i}.jpg")
-                    Image.fromarray(original_face).save(original_path)
-                    Image.fromarray(enhanced_face).save(enhanced_path)
-
                     try:
-                        result_original = DeepFace.analyze(img_path=original_path, actions=DEEPFACE_ACTIONS, enforce_detection=False)
-                        result_enhanced = DeepFace.analyze(img_path=enhanced_path, actions=DEEPFACE_ACTIONS, enforce_detection=False)
+                        result_original, result_enhanced = run_analysis(original_face, enhanced_face, i)
                         label_original = get_pred_label(result_original)
                         label_enhanced = get_pred_label(result_enhanced)
                         face_key = f"{x}_{y}_{w}_{h}"
@@ -146,12 +132,6 @@ def process_webcam(cap, face_cascade):
                         stored_faces.append((original_face, enhanced_face, result_original, result_enhanced))
                     except Exception as e:
                         print(f"DeepFace error for Face {i+1}: {e}")
-                    finally:
-                        try:
-                            os.remove(original_path)
-                            os.remove(enhanced_path)
-                        except OSError as e:
-                            print(f"Error deleting temporary file: {e}")
                 print("Manual capture triggered.")
             else:
                 error_message = "Error: No face detected to capture"
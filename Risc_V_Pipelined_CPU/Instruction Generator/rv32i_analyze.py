@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Static mix and hazard analyzer for corpora of generated RV32I programs.
+Loads any number of .hex/.bin programs into one struct-of-arrays (every word
+of every program back to back, plus where each program starts), decodes them
+with one table lookup and reports what the corpus contains before anything is
+simulated: the instruction mix, RAW / WAW / load-use hazards by distance,
+branch and JAL directions and distances, and writes to x0.
+
+Hazards are counted in program order within each program, the way the
+generator injects them; rv32i_iss.RV32ISim.profile() counts the executed ones.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from rv32i_encoding import compile_decoder, decode_words, label_offsets, np
+from rv32i_iss import load_program
+
+
+# Branch distance histogram, in instructions: 0 (self loop), 1, 2-3, 4-7, ..., 256+
+DISTANCE_BUCKETS = ['0', '1', '2-3', '4-7', '8-15', '16-31', '32-63', '64-127', '128-255', '256+']
+DIRECTIONS = ['backward', 'self', 'forward']
+TABLE_COLUMNS = ['section', 'item', 'count', 'per_100']
+
+if np is not None:
+    # ASCII -> nibble; 255 marks a byte that is not a hex digit
+    _NIBBLE = np.full(256, 255, dtype=np.uint8)
+    for _digit in range(16):
+        _NIBBLE[ord(f"{_digit:x}")] = _NIBBLE[ord(f"{_digit:X}")] = _digit
+
+
+class Corpus(NamedTuple):
+    """Programs stored back to back: words[starts[k]:starts[k + 1]] is paths[k]."""
+    words: 'np.ndarray'       # uint32
+    starts: 'np.ndarray'      # int64, one more entry than paths
+    paths: List[str]
+
+    @property
+    def position(self) -> 'np.ndarray':
+        """Index of every word within its own program."""
+        lengths = np.diff(self.starts)
+        return np.arange(len(self.words)) - np.repeat(self.starts[:-1], lengths)
+
+
+def _parse_hex_lines(data: bytes) -> 'np.ndarray':
+    """Words of a buffer of 8-digit lines ending in \\n, or None if it is not exactly that."""
+    if len(data) % 9:
+        return None
+    lines = np.frombuffer(data, dtype=np.uint8).reshape(-1, 9)
+    nibbles = _NIBBLE[lines[:, :8]]
+    if not (lines[:, 8] == 0x0A).all() or (nibbles == 255).any():
+        return None
+    # Digit pairs make the four big-endian bytes of each word
+    packed = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+    return np.ascontiguousarray(packed).view('>u4').ravel().astype(np.uint32)
+
+
+def load_corpus(paths: Sequence[str]) -> Corpus:
+    """Read programs into one Corpus.
+
+    Generator .hex files (8 digits and \\n per word) are joined and parsed in
+    one vectorized pass; .bin files are read as little-endian words, and any
+    other .hex (CRLF, comments, short lines) goes through load_program().
+    """
+    if np is None:
+        raise RuntimeError("The corpus analyzer requires NumPy (pip install numpy)")
+    buffers = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            buffers.append(f.read())
+
+    fixed = [not path.endswith('.bin') and len(data) % 9 == 0 for path, data in zip(paths, buffers)]
+    joined = _parse_hex_lines(b"".join(data for data, ok in zip(buffers, fixed) if ok))
+    if joined is None:  # One of them only looked fixed-width; sort them out one by one
+        parsed = [_parse_hex_lines(data) if ok else None for data, ok in zip(buffers, fixed)]
+        fixed = [words is not None for words in parsed]
+        joined = _parse_hex_lines(b"".join(data for data, ok in zip(buffers, fixed) if ok))
+
+    chunks, cursor = [], 0
+    for path, data, ok in zip(paths, buffers, fixed):
+        if ok:
+            chunks.append(joined[cursor:cursor + len(data) // 9])
+            cursor += len(data) // 9
+        elif path.endswith('.bin'):
+            chunks.append(np.frombuffer(data[:len(data) // 4 * 4], dtype='<u4').astype(np.uint32))
+        else:
+            chunks.append(np.array(load_program(path), dtype=np.uint32))
+    lengths = [len(chunk) for chunk in chunks]
+    words = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint32)
+    return Corpus(words, np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))), list(paths))
+
+
+def expand_paths(items: Sequence[str]) -> List[str]:
+    """Files as given; directories and globs expand to the .hex programs they hold."""
+    paths = []
+    for item in items:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, '*.hex'))))
+        elif any(c in item for c in '*?['):
+            paths.extend(sorted(glob.glob(item)))
+        else:
+            paths.append(item)
+    return paths
+
+
+@dataclass
+class CorpusStats:
+    """Static counts over a whole corpus."""
+    programs: int
+    instructions: int
+    unknown: int                                        # Words outside the metadata
+    mnemonics: Dict[str, int]
+    categories: Dict[str, int]
+    raw: List[int]                                      # By distance 1..window, nearest writer
+    waw: List[int]
+    load_use: int                                       # RAW at distance 1 on a load
+    x0_writes: int                                      # Instructions that write rd = x0
+    nops: int                                           # Of those, the canonical addi x0, x0, 0
+    jalr: int                                           # Indirect jumps, target unknown statically
+    branches: Dict[str, Dict[str, List[int]]] = field(default_factory=dict)  # branch/jal -> direction -> histogram
+    seconds: float = 0.0
+
+    def rows(self) -> List[Tuple[str, str, int, float]]:
+        """The summary table: (section, item, count, count per 100 instructions)."""
+        per_100 = lambda count: round(100 * count / self.instructions, 3) if self.instructions else 0.0
+        rows = [('corpus', 'programs', self.programs, None),
+                ('corpus', 'instructions', self.instructions, 100.0 if self.instructions else 0.0),
+                ('corpus', 'unknown', self.unknown, per_100(self.unknown))]
+        rows += [('category', name, n, per_100(n)) for name, n in self.categories.items()]
+        rows += [('mnemonic', name, n, per_100(n)) for name, n in self.mnemonics.items()]
+        rows += [('raw', f"distance {d}", n, per_100(n)) for d, n in enumerate(self.raw, 1)]
+        rows += [('raw', 'load_use', self.load_use, per_100(self.load_use))]
+        rows += [('waw', f"distance {d}", n, per_100(n)) for d, n in enumerate(self.waw, 1)]
+        hazards = sum(self.raw) + sum(self.waw)
+        rows += [('hazards', 'total', hazards, per_100(hazards))]
+        for kind, directions in self.branches.items():
+            for direction, histogram in directions.items():
+                rows += [(f"{kind} {direction}", 'total', sum(histogram), per_100(sum(histogram)))]
+                rows += [(f"{kind} {direction}", bucket, n, per_100(n))
+                         for bucket, n in zip(DISTANCE_BUCKETS, histogram) if n]
+        rows += [('jalr', 'indirect', self.jalr, per_100(self.jalr)),
+                 ('x0', 'writes', self.x0_writes, per_100(self.x0_writes)),
+                 ('x0', 'nops', self.nops, per_100(self.nops))]
+        return rows
+
+
+class CorpusAnalyzer:
+    """Per-mnemonic tables for analyzing corpora against one metadata file.
+
+    NOP is left out of the tables; it is encoded as ADDI and counted as one.
+    """
+
+    def __init__(self, metadata: List[Dict]):
+        if np is None:
+            raise RuntimeError("The corpus analyzer requires NumPy (pip install numpy)")
+        self.metadata = [m for m in metadata if m['category'] != 'pseudo']
+        self.decoder = compile_decoder(self.metadata)
+        pattern = [m['operand_pattern'] for m in self.metadata]
+        self.writes_rd = np.array(['rd' in p for p in pattern] + [False])  # Last entry: unknown words
+        self.reads_rs1 = np.array([any('rs1' in op for op in p) for p in pattern] + [False])
+        self.reads_rs2 = np.array(['rs2' in p for p in pattern] + [False])
+        self.is_load = np.array([m['category'] == 'load' for m in self.metadata] + [False])
+        self.categories = list(dict.fromkeys(m['category'] for m in self.metadata))
+        self.category = np.array([self.categories.index(m['category']) for m in self.metadata], dtype=np.int64)
+        # 1 branch, 2 JAL, 3 JALR, 0 anything else
+        self.kind = np.array([1 if m['format'] == 'B' else 2 if m['format'] == 'J' else
+                              3 if m['mnemonic'] == 'JALR' else 0 for m in self.metadata] + [0], dtype=np.int64)
+
+    def analyze(self, corpus: Corpus, window: int = 3) -> CorpusStats:
+        """Count mix, hazards up to window instructions apart, branches and x0 writes."""
+        if not 1 <= window <= 255:
+            raise ValueError(f"hazard window must be 1..255 instructions, got {window}")
+        start = time.perf_counter()
+        w = corpus.words
+        n = len(w)
+        m = decode_words(w, self.decoder)
+        m = np.where(m >= 0, m, len(self.metadata))  # Unknown words index the all-False last entry
+        known = m < len(self.metadata)
+        position = corpus.position
+
+        rd = ((w >> 7) & 0x1F).astype(np.uint8)
+        rs1 = np.where(self.reads_rs1[m], (w >> 15) & 0x1F, 0).astype(np.uint8)
+        rs2 = np.where(self.reads_rs2[m], (w >> 20) & 0x1F, 0).astype(np.uint8)
+        rs2[rs2 == rs1] = 0  # One register read twice is one dependency
+        writes = self.writes_rd[m]
+        dest = np.where(writes, rd, 0).astype(np.uint8)
+
+        def nearest_writer(src: 'np.ndarray') -> 'np.ndarray':
+            """Distance back to the nearest earlier writer of src in the same program, 0 if none in window."""
+            distance = np.zeros(n, dtype=np.uint8)
+            reads = src != 0
+            for d in range(window, 0, -1):  # Far to near, so the nearest wins
+                hit = reads[d:] & (src[d:] == dest[:max(n - d, 0)]) & (position[d:] >= d)
+                distance[d:][hit] = d
+            return distance
+
+        raw_1, raw_2 = nearest_writer(rs1), nearest_writer(rs2)
+        raw = np.bincount(raw_1, minlength=window + 1)[1:] + np.bincount(raw_2, minlength=window + 1)[1:]
+        waw = np.bincount(nearest_writer(dest), minlength=window + 1)[1:]
+        after_load = np.zeros(n, dtype=bool)
+        after_load[1:] = self.is_load[m][:-1]
+        load_use = int(np.count_nonzero(after_load & (raw_1 == 1)) + np.count_nonzero(after_load & (raw_2 == 1)))
+
+        counts = np.bincount(m[known], minlength=len(self.metadata))
+        by_category = np.bincount(self.category[m[known]], minlength=len(self.categories))
+
+        branches = {}
+        kind = self.kind[m]
+        for k, name in [(1, 'branch'), (2, 'jal')]:
+            offset = label_offsets(w[kind == k])
+            distance = np.abs(offset) >> 2
+            # 0 -> bucket 0, then one bucket per power of two up to the last
+            bucket = np.zeros(len(offset), dtype=np.int64)
+            far = distance > 0
+            bucket[far] = np.minimum(np.log2(distance[far]).astype(np.int64) + 1, len(DISTANCE_BUCKETS) - 1)
+            direction = np.sign(offset) + 1  # DIRECTIONS order: backward, self, forward
+            histogram = np.bincount(direction * len(DISTANCE_BUCKETS) + bucket,
+                                    minlength=len(DIRECTIONS) * len(DISTANCE_BUCKETS))
+            histogram = histogram.reshape(len(DIRECTIONS), len(DISTANCE_BUCKETS))
+            branches[name] = {direction_name: histogram[i].tolist() for i, direction_name in enumerate(DIRECTIONS)}
+
+        x0 = writes & (rd == 0)
+        return CorpusStats(
+            programs=len(corpus.paths),
+            instructions=n,
+            unknown=int(n - np.count_nonzero(known)),
+            mnemonics={meta['mnemonic']: int(c) for meta, c in zip(self.metadata, counts)},
+            categories={name: int(c) for name, c in zip(self.categories, by_category)},
+            raw=raw.tolist(),
+            waw=waw.tolist(),
+            load_use=load_use,
+            x0_writes=int(np.count_nonzero(x0)),
+            jalr=int(np.count_nonzero(kind == 3)),
+            nops=int(np.count_nonzero(corpus.words == 0x00000013)),
+            branches=branches,
+            seconds=time.perf_counter() - start,
+        )
+
+
+def format_table(rows: List[Tuple[str, str, int, float]]) -> str:
+    """Aligned text form of the summary table."""
+    width = max(len(f"{section} {item}") for section, item, _, _ in rows)
+    lines = [f"{'':<{width}}  {'count':>10}  {'per 100':>8}"]
+    for section, item, count, per_100 in rows:
+        lines.append(f"{section + ' ' + item:<{width}}  {count:>10}  "
+                     f"{'' if per_100 is None else f'{per_100:8.3f}'}")
+    return "\n".join(lines)
+
+
+def write_table(rows: List[Tuple[str, str, int, float]], path: str):
+    """Write the summary table as CSV, or as JSON when path ends in .json."""
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump([dict(zip(TABLE_COLUMNS, row)) for row in rows], f, indent=2)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(TABLE_COLUMNS)
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static instruction mix and hazard analysis of RV32I test corpora")
+    parser.add_argument("programs", nargs='+',
+                        help="Program images (.hex or .bin), directories of .hex files, or globs")
+    parser.add_argument("--metadata", default="rv32i_metadata.json", help="Instruction metadata JSON")
+    parser.add_argument("--window", type=int, default=3,
+                        help="Furthest hazard distance counted, in instructions (default: %(default)s)")
+    parser.add_argument("-o", "--output", metavar="FILE", help="Write the summary table as CSV (or JSON for .json)")
+    parser.add_argument("--all-mnemonics", action="store_true", help="List mnemonics that never occur too")
+    args = parser.parse_args()
+
+    if not 1 <= args.window <= 255:
+        parser.error("--window must be between 1 and 255")
+    paths = expand_paths(args.programs)
+    if not paths:
+        parser.error("no programs found")
+    with open(args.metadata) as f:
+        analyzer = CorpusAnalyzer(json.load(f))
+
+    start = time.perf_counter()
+    try:
+        corpus = load_corpus(paths)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    loaded = time.perf_counter() - start
+    stats = analyzer.analyze(corpus, args.window)
+
+    rows = stats.rows()
+    shown = rows if args.all_mnemonics else [row for row in rows if row[0] != 'mnemonic' or row[2]]
+    print(format_table(shown))
+    rate = stats.instructions / (loaded + stats.seconds) / 1e6 if loaded + stats.seconds > 0 else 0.0
+    print(f"{stats.programs} programs, {stats.instructions} instructions: loaded in {loaded:.3f}s, "
+          f"analyzed in {stats.seconds:.3f}s ({rate:.1f} M instructions/s)")
+    if args.output:
+        write_table(rows, args.output)
+        print(f"Summary written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
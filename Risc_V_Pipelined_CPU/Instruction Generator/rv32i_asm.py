@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Disassembler and two-pass assembler for generated RV32I programs.
+Both are driven by rv32i_metadata.json: words are decoded through the
+decode index rv32i_encoding shares with coverage and analysis, rendered in
+the .S dialect the generator writes, and that dialect (labels included) assembles back through the same
+pack_fields() the generator uses, so words round-trip bit-exactly.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from rv32i_encoding import (KIND_B, KIND_I, KIND_J, KIND_R, KIND_S, KIND_SHIFT, KIND_U, Encoding, compile_encodings,
+                            decode_index, decode_key, pack_fields)
+from rv32i_images import DEFAULT_FORMATS, FORMATS, IMEM_DEPTH, write_images
+from rv32i_iss import load_program
+from rv32i_program import render_fields
+
+
+# ABI register names, accepted by the assembler next to x0-x31
+ABI_NAMES = ['zero', 'ra', 'sp', 'gp', 'tp', 't0', 't1', 't2', 's0', 's1'] + \
+            [f'a{i}' for i in range(8)] + [f's{i}' for i in range(2, 12)] + [f't{i}' for i in range(3, 7)]
+REGISTERS = {**{f'x{i}': i for i in range(32)}, **{name: i for i, name in enumerate(ABI_NAMES)}, 'fp': 8}
+
+# Directives of the generator's listings that do not emit anything
+IGNORED_DIRECTIVES = ['.text', '.globl', '.global']
+
+# Label operand given as an offset from the instruction itself, e.g. "beq x1, x2, .+8"
+_RELATIVE = re.compile(r'^\.\s*([+-])\s*(\w+)$')
+_MEMORY_OPERAND = re.compile(r'^(.*)\(\s*(\w+)\s*\)$')
+_LABEL = re.compile(r'^\s*([A-Za-z_.$][\w.$]*)\s*:')
+# Encoding comment of a listing line: "    addi x1, x2, 3    # 0x00310093"
+_LISTED_WORD = re.compile(r'#\s*0x([0-9a-fA-F]{8})\s*$')
+
+
+class Decoded(NamedTuple):
+    """Fields of one decoded word, named and filled in like InstructionObject."""
+    mnemonic: str
+    rd: Optional[int] = None
+    rs1: Optional[int] = None
+    rs2: Optional[int] = None
+    imm: Optional[int] = None
+    shamt: Optional[int] = None
+
+
+def _sext(value: int, bits: int) -> int:
+    return value - (1 << bits) if value >> (bits - 1) & 1 else value
+
+
+def _fields(kind: int, word: int) -> Tuple:
+    """(rd, rs1, rs2, imm, shamt) of a word, for the fields its packing kind has."""
+    rd = (word >> 7) & 0x1F
+    rs1 = (word >> 15) & 0x1F
+    rs2 = (word >> 20) & 0x1F
+    if kind == KIND_R:
+        return rd, rs1, rs2, None, None
+    if kind == KIND_I:
+        return rd, rs1, None, _sext(word >> 20, 12), None
+    if kind == KIND_SHIFT:
+        return rd, rs1, None, None, rs2
+    if kind == KIND_S:
+        return None, rs1, rs2, _sext(((word >> 25) << 5) | rd, 12), None
+    if kind == KIND_B:
+        imm = ((word >> 31) << 12) | (((word >> 7) & 1) << 11) | (((word >> 25) & 0x3F) << 5) | \
+              (((word >> 8) & 0xF) << 1)
+        return None, rs1, rs2, _sext(imm, 13), None
+    if kind == KIND_U:
+        return rd, None, None, word >> 12, None
+    if kind == KIND_J:
+        imm = ((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12) | (((word >> 20) & 1) << 11) | \
+              (((word >> 21) & 0x3FF) << 1)
+        return rd, None, None, _sext(imm, 21), None
+    return None, None, None, None, None  # KIND_SYS, KIND_FENCE: no operands in the dialect
+
+
+class InstructionSet:
+    """Decode index and assembler tables compiled from the instruction metadata.
+
+    Words are looked up in the rv32i_encoding.decode_index() that coverage and
+    analysis decode through. Pseudo instructions are not indexed, so words
+    decode to the base instruction. A word only decodes when its fields pack
+    back to exactly that word, so non-zero bits the encoding fixes (funct7,
+    the operands of ECALL/EBREAK) make it a .word.
+    """
+
+    def __init__(self, metadata: List[Dict]):
+        self.metadata = metadata
+        self.encodings = compile_encodings(metadata)
+        self.meta = {meta['mnemonic']: meta for meta in metadata}
+        self.by_name = {meta['mnemonic'].lower(): meta for meta in metadata}
+
+        decodable = [meta for meta in metadata if meta['category'] != 'pseudo']
+        self.index: List[Optional[Encoding]] = [self.encodings[decodable[i]['mnemonic']] if i >= 0 else None
+                                                for i in decode_index(decodable)]
+
+    @classmethod
+    def load(cls, path: str = "rv32i_metadata.json") -> 'InstructionSet':
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    # --- disassembly ------------------------------------------------------
+
+    def decode(self, word: int) -> Optional[Decoded]:
+        """Fields of a word, or None when no instruction of the metadata encodes to exactly it."""
+        enc = self.index[decode_key(word)]
+        if enc is None:
+            return None
+        fields = _fields(enc.kind, word)
+        return Decoded(enc.mnemonic, *fields) if pack_fields(enc, *fields) == word else None
+
+    def render(self, decoded: Decoded, label: Optional[str] = None) -> str:
+        """Assembly text of decoded fields, as the generator's listings write it."""
+        if label is None and decoded.imm is not None:
+            label = f".{decoded.imm:+d}"
+        return render_fields(self.meta[decoded.mnemonic], decoded.rd, decoded.rs1, decoded.rs2, decoded.imm,
+                             decoded.shamt, label)
+
+    def disassemble(self, words: Sequence[int]) -> List[str]:
+        """Listing lines of a program, in the format of the generator's .S files.
+
+        Branch and jump targets inside the program (or just past its end) get
+        an L<index> label line; other targets are written relative to the
+        instruction. Words no instruction encodes to become .word lines.
+        """
+        decoded = [self.decode(word) for word in words]
+        targets = {}
+        for i, d in enumerate(decoded):
+            if d is not None and self.meta[d.mnemonic]['format'] in ('B', 'J') and d.imm % 4 == 0 \
+                    and 0 <= i + d.imm // 4 <= len(words):
+                targets[i] = i + d.imm // 4
+        labelled = set(targets.values())
+
+        lines = []
+        for i, (word, d) in enumerate(zip(words, decoded)):
+            if i in labelled:
+                lines.append(f"L{i}:")
+            if d is None:
+                text = f".word 0x{word:08x}"
+            else:
+                text = self.render(d, f"L{targets[i]}" if i in targets else None)
+            lines.append(f"    {text:<30}  # 0x{word:08x}")
+        if len(words) in labelled:
+            lines.append(f"L{len(words)}:")
+        return lines
+
+    # --- assembly ---------------------------------------------------------
+
+    def assemble(self, lines: Iterable[str], source: str = "<input>") -> List[int]:
+        """Words of a program in the generator's .S dialect.
+
+        Pass one collects labels and statements, pass two encodes them, so
+        labels can be used before they are defined. Also accepted: ABI
+        register names, hex/decimal immediates, .word, bare nop, fence with
+        "iorw, iorw" and label operands relative to the instruction (.+8).
+        Immediates are truncated to their field exactly as the generator's
+        packer truncates them.
+        """
+        labels: Dict[str, int] = {}
+        statements: List[Tuple[int, str, str]] = []  # (line number, mnemonic or directive, operands)
+        for number, line in enumerate(lines, 1):
+            line = line.split('#', 1)[0]
+            match = _LABEL.match(line) if ':' in line else None
+            while match:
+                if match.group(1) in labels:
+                    raise ValueError(f"{source}:{number}: label '{match.group(1)}' defined twice")
+                labels[match.group(1)] = len(statements)
+                line = line[match.end():]
+                match = _LABEL.match(line)
+            parts = line.split(None, 1)
+            if not parts:
+                continue
+            name = parts[0].lower()
+            operands = parts[1].strip() if len(parts) > 1 else ""
+            if name in IGNORED_DIRECTIVES:
+                continue
+            if name == '.word':
+                for value in operands.split(','):
+                    statements.append((number, name, value.strip()))
+            elif name.startswith('.'):
+                raise ValueError(f"{source}:{number}: unsupported directive '{parts[0]}'")
+            else:
+                statements.append((number, name, operands))
+
+        words = []
+        for index, (number, name, operands) in enumerate(statements):
+            try:
+                words.append(self._encode(index, name, operands, labels))
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"{source}:{number}: {e.args[0] if e.args else e}") from None
+        return words
+
+    def _encode(self, index: int, name: str, operands: str, labels: Dict[str, int]) -> int:
+        """Word of one statement at instruction index."""
+        if name == '.word':
+            return _integer(operands) & 0xFFFFFFFF
+        meta = self.by_name.get(name)
+        if meta is None:
+            raise ValueError(f"unknown instruction '{name}'")
+        pattern = meta['operand_pattern']
+        tokens = [token.strip() for token in operands.split(',')] if operands else []
+        if name == 'nop' and not tokens:
+            tokens = ['x0', 'x0', '0']
+        elif name == 'fence':
+            if tokens not in ([], ['iorw', 'iorw']):
+                raise ValueError("fence only encodes the default 'iorw, iorw' ordering")
+            tokens, pattern = [], []
+        if len(tokens) != len(pattern):
+            raise ValueError(f"{name} takes {len(pattern)} operand(s) ({', '.join(pattern) or 'none'}), "
+                             f"got {len(tokens)}")
+
+        fields = {'rd': None, 'rs1': None, 'rs2': None, 'imm': None, 'shamt': None}
+        for op, token in zip(pattern, tokens):
+            if op in ('rd', 'rs1', 'rs2'):
+                fields[op] = _register(token)
+            elif op in ('imm', 'imm20', 'shamt'):
+                fields['shamt' if op == 'shamt' else 'imm'] = _integer(token)
+            elif op == 'label':
+                fields['imm'] = self._label_offset(index, token, labels, meta['format'])
+            elif 'imm(rs1)' in op:
+                match = _MEMORY_OPERAND.match(token)
+                if match is None:
+                    raise ValueError(f"expected offset(register), got '{token}'")
+                fields['imm'] = _integer(match.group(1).strip() or '0')
+                fields['rs1'] = _register(match.group(2))
+        return pack_fields(self.encodings[meta['mnemonic']], **fields)
+
+    @staticmethod
+    def _label_offset(index: int, token: str, labels: Dict[str, int], fmt: str) -> int:
+        """Byte offset of a label operand from the instruction at index."""
+        relative = _RELATIVE.match(token)
+        if relative:
+            offset = _integer(relative.group(2)) * (-1 if relative.group(1) == '-' else 1)
+        elif token in labels:
+            offset = (labels[token] - index) * 4
+        else:
+            raise ValueError(f"undefined label '{token}'")
+        limit = 1 << 12 if fmt == 'B' else 1 << 20
+        if offset % 2 or not -limit <= offset < limit:
+            raise ValueError(f"branch offset {offset} is out of range or odd")
+        return offset
+
+
+def _integer(token: str) -> int:
+    try:
+        return int(token, 0)
+    except ValueError:
+        raise ValueError(f"expected an integer, got '{token}'") from None
+
+
+def _register(token: str) -> int:
+    register = REGISTERS.get(token.lower())
+    if register is None:
+        raise ValueError(f"expected a register, got '{token}'")
+    return register
+
+
+def load_words(path: str, metadata: str = "rv32i_metadata.json") -> List[int]:
+    """Words of a program from a .S listing (assembled) or a .hex/.bin image."""
+    if not path.endswith(('.S', '.s')):
+        return load_program(path)
+    with open(path, 'r') as f:
+        return InstructionSet.load(metadata).assemble(f, path)
+
+
+def check_round_trip(isa: InstructionSet, words: Sequence[int], source: Optional[List[str]] = None) -> Optional[str]:
+    """Why words do not survive disassembly and reassembly unchanged, or None.
+
+    With the .S source they came from, its per-line encoding comments, if it
+    has any, must list the same words too.
+    """
+    if source is not None:
+        listed = [int(match.group(1), 16) for match in map(_LISTED_WORD.search, source)
+                  if match and not match.string.lstrip().startswith('#')]
+        if listed and listed != list(words):
+            return "the assembled words differ from the listing's encoding comments"
+    again = isa.assemble(isa.disassemble(words))
+    for i, (word, word_again) in enumerate(zip(words, again)):
+        if word != word_again:
+            return f"word {i}: 0x{word:08x} reassembles to 0x{word_again:08x}"
+    if len(again) != len(words):
+        return f"{len(words)} words reassemble to {len(again)}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Disassemble RV32I programs or assemble generator .S listings")
+    parser.add_argument("program", help=".hex/.bin to disassemble, or .S listing to assemble")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Output: .S path when disassembling, file prefix when assembling "
+                             "(default: print the listing / <program>_asm)")
+    parser.add_argument("--metadata", default="rv32i_metadata.json", help="Instruction metadata JSON")
+    parser.add_argument("--formats", default=",".join(DEFAULT_FORMATS),
+                        help="Formats written when assembling (default: %(default)s)")
+    parser.add_argument("--imem-depth", type=int, default=IMEM_DEPTH,
+                        help="Words per memory image when assembling (default: %(default)s)")
+    parser.add_argument("--check", action="store_true",
+                        help="Verify the round trip: words -> listing -> words (and, for .S input, "
+                             "that every line's encoding comment matches)")
+    args = parser.parse_args()
+
+    isa = InstructionSet.load(args.metadata)
+    assembling = args.program.endswith(('.S', '.s'))
+    start = time.perf_counter()
+    if assembling:
+        with open(args.program, 'r') as f:
+            source = f.read().splitlines()
+        try:
+            words = isa.assemble(source, args.program)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        words = load_program(args.program)
+        listing = isa.disassemble(words)
+    elapsed = time.perf_counter() - start
+    rate = len(words) / elapsed / 1e3 if elapsed > 0 else 0.0
+
+    if assembling:
+        formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+        unknown = [fmt for fmt in formats if fmt not in FORMATS]
+        if unknown:
+            parser.error(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(FORMATS)}")
+        prefix = args.output or os.path.splitext(args.program)[0] + "_asm"
+        files = write_images(words, prefix, formats, args.imem_depth)
+        print(f"Assembled {len(words)} instructions in {elapsed:.3f}s ({rate:.0f} k instr/s)")
+        for kind, path in files.items():
+            print(f"{kind.capitalize()} written to: {', '.join(path) if isinstance(path, list) else path}")
+    else:
+        text = ".text\n.globl _start\n_start:\n" + "".join(line + "\n" for line in listing)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text)
+            print(f"Disassembled {len(words)} instructions in {elapsed:.3f}s ({rate:.0f} k instr/s)")
+            print(f"Listing written to: {args.output}")
+        else:
+            print(text, end="")
+
+    if args.check:
+        problem = check_round_trip(isa, words, source if assembling else None)
+        if problem:
+            raise SystemExit(f"Round trip FAILED: {problem}")
+        print(f"Round trip OK: {len(words)} words", file=sys.stderr if not assembling and not args.output else sys.stdout)
+
+if __name__ == "__main__":
+    main()
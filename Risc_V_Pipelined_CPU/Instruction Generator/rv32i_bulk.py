@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+NumPy bulk sampling engine for the RV32I generator.
+Draws every instruction field of a test as an array from a seeded
+numpy.random.Generator, applies hazard injection and the memory map as
+vectorized post-passes, and packs and renders the program in one go. It
+samples the same distributions as the per-instruction engine but from a
+different random stream, so a seed reproduces a test only within the engine
+that generated it.
+"""
+
+from typing import Dict, List
+
+from rv32i_config import SYSTEM_LIMITS
+from rv32i_encoding import pack_program, np
+
+
+# Which immediate an operand pattern draws
+IMM_NONE, IMM_ARITH, IMM_SHAMT, IMM_UPPER, IMM_MEM, IMM_LABEL = range(6)
+
+# Hex digits as ASCII codes, indexed by digit value
+_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8) if np is not None else None
+
+# Width of the text column of a listing line, as in test_generator's "{text:<30}"
+TEXT_WIDTH = 30
+
+
+def _strings(strings: List[str]):
+    """Byte rows of strings, left aligned, and the mask of their characters.
+
+    Rendering works on such (chars, keep) pairs: concatenated along rows they
+    make a line's text, and chars[keep] packs it without the padding.
+    """
+    width = max(map(len, strings))
+    chars = np.frombuffer("".join(s.ljust(width) for s in strings).encode('ascii'), dtype=np.uint8)
+    lengths = np.array([len(s) for s in strings])
+    return chars.reshape(len(strings), width), np.arange(width) < lengths[:, None]
+
+
+def _repeat(text: str, count: int):
+    """The same text on count rows."""
+    chars, keep = _strings([text])
+    return np.broadcast_to(chars, (count, chars.shape[1])), np.broadcast_to(keep, (count, keep.shape[1]))
+
+
+def _digits(values: 'np.ndarray', base: int, prefix: str):
+    """prefix followed by the digits of each non-negative value, without leading zeros."""
+    width = 1
+    while (values >= base ** width).any():
+        width += 1
+    power = base ** np.arange(width - 1, -1, -1)
+    chars = _DIGITS[values[:, None] // power % base]
+    keep = (values[:, None] >= power) | (power == 1)
+    head_chars, head_keep = _repeat(prefix, len(values))
+    return np.concatenate([head_chars, chars], axis=1), np.concatenate([head_keep, keep], axis=1)
+
+
+def _decimal(values: 'np.ndarray'):
+    """Decimal text of signed values, like str()."""
+    chars, keep = _digits(np.abs(values), 10, "-")
+    keep[:, 0] = values < 0
+    return chars, keep
+
+
+class BulkEngine:
+    """Generates whole tests as field arrays for one RV32IGenerator."""
+
+    def __init__(self, gen):
+        if np is None:
+            raise RuntimeError("The numpy engine requires NumPy (pip install numpy)")
+        self.plan = gen.plan
+        self.metadata = gen.metadata
+
+        # Per-mnemonic tables, indexed by position in the metadata list
+        enc = [gen.encodings[m['mnemonic']] for m in self.metadata]
+        self.kind = np.array([e.kind for e in enc], dtype=np.int64)
+        self.base = np.array([e.base for e in enc], dtype=np.int64)
+        self.has_rd = np.array(['rd' in m['operand_pattern'] for m in self.metadata])
+        self.has_rs1 = np.array([any('rs1' in op for op in m['operand_pattern']) for m in self.metadata])
+        self.has_rs2 = np.array(['rs2' in m['operand_pattern'] for m in self.metadata])
+        self.imm_kind = np.array([self._imm_kind(m['operand_pattern']) for m in self.metadata], dtype=np.int64)
+        self.is_load = np.array([m['category'] == 'load' for m in self.metadata])
+        self.is_store = np.array([m['category'] == 'store' for m in self.metadata])
+        self.access_size = np.array([1 << (e.funct3 & 3) for e in enc], dtype=np.int64)
+        self.is_jal = np.array([m['mnemonic'] == 'JAL' for m in self.metadata])
+        self.is_branch = np.array([m['format'] == 'B' for m in self.metadata])
+        self.is_jump = np.array([m['format'] == 'J' for m in self.metadata])
+        self.jal = int(np.flatnonzero(self.is_jal)[0])
+        self.addi = next(i for i, m in enumerate(self.metadata) if m['mnemonic'] == 'ADDI')
+        # (positions of the group's mnemonics, cap) per system_freq key
+        self.system_limits = [(np.array([i for i, m in enumerate(self.metadata) if m['mnemonic'] in mnemonics]),
+                               self.plan.system_caps[key]) for key, mnemonics in SYSTEM_LIMITS.items()]
+
+        plan = self.plan
+        self.mnemonic_cdf = self._cdf(np.cumsum(list(gen.mnemonic_probabilities().values())))
+        self.arith_cdf = self._cdf(plan.arith_buckets.cum_weights)
+        self.mem_cdf = self._cdf(plan.mem_buckets.cum_weights)
+        self.branch_cdf = self._cdf(plan.branch_distances.cum_weights)
+        self.branch_max_dist = np.array([plan.branch_max_dist[k] for k in plan.branch_distances.keys])
+        self.hazard_distances = np.array([int(d) for d in plan.raw_distances.keys])
+        self.raw_cdf = self._cdf(plan.raw_distances.cum_weights)
+        self.waw_cdf = self._cdf(plan.waw_distances.cum_weights)
+
+        # Operand text of every register and 12-bit immediate, for render()
+        self.reg_text = _strings([f"x{r}" for r in range(32)])
+        self.imm_text = _strings([str(v) for v in range(-2048, 2048)])
+
+        # Without register values to go by, loads and stores in the memory map are based
+        # on x0, so every region has to lie within reach of a 12-bit offset
+        if plan.memory_map:
+            if any(base + size > 2048 for base, size in plan.memory_regions):
+                raise ValueError("The numpy engine addresses the memory map off x0, so its regions must end "
+                                 "by 0x800; use --engine python for higher regions")
+            self.address_cdf = self._cdf(plan.mem_addresses.cum_weights)
+            self.region_base = np.array([base for base, _ in plan.memory_regions], dtype=np.int64)
+            self.region_size = np.array([size for _, size in plan.memory_regions], dtype=np.int64)
+            self.region_cdf = self._cdf(np.cumsum(self.region_size))
+
+    @staticmethod
+    def _imm_kind(pattern: List[str]) -> int:
+        for op in pattern:
+            if op == 'imm':
+                return IMM_ARITH
+            if op == 'shamt':
+                return IMM_SHAMT
+            if op == 'imm20':
+                return IMM_UPPER
+            if 'imm(rs1)' in op:
+                return IMM_MEM
+            if op == 'label':
+                return IMM_LABEL
+        return IMM_NONE
+
+    @staticmethod
+    def _cdf(cum_weights) -> 'np.ndarray':
+        """Normalize cumulative weights into a CDF."""
+        cdf = np.asarray(cum_weights, dtype=np.float64)
+        return cdf / cdf[-1]
+
+    @staticmethod
+    def _pick(rng, cdf, count: int) -> 'np.ndarray':
+        """Inverse-CDF sampling of count category indices."""
+        return np.minimum(np.searchsorted(cdf, rng.random(count), side='right'), len(cdf) - 1)
+
+    def _arith_imm(self, rng, count: int) -> 'np.ndarray':
+        # Buckets in plan order: small, boundary, medium, random_full, special_pattern
+        bucket = self._pick(rng, self.arith_cdf, count)
+        values = rng.integers(-2048, 2048, count)  # random_full
+        values = np.where(bucket == 0, rng.integers(-1, 2, count), values)
+        values = np.where(bucket == 1, rng.choice(self.plan.boundary_values, count), values)
+        values = np.where(bucket == 2, rng.integers(-32, 33, count), values)
+        values = np.where(bucket == 4, rng.choice(self.plan.special_values, count), values)
+        return values
+
+    def _mem_offset(self, rng, count: int) -> 'np.ndarray':
+        keys = self.plan.mem_buckets.keys
+        bucket = self._pick(rng, self.mem_cdf, count)
+        offsets = np.zeros(count, dtype=np.int64)  # near_zero
+        for b, (start, stop) in ((keys.index(name), span) for name, span in self.plan.mem_ranges.items()):
+            # Same values as randrange(start, stop, 4)
+            steps = rng.integers(0, len(range(start, stop, 4)), count)
+            offsets = np.where(bucket == b, start + 4 * steps, offsets)
+        return np.clip(offsets, -2048, 2047)
+
+    def _mem_addresses(self, rng, m: 'np.ndarray') -> 'np.ndarray':
+        """Naturally aligned memory-map addresses for the loads and stores m, in program order.
+
+        Drawn like RV32IGenerator._choose_mem_address: a random slot (regions
+        weighted by size), a region's first or last slot, or the address of one
+        of the 8 latest stores.
+        """
+        count = m.size
+        size = self.access_size[m]
+        # Keys in plan order: random, boundary, reuse
+        choice = self._pick(rng, self.address_cdf, count)
+        region = self._pick(rng, self.region_cdf, count)
+        base, span = self.region_base[region], self.region_size[region]
+        addresses = base + size * rng.integers(0, (span - size) // size + 1)
+        boundary = np.where(rng.random(count) < 0.5, base, base + span - size)
+        addresses = np.where(choice == 1, boundary, addresses)
+
+        # A reused address may itself be a reuse, so sources are followed to the
+        # store that chose it, keeping the alignment of every access on the way
+        store = self.is_store[m]
+        stores = np.flatnonzero(store)
+        earlier = np.cumsum(store) - store
+        reuse = (choice == 2) & (earlier > 0)
+        back = rng.integers(1, np.minimum(np.maximum(earlier, 1), 8) + 1)
+        source = np.where(reuse, stores[np.maximum(earlier - back, 0)] if stores.size else 0, np.arange(count))
+        mask = -size
+        while True:
+            mask &= mask[source]
+            jumped = source[source]
+            if np.array_equal(jumped, source):
+                break
+            source = jumped
+        return addresses[source] & mask
+
+    def _upper20(self, rng, count: int) -> 'np.ndarray':
+        symbolic = rng.choice(self.plan.upper_symbolic_values, count)
+        return np.where(rng.random(count) < self.plan.upper_symbolic_fraction,
+                        symbolic, rng.integers(0, 0x100000, count))
+
+    def _branch_targets(self, rng, sites: 'np.ndarray', length: int):
+        """Targets for the label sites; returns (targets, backward branch count)."""
+        count = sites.size
+        max_dist = self.branch_max_dist[self._pick(rng, self.branch_cdf, count)]
+
+        # Backward only while under the loop depth limit; the rest fall through to forward
+        last = sites == length - 1  # Self-loop at the end
+        wants_back = (rng.random(count) < 0.5) & (sites > 0) & ~last if self.plan.allow_backward \
+            else np.zeros(count, dtype=bool)
+        backward = wants_back & (np.cumsum(wants_back) <= self.plan.max_backward_depth)
+        back_span = np.maximum(np.minimum(max_dist, sites), 1)
+        fwd_span = np.maximum(np.minimum(max_dist, length - sites - 1), 1)
+        back = sites - rng.integers(1, back_span + 1)
+        fwd = np.minimum(sites + rng.integers(1, fwd_span + 1), length - 1)
+        targets = np.where(last, sites, np.where(backward, back, fwd))
+        return targets, int(np.count_nonzero(backward))
+
+    def sample(self, length: int, seed: int) -> Dict[str, 'np.ndarray']:
+        """Draw all instruction fields of a test; returns a dict of equally long arrays."""
+        rng = np.random.default_rng(seed)
+        plan = self.plan
+        index = np.arange(length)
+
+        m = self._pick(rng, self.mnemonic_cdf, length)
+        # FENCE and system calls halt the run: the first ones within their system_freq cap move, in
+        # order, to the tail just before the last instruction and every draw becomes ADDI, as in
+        # the per-instruction engine
+        drawn = np.isin(m, np.concatenate([group for group, _ in self.system_limits]))
+        kept = np.sort(np.concatenate([np.flatnonzero(np.isin(m, group))[:cap] for group, cap in self.system_limits]))
+        held = m[kept]
+        m[drawn] = self.addi
+        tail = np.arange(max(length - 1 - held.size, 0), length - 1)
+        m[tail] = held[:tail.size]
+        has_rd, has_rs1, has_rs2 = self.has_rd[m], self.has_rs1[m], self.has_rs2[m]
+        imm_kind = self.imm_kind[m]
+
+        rd = rng.integers(0, 32, length)
+        rd = np.where(self.is_jal[m] & (rng.random(length) < plan.ra_fraction), 1, rd)
+        rs1 = rng.integers(0, 32, length)
+        rs2 = rng.integers(0, 32, length)
+
+        imm = np.zeros(length, dtype=np.int64)
+        target = np.full(length, -1, dtype=np.int64)
+        mem = imm_kind == IMM_MEM
+        if plan.memory_map:
+            imm[mem] = self._mem_addresses(rng, m[mem])  # Based on x0 after the hazard post-pass
+        elif mem.any():
+            count = int(np.count_nonzero(mem))
+            sp = rng.random(count) < plan.sp_fraction
+            rs1[mem] = np.where(sp, 2, rng.integers(1, 32, count))  # Avoid x0 as base
+            imm[mem] = self._mem_offset(rng, count)
+        for kind, sampler in [(IMM_ARITH, self._arith_imm), (IMM_UPPER, self._upper20),
+                              (IMM_SHAMT, lambda r, c: r.integers(plan.shamt_range[0], plan.shamt_range[1] + 1, c))]:
+            mask = imm_kind == kind
+            if mask.any():
+                imm[mask] = sampler(rng, int(np.count_nonzero(mask)))
+        sites = np.flatnonzero(imm_kind == IMM_LABEL)
+        target[sites], backward_branches = self._branch_targets(rng, sites, length)
+
+        # Hazard post-pass, like the per-instruction scoreboard: each producer sits a
+        # drawn distance back, and rs2 draws its own RAW. WAW copies the producer's
+        # final rd, so chains of WAWs are resolved by pointer jumping.
+        raw, raw2, waw, load_use = (rng.random(length) < p for p in
+                                    [plan.raw_prob, plan.raw_prob, plan.waw_prob, plan.load_use_prob])
+        raw_at, raw2_at, waw_at = (index - self.hazard_distances[self._pick(rng, cdf, length)]
+                                   for cdf in [self.raw_cdf, self.raw_cdf, self.waw_cdf])
+        waw &= has_rd & (waw_at >= 0) & has_rd[np.maximum(waw_at, 0)]
+        source = np.where(waw, waw_at, index)
+        while True:
+            jumped = source[source]
+            if np.array_equal(jumped, source):
+                break
+            source = jumped
+        rd = rd[source]
+
+        def producer(at):
+            """rd of the instruction at each index in at, 0 where there is none."""
+            valid = (at >= 0) & has_rd[np.maximum(at, 0)]
+            return np.where(valid, rd[np.maximum(at, 0)], 0)
+        raw_rd, raw2_rd, prev_rd = producer(raw_at), producer(raw2_at), producer(index - 1)
+        raw &= raw_rd != 0
+        rs1 = np.where(raw & has_rs1, raw_rd, rs1)
+        rs2 = np.where(raw & ~has_rs1 & has_rs2, raw_rd, rs2)
+        rs2 = np.where(raw2 & has_rs1 & has_rs2 & (raw2_rd != 0), raw2_rd, rs2)
+        prev_load = np.concatenate(([False], self.is_load[m][:-1]))
+        rs1 = np.where(load_use & prev_load & has_rs1, prev_rd, rs1)
+        if plan.memory_map:
+            rs1[mem] = 0  # Loads and stores keep the RAW hazards on the stored value only
+
+        # Label offsets with the same range fallback as the per-instruction engine
+        offset = (target - index) * 4
+        too_far = (self.is_branch[m] & (np.abs(offset) >= 4096)) | (self.is_jump[m] & (np.abs(offset) >= 1 << 20))
+        imm = np.where(imm_kind == IMM_LABEL, np.where(too_far, 4, offset), imm)
+
+        return {
+            'mnemonic': m,
+            'rd': np.where(has_rd, rd, 0),
+            'rs1': np.where(has_rs1, rs1, 0),
+            'rs2': np.where(has_rs2, rs2, 0),
+            'imm': imm,  # Shift amount for shifts, byte offset for branches/jumps
+            'target': target,
+            'backward_branches': backward_branches,
+        }
+
+    def fall_through(self, fields: Dict, index: int):
+        """Re-encode the branch or jump at index to continue with the next instruction.
+
+        JALR becomes JAL, keeping its link write; the last instruction becomes
+        a self-loop, like RV32IGenerator._patch_fall_through.
+        """
+        if 0 <= fields['target'][index] < index:
+            fields['backward_branches'] -= 1
+        if self.imm_kind[fields['mnemonic'][index]] != IMM_LABEL:  # JALR
+            fields['mnemonic'][index] = self.jal
+            fields['rs1'][index] = 0
+        target = min(index + 1, len(fields['mnemonic']) - 1)
+        fields['target'][index] = target
+        fields['imm'][index] = (target - index) * 4
+
+    def pack(self, fields: Dict) -> 'np.ndarray':
+        """Pack sampled fields into a uint32 word array."""
+        m = fields['mnemonic']
+        return pack_program(self.kind[m], self.base[m], fields['rd'], fields['rs1'], fields['rs2'], fields['imm'])
+
+    def _operand(self, op: str, fields: Dict, idx: 'np.ndarray') -> List:
+        """(chars, keep) pieces of one operand for the instructions at idx, as in render_fields."""
+        def table(text, values):
+            chars, keep = text
+            return chars[values], keep[values]
+
+        def number(values):
+            # Special values such as 2048 fall outside the 12-bit table
+            if values.size and -2048 <= values.min() and values.max() < 2048:
+                return table(self.imm_text, values + 2048)
+            return _decimal(values)
+        if op in ['rd', 'rs1', 'rs2']:
+            return [table(self.reg_text, fields[op][idx])]
+        if op in ['imm', 'shamt']:
+            return [number(fields['imm'][idx])]
+        if op == 'imm20':
+            return [_digits(fields['imm'][idx], 16, "0x")]
+        if op == 'label':
+            return [_digits(fields['target'][idx], 10, "L")]
+        # imm(rs1)
+        return [number(fields['imm'][idx]), _repeat("(", idx.size),
+                table(self.reg_text, fields['rs1'][idx]), _repeat(")", idx.size)]
+
+    def _text(self, meta: Dict, fields: Dict, idx: 'np.ndarray'):
+        """(chars, keep) of the assembly text of the instructions at idx, all of mnemonic meta."""
+        mnem = meta['mnemonic'].lower()
+        pattern = [] if mnem in ['ecall', 'ebreak', 'fence', 'fence.i'] else meta['operand_pattern']
+        pieces = [_repeat(f"{mnem} " if pattern else mnem, idx.size)]
+        for i, op in enumerate(pattern):
+            if i:
+                pieces.append(_repeat(", ", idx.size))
+            pieces.extend(self._operand(op, fields, idx))
+        return np.concatenate([c for c, _ in pieces], axis=1), np.concatenate([k for _, k in pieces], axis=1)
+
+    def render(self, fields: Dict, words: 'np.ndarray') -> List[str]:
+        """Render the .S listing lines, labels included.
+
+        Text matches rv32i_program.render_fields and test_generator's line
+        format. Every instruction line has the same width, so the lines are
+        one byte matrix: the encoding comment is filled in by column and each
+        mnemonic's texts are scattered into it; the labels are inserted last.
+        """
+        m = fields['mnemonic']
+        count = len(m)
+        texts = []  # (rows, packed text bytes, text lengths) per mnemonic
+        order = np.argsort(m, kind='stable')
+        groups = np.split(order, np.cumsum(np.bincount(m, minlength=len(self.metadata)))[:-1])
+        for meta, idx in zip(self.metadata, groups):
+            if idx.size:
+                chars, keep = self._text(meta, fields, idx)
+                texts.append((idx, chars[keep], np.count_nonzero(keep, axis=1)))
+
+        # "    <text, padded>  # 0x<word>\n"
+        text_width = max([TEXT_WIDTH] + [int(lengths.max()) for _, _, lengths in texts])
+        tail = np.frombuffer(b"  # 0x00000000\n", dtype=np.uint8)
+        width = 4 + text_width + tail.size
+        lines = np.full((count, width), ord(' '), dtype=np.uint8)
+        lines[:, -tail.size:] = tail
+        hex_words = words.astype('>u4').tobytes().hex().encode('ascii')
+        lines[:, -9:-1] = np.frombuffer(hex_words, dtype=np.uint8).reshape(count, 8)
+        flat = lines.reshape(-1)
+        for idx, text, lengths in texts:
+            # Byte j of a row's text goes to column 4 + j of its line
+            starts = idx * width + 4 - (np.cumsum(lengths) - lengths)
+            flat[np.repeat(starts, lengths) + np.arange(text.size)] = text
+        listing = np.array(flat.tobytes().decode('ascii').split("\n")[:-1], dtype=object)
+
+        target = fields['target']
+        labels = np.unique(target[target >= 0])
+        return np.insert(listing, labels, [f"L{i}:" for i in labels.tolist()]).tolist()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Config compiler for the RV32I generator.
+Validates config_defaults.json against a schema and compiles it into a
+SamplingPlan: cumulative weight tables for every weighted choice plus the
+scalar parameters the hot sampling methods need. Plans are cached on disk,
+keyed by a hash of the config contents.
+"""
+
+import hashlib
+import json
+import os
+import random
+from bisect import bisect
+from dataclasses import asdict, dataclass
+from itertools import accumulate
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# Bump when the plan layout changes so stale cache entries are ignored
+PLAN_VERSION = 5
+
+# Leaf types of the schema
+PROB = 'probability'   # number in [0, 1]
+WEIGHT = 'weight'      # number >= 0
+COUNT = 'count'        # int >= 0
+NUMBER = 'number'      # any int or float
+
+# Hazard distances the generator draws from, in instructions: CPU_pipelined
+# forwards distance 1 from EX/MEM, 2 from MEM/WB, and 3 through the register file
+HAZARD_DISTANCES = ['1', '2', '3']
+
+# Config weight -> metadata categories it draws from, evenly; other weights draw ALU instructions
+WEIGHT_CATEGORIES = {
+    'alu_logic': ['alu', 'compare'],
+    'load': ['load'],
+    'store': ['store'],
+    'branch': ['branch'],
+    'jump': ['jump'],
+    'upper': ['upper'],
+    'system': ['system'],
+    'pseudo_nop': ['pseudo'],
+    'fence': ['system'],
+    'ecall_ebreak': ['system']
+}
+
+# system_freq cap -> mnemonics it counts together; draws past the cap become ADDI
+SYSTEM_LIMITS = {
+    'max_fence_per_test': ['FENCE', 'FENCE.I'],
+    'max_system_calls_per_test': ['ECALL', 'EBREAK'],
+}
+
+CONFIG_SCHEMA = {
+    'weights': {
+        'alu_logic': WEIGHT, 'load': WEIGHT, 'store': WEIGHT, 'branch': WEIGHT, 'jump': WEIGHT,
+        'upper': WEIGHT, 'system': WEIGHT, 'pseudo_nop': WEIGHT, 'fence': WEIGHT, 'ecall_ebreak': WEIGHT,
+    },
+    'register_policy': {
+        'uniform': bool,
+        'sp_usage_fraction_in_memory_ops': PROB,
+        'ra_usage_fraction_in_jal': PROB,
+        'x0_source_fraction_in_alu_immediates': PROB,
+    },
+    'immediates': {
+        'arith': {
+            'small': WEIGHT, 'boundary': WEIGHT, 'medium': WEIGHT, 'random_full': WEIGHT,
+            'special_pattern': WEIGHT, 'boundary_values': [int], 'special_values': [int],
+        },
+        'shift': {'distribution': str, 'min': COUNT, 'max': COUNT},
+        'upper20': {'symbolic_fraction': PROB, 'random_fraction': PROB, 'symbolic_bases': [int]},
+        'memory_offset': {
+            'near_zero': WEIGHT, 'small_range': WEIGHT, 'mid_range': WEIGHT, 'far_range': WEIGHT,
+            'small_range_max': COUNT, 'mid_range_max': COUNT, 'far_range_max': COUNT,
+            'alignment_word': bool,
+        },
+    },
+    'branch_offsets': {
+        'near': WEIGHT, 'mid': WEIGHT, 'far': WEIGHT,
+        'near_max_bytes': COUNT, 'mid_max_bytes': COUNT, 'far_max_bytes': COUNT,
+        'allow_backward': bool,
+    },
+    'loops': {'enabled': bool, 'max_dynamic_multiplier': NUMBER, 'max_backward_depth': COUNT},
+    'hazards': {
+        'raw_dependency_prob': PROB, 'waw_repeat_prob': PROB, 'load_use_prob': PROB,
+        'raw_distance': {d: WEIGHT for d in HAZARD_DISTANCES},
+        'waw_distance': {d: WEIGHT for d in HAZARD_DISTANCES},
+    },
+    'memory_map': {
+        'enabled': bool,
+        'regions': [{'name': str, 'base': COUNT, 'size': COUNT}],
+        'address_mix': {'random': WEIGHT, 'boundary': WEIGHT, 'reuse': WEIGHT},
+    },
+    'system_freq': {'max_fence_per_test': COUNT, 'max_system_calls_per_test': COUNT},
+    'seed_policy': {'external_seed_allowed': bool, 'method': str, 'store_in_manifest': bool},
+    'manifest': {'include_weights': bool, 'include_seed': bool, 'include_generation_version': bool},
+}
+
+# Keys the schema accepts but the generator does not act on yet
+UNENFORCED_KEYS = [
+    'register_policy.uniform',
+    'register_policy.x0_source_fraction_in_alu_immediates',
+    'immediates.shift.distribution',
+    'immediates.upper20.random_fraction',
+    'immediates.memory_offset.alignment_word',
+    'loops.enabled',
+    'seed_policy.method',
+    'seed_policy.store_in_manifest',
+    'manifest.include_weights',
+    'manifest.include_seed',
+    'manifest.include_generation_version',
+]
+
+
+class ConfigError(ValueError):
+    """Raised when a config does not match the schema."""
+
+
+class WeightedChoice(NamedTuple):
+    """Keys of a weighted choice with their cumulative weights (random.choices cum_weights)."""
+    keys: List[str]
+    cum_weights: List[float]
+
+    def pick(self, rng: random.Random) -> str:
+        """Draw a key: the same random() call and result as rng.choices(keys, cum_weights=cum_weights)[0]."""
+        return self.keys[bisect(self.cum_weights, rng.random() * self.cum_weights[-1], 0, len(self.keys) - 1)]
+
+
+@dataclass
+class SamplingPlan:
+    """Everything the samplers read from the config, precompiled."""
+    categories: WeightedChoice
+    arith_buckets: WeightedChoice
+    boundary_values: List[int]
+    special_values: List[int]
+    shamt_range: Tuple[int, int]
+    upper_symbolic_fraction: float
+    upper_symbolic_values: List[int]
+    mem_buckets: WeightedChoice
+    mem_ranges: Dict[str, Tuple[int, int]]  # randrange(start, stop, 4) per bucket
+    branch_distances: WeightedChoice
+    branch_max_dist: Dict[str, int]         # In instructions
+    allow_backward: bool
+    max_backward_depth: int
+    max_dynamic_multiplier: float           # Dynamic instruction budget per static instruction
+    sp_fraction: float
+    ra_fraction: float
+    raw_prob: float
+    waw_prob: float
+    load_use_prob: float
+    raw_distances: WeightedChoice           # Keys are HAZARD_DISTANCES
+    waw_distances: WeightedChoice
+    memory_map: bool                        # Place loads/stores in memory_regions from tracked register values
+    memory_regions: List[Tuple[int, int]]   # (base, size) in bytes
+    mem_addresses: WeightedChoice
+    system_caps: Dict[str, int]             # SYSTEM_LIMITS key -> most instructions of its group per test
+    warnings: List[str]
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SamplingPlan':
+        for name in ['categories', 'arith_buckets', 'mem_buckets', 'branch_distances', 'mem_addresses',
+                     'raw_distances', 'waw_distances']:
+            data[name] = WeightedChoice(*data[name])
+        data['shamt_range'] = tuple(data['shamt_range'])
+        data['mem_ranges'] = {k: tuple(v) for k, v in data['mem_ranges'].items()}
+        data['memory_regions'] = [tuple(region) for region in data['memory_regions']]
+        return cls(**data)
+
+
+def _check(value, spec, path: str, errors: List[str]):
+    """Check one value against its schema entry, appending problems to errors."""
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected an object")
+            return
+        for key in spec:
+            if key not in value:
+                errors.append(f"{path}.{key}: missing")
+        for key in value:
+            if key not in spec:
+                errors.append(f"{path}.{key}: unknown key")
+            else:
+                _check(value[key], spec[key], f"{path}.{key}", errors)
+        return
+
+    if isinstance(spec, list):
+        if not isinstance(value, list) or not value:
+            errors.append(f"{path}: expected a non-empty list")
+        else:
+            for i, item in enumerate(value):
+                _check(item, spec[0], f"{path}[{i}]", errors)
+        return
+
+    if spec is bool or spec is str:
+        if not isinstance(value, spec):
+            errors.append(f"{path}: expected {spec.__name__}")
+        return
+
+    # Numeric leaves; bools are ints in Python but never valid numbers here
+    integral = spec in (int, COUNT)
+    if isinstance(value, bool) or not isinstance(value, int if integral else (int, float)):
+        errors.append(f"{path}: expected {'an integer' if integral else 'a number'}")
+    elif spec == PROB and not 0 <= value <= 1:
+        errors.append(f"{path}: probability {value} outside [0, 1]")
+    elif spec in (WEIGHT, COUNT) and value < 0:
+        errors.append(f"{path}: must be >= 0, got {value}")
+
+
+def _schema_leaf(path: str, key: str):
+    """Schema entry of path.key."""
+    spec = CONFIG_SCHEMA
+    for part in path.split('.'):
+        spec = spec[part]
+    return spec[key]
+
+
+def validate_config(config: Dict) -> List[str]:
+    """Validate a config against CONFIG_SCHEMA.
+
+    Raises ConfigError listing every problem; returns warnings for keys that
+    are accepted but have no effect on generation.
+    """
+    errors = []
+    for key in CONFIG_SCHEMA:
+        if key not in config:
+            errors.append(f"{key}: missing")
+    for key, value in config.items():
+        if key not in CONFIG_SCHEMA:
+            errors.append(f"{key}: unknown key")
+        else:
+            _check(value, CONFIG_SCHEMA[key], key, errors)
+    if errors:
+        raise ConfigError("Invalid config:\n  " + "\n  ".join(errors))
+
+    # Cross-field checks the per-key schema cannot express
+    for path, table in [('weights', config['weights']),
+                        ('immediates.arith', config['immediates']['arith']),
+                        ('immediates.memory_offset', config['immediates']['memory_offset']),
+                        ('branch_offsets', config['branch_offsets']),
+                        ('hazards.raw_distance', config['hazards']['raw_distance']),
+                        ('hazards.waw_distance', config['hazards']['waw_distance']),
+                        ('memory_map.address_mix', config['memory_map']['address_mix'])]:
+        weights = [v for k, v in table.items() if _schema_leaf(path, k) == WEIGHT]
+        if sum(weights) <= 0:
+            errors.append(f"{path}: weights must not all be zero")
+    mem_cfg = config['immediates']['memory_offset']
+    for bucket, start in [('small_range', 4), ('mid_range', 64), ('far_range', 256)]:
+        if not range(start, mem_cfg[f'{bucket}_max'], 4):
+            errors.append(f"immediates.memory_offset.{bucket}_max: must be greater than {start}")
+    shift = config['immediates']['shift']
+    if not shift['min'] <= shift['max'] <= 31:
+        errors.append("immediates.shift: need min <= max <= 31")
+    br_cfg = config['branch_offsets']
+    for name in ['near', 'mid', 'far']:
+        if br_cfg[f'{name}_max_bytes'] < 4:
+            errors.append(f"branch_offsets.{name}_max_bytes: must be at least 4")
+    for i, region in enumerate(config['memory_map']['regions']):
+        if region['base'] % 4 or region['size'] % 4 or not region['size']:
+            errors.append(f"memory_map.regions[{i}]: base and size must be multiples of 4 and size non-zero")
+        elif region['base'] + region['size'] > 1 << 32:
+            errors.append(f"memory_map.regions[{i}]: ends past the 32-bit address space")
+    if config['loops']['max_dynamic_multiplier'] < 1:
+        errors.append("loops.max_dynamic_multiplier: must be at least 1 (every instruction runs once)")
+    if errors:
+        raise ConfigError("Invalid config:\n  " + "\n  ".join(errors))
+
+    return [f"config key '{key}' is accepted but not enforced by the generator" for key in UNENFORCED_KEYS]
+
+
+def _choice(table: Dict, keys: List[str]) -> WeightedChoice:
+    # accumulate() in key order matches what random.choices(weights=...) computes
+    return WeightedChoice(list(keys), list(accumulate(table[k] for k in keys)))
+
+
+def compile_config(config: Dict) -> SamplingPlan:
+    """Validate a config and compile it into a SamplingPlan."""
+    warnings = validate_config(config)
+    imm_cfg = config['immediates']
+    mem_cfg = imm_cfg['memory_offset']
+    br_cfg = config['branch_offsets']
+    hazards = config['hazards']
+    memory_map = config['memory_map']
+    return SamplingPlan(
+        categories=_choice(config['weights'], config['weights'].keys()),
+        arith_buckets=_choice(imm_cfg['arith'], ['small', 'boundary', 'medium', 'random_full', 'special_pattern']),
+        boundary_values=list(imm_cfg['arith']['boundary_values']),
+        special_values=list(imm_cfg['arith']['special_values']),
+        shamt_range=(imm_cfg['shift']['min'], imm_cfg['shift']['max']),
+        upper_symbolic_fraction=imm_cfg['upper20']['symbolic_fraction'],
+        upper_symbolic_values=[(base >> 12) & 0xFFFFF for base in imm_cfg['upper20']['symbolic_bases']],
+        mem_buckets=_choice(mem_cfg, ['near_zero', 'small_range', 'mid_range', 'far_range']),
+        mem_ranges={'small_range': (4, mem_cfg['small_range_max']),
+                    'mid_range': (64, mem_cfg['mid_range_max']),
+                    'far_range': (256, mem_cfg['far_range_max'])},
+        branch_distances=_choice(br_cfg, ['near', 'mid', 'far']),
+        branch_max_dist={name: br_cfg[f'{name}_max_bytes'] // 4 for name in ['near', 'mid', 'far']},
+        allow_backward=br_cfg['allow_backward'],
+        max_backward_depth=config['loops']['max_backward_depth'],
+        max_dynamic_multiplier=config['loops']['max_dynamic_multiplier'],
+        sp_fraction=config['register_policy']['sp_usage_fraction_in_memory_ops'],
+        ra_fraction=config['register_policy']['ra_usage_fraction_in_jal'],
+        raw_prob=hazards['raw_dependency_prob'],
+        waw_prob=hazards['waw_repeat_prob'],
+        load_use_prob=hazards['load_use_prob'],
+        raw_distances=_choice(hazards['raw_distance'], HAZARD_DISTANCES),
+        waw_distances=_choice(hazards['waw_distance'], HAZARD_DISTANCES),
+        memory_map=memory_map['enabled'],
+        memory_regions=[(region['base'], region['size']) for region in memory_map['regions']],
+        mem_addresses=_choice(memory_map['address_mix'], ['random', 'boundary', 'reuse']),
+        system_caps={key: config['system_freq'][key] for key in SYSTEM_LIMITS},
+        warnings=warnings,
+    )
+
+
+def mnemonic_probabilities(metadata: List[Dict], plan: SamplingPlan) -> Dict[str, float]:
+    """Fold the weight -> category -> mnemonic choices into one distribution, in metadata order.
+
+    A category with no instructions draws ADDI instead, as the generator does.
+    Mnemonics whose system_freq cap is 0 are never drawn; the draws they would
+    get become ADDI (the caps are otherwise not part of the distribution).
+    """
+    categories = plan.categories
+    weights = [b - a for a, b in zip([0.0] + categories.cum_weights[:-1], categories.cum_weights)]
+    total = categories.cum_weights[-1]
+    probs = {m['mnemonic']: 0.0 for m in metadata}
+    for category, weight in zip(categories.keys, weights):
+        valid_cats = WEIGHT_CATEGORIES.get(category, ['alu'])
+        for cat in valid_cats:
+            candidates = [m['mnemonic'] for m in metadata if m['category'] == cat] or ['ADDI']
+            for mnem in candidates:
+                probs[mnem] += weight / total / len(valid_cats) / len(candidates)
+    for key, mnemonics in SYSTEM_LIMITS.items():
+        if not plan.system_caps[key]:
+            for mnem in mnemonics:
+                probs['ADDI'] += probs[mnem]
+                probs[mnem] = 0.0
+    return probs
+
+
+def plan_cache_key(config_bytes: bytes) -> str:
+    """Content hash identifying a compiled plan."""
+    digest = hashlib.sha256(f"plan-v{PLAN_VERSION}\n".encode())
+    digest.update(config_bytes)
+    return digest.hexdigest()[:32]
+
+
+def load_plan(config_path: str, cache_dir: Optional[str] = None) -> Tuple[Dict, SamplingPlan]:
+    """Read, validate and compile a config, reusing a cached plan when the contents are unchanged.
+
+    Returns (raw config dict, plan). cache_dir defaults to .plan_cache next to the
+    config; pass an empty string to disable caching.
+    """
+    with open(config_path, 'rb') as f:
+        config_bytes = f.read()
+    config = json.loads(config_bytes)
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(config_path)), '.plan_cache')
+    cache_file = os.path.join(cache_dir, f"{plan_cache_key(config_bytes)}.json") if cache_dir else None
+
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                return config, SamplingPlan.from_dict(json.load(f))
+        except (ValueError, TypeError, KeyError):
+            pass  # Corrupt or stale entry; recompile below
+
+    plan = compile_config(config)
+    if cache_file:
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(os.path.join(cache_dir, '.gitignore'), 'w') as f:
+                    f.write("*\n")  # Keep cached plans out of version control
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(asdict(plan), f)
+            os.replace(tmp_file, cache_file)  # Atomic, so concurrent runs never see half a plan
+        except OSError:
+            pass  # Read-only checkout: run without the cache
+    return config, plan
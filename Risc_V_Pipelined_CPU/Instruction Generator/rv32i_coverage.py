@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Functional coverage of generated RV32I programs.
+Builds a coverage model from rv32i_metadata.json and the buckets of the
+generator config, and collects it from packed instruction words into NumPy
+bitmaps: one bit per bin, one bitmap per test. Bitmaps merge with bitwise OR,
+so a campaign's coverage is the OR of its tests'.
+
+Coverpoints, all per mnemonic:
+  mnemonic   the instruction occurs
+  hazard     raw / waw / load_use on the previous instruction's destination
+  immediate  the config bucket its immediate falls in (arith, shift, memory
+             offset or upper20 buckets)
+  branch     direction x distance bucket of a branch or JAL offset
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from itertools import accumulate
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from rv32i_config import SamplingPlan, WeightedChoice, load_plan, mnemonic_probabilities
+from rv32i_encoding import compile_decoder, decode_words, label_offsets, np
+from rv32i_iss import load_program
+
+
+COVERPOINTS = ['mnemonic', 'hazard', 'immediate', 'branch']
+HAZARDS = ['raw', 'waw', 'load_use']
+DIRECTIONS = ['backward', 'forward']
+SHAMT_BUCKETS = ['min', 'mid', 'max']
+UPPER_BUCKETS = ['symbolic', 'random']
+
+# Share of directed choices when generating towards unhit bins
+DIRECTED_STRENGTH = 0.5
+
+# Which immediate buckets an instruction's immediate is classified into
+IMM_NONE, IMM_ARITH, IMM_SHAMT, IMM_UPPER, IMM_MEM = range(5)
+
+
+def _imm_class(meta: Dict) -> int:
+    return {'imm12': IMM_ARITH, 'shamt5': IMM_SHAMT, 'upper20': IMM_UPPER,
+            'mem12': IMM_MEM, 'mem12_split': IMM_MEM}.get(meta['immed_kind'], IMM_NONE)
+
+
+def _weights(cum_weights: List[float]) -> List[float]:
+    return [b - a for a, b in zip([0.0] + list(cum_weights[:-1]), cum_weights)]
+
+
+def popcount(bitmap: 'np.ndarray') -> int:
+    """Number of set bits in a packed bitmap."""
+    return int(np.unpackbits(bitmap).sum())
+
+
+class CoverageModel:
+    """Bins of the coverage model and the tables that map instruction words onto them.
+
+    Pseudo-instructions are left out: NOP is encoded as ADDI and counts as one.
+    Mnemonics the config never draws (see rv32i_config.mnemonic_probabilities),
+    buckets it gives zero weight, and backward branches when they are disabled,
+    get no bins; words of such mnemonics fall outside the model.
+    """
+
+    def __init__(self, metadata: List[Dict], plan: SamplingPlan):
+        if np is None:
+            raise RuntimeError("Coverage collection requires NumPy (pip install numpy)")
+        drawn = mnemonic_probabilities(metadata, plan)
+        self.metadata = [m for m in metadata if m['category'] != 'pseudo' and drawn[m['mnemonic']] > 0]
+        self.plan = plan
+        n = len(self.metadata)
+        self.bins: List[str] = []
+        self.bin_info: List[Tuple] = []  # (coverpoint, mnemonic, detail...) of every bin
+
+        self.decoder = compile_decoder(self.metadata)
+
+        pattern = [m['operand_pattern'] for m in self.metadata]
+        self.writes_rd = np.array(['rd' in p for p in pattern])
+        self.reads_rs1 = np.array([any('rs1' in op for op in p) for p in pattern])
+        self.reads_rs2 = np.array(['rs2' in p for p in pattern])
+        self.is_load = np.array([m['category'] == 'load' for m in self.metadata])
+        self.is_store = np.array([m['format'] == 'S' for m in self.metadata])
+        self.has_label = np.array(['label' in p for p in pattern])
+        self.imm_class = np.array([_imm_class(m) for m in self.metadata], dtype=np.int64)
+
+        # Bucket names per immediate class, restricted to buckets the config can draw
+        self.arith_buckets = [k for k, w in zip(plan.arith_buckets.keys, _weights(plan.arith_buckets.cum_weights)) if w > 0]
+        self.mem_buckets = [k for k, w in zip(plan.mem_buckets.keys, _weights(plan.mem_buckets.cum_weights)) if w > 0]
+        low, high = plan.shamt_range
+        self.shamt_buckets = ['min'] + (['mid'] if high - low > 1 else []) + (['max'] if high > low else [])
+        self.upper_buckets = [name for name, w in zip(UPPER_BUCKETS, [plan.upper_symbolic_fraction,
+                                                                      1 - plan.upper_symbolic_fraction]) if w > 0]
+        self.distances = [k for k, w in zip(plan.branch_distances.keys,
+                                             _weights(plan.branch_distances.cum_weights)) if w > 0]
+        self.directions = DIRECTIONS if plan.allow_backward else ['forward']
+        buckets_of = {IMM_NONE: [], IMM_ARITH: self.arith_buckets, IMM_SHAMT: self.shamt_buckets,
+                      IMM_UPPER: self.upper_buckets, IMM_MEM: self.mem_buckets}
+
+        # Bin id tables; -1 where a mnemonic has no such bin
+        self.mnemonic_bin = np.array([self._add('mnemonic', m['mnemonic']) for m in self.metadata])
+        self.hazard_bin = np.full((n, len(HAZARDS)), -1, dtype=np.int64)
+        # One column per bucket plus a last, always empty, column for "no bucket"
+        self.imm_bin = np.full((n, max(map(len, buckets_of.values())) + 1), -1, dtype=np.int64)
+        self.branch_bin = np.full((n, len(DIRECTIONS), 3), -1, dtype=np.int64)
+        for i, meta in enumerate(self.metadata):
+            mnem = meta['mnemonic']
+            reads = self.reads_rs1[i] or self.reads_rs2[i]
+            for h, hazard in enumerate(HAZARDS):
+                if (hazard == 'waw' and self.writes_rd[i]) or (hazard != 'waw' and reads):
+                    self.hazard_bin[i, h] = self._add('hazard', mnem, hazard)
+            for b, bucket in enumerate(buckets_of[self.imm_class[i]]):
+                self.imm_bin[i, b] = self._add('immediate', mnem, bucket)
+            if self.has_label[i]:
+                for d, direction in enumerate(DIRECTIONS):
+                    for k, distance in enumerate(plan.branch_distances.keys):
+                        if direction in self.directions and distance in self.distances:
+                            self.branch_bin[i, d, k] = self._add('branch', mnem, direction, distance)
+
+        self.signature = hashlib.sha256("\n".join(self.bins).encode()).hexdigest()[:16]
+        self.coverpoint = np.array([COVERPOINTS.index(info[0]) for info in self.bin_info])
+
+    def _add(self, *info: str) -> int:
+        self.bins.append('.'.join(info))
+        self.bin_info.append(info)
+        return len(self.bins) - 1
+
+    def __len__(self) -> int:
+        return len(self.bins)
+
+    def decode(self, words: 'np.ndarray') -> 'np.ndarray':
+        """Metadata position of every word, -1 for words outside the model."""
+        return decode_words(words, self.decoder)
+
+    def hit_bins(self, words) -> 'np.ndarray':
+        """Ids of the bins one program hits (with repeats)."""
+        w = np.asarray(words, dtype=np.int64) & 0xFFFFFFFF
+        m = self.decode(w)
+        known = m >= 0
+        m = np.where(known, m, 0)
+        rd = (w >> 7) & 0x1F
+        rs1 = np.where(self.reads_rs1[m] & known, (w >> 15) & 0x1F, 0)
+        rs2 = np.where(self.reads_rs2[m] & known, (w >> 20) & 0x1F, 0)
+        writes = self.writes_rd[m] & known & (rd != 0)
+        dest = np.where(writes, rd, 0)
+
+        # Hazards on the previous instruction's destination; x0 never carries one
+        prev = np.concatenate(([0], dest[:-1]))
+        prev_load = np.concatenate(([False], (self.is_load[m] & known)[:-1]))
+        raw = (prev != 0) & ((rs1 == prev) | (rs2 == prev))
+        hazards = np.stack([raw, writes & (rd == prev), raw & prev_load], axis=1)
+        hazard_ids = self.hazard_bin[m][hazards & known[:, None]]
+
+        imm_ids = self.imm_bin[m, self._imm_bucket(w, m)]
+        imm_ids = imm_ids[known]
+
+        offset = label_offsets(w)
+        distance = np.abs(offset) >> 2
+        max_dist = self.plan.branch_max_dist
+        dist_bucket = np.select([distance <= max_dist[k] for k in self.plan.branch_distances.keys],
+                                list(range(len(self.plan.branch_distances.keys))), default=-1)
+        branch = known & self.has_label[m] & (offset != 0) & (dist_bucket >= 0)
+        branch_ids = self.branch_bin[m[branch], (offset[branch] > 0).astype(np.int64), dist_bucket[branch]]
+
+        ids = np.concatenate([self.mnemonic_bin[m[known]], hazard_ids, imm_ids, branch_ids])
+        return ids[ids >= 0]
+
+    def _imm_bucket(self, w: 'np.ndarray', m: 'np.ndarray') -> 'np.ndarray':
+        """Column of imm_bin each word's immediate falls in; the last column when it falls in none."""
+        plan = self.plan
+        imm_class = self.imm_class[m]
+        i_imm = (w >> 20) - ((w >> 19) & 0x1000)  # Sign-extended imm[11:0]
+        s_imm = ((w >> 25) << 5 | (w >> 7) & 0x1F) - ((w >> 19) & 0x1000)
+        none = self.imm_bin.shape[1] - 1
+        bucket = np.full(w.shape, none, dtype=np.int64)
+
+        def assign(mask, names, value_masks):
+            # First matching bucket wins; value_masks are in priority order
+            if not names:
+                return bucket
+            chosen = np.select([vm for name, vm in value_masks if name in names],
+                               [names.index(name) for name, vm in value_masks if name in names], default=none)
+            return np.where(mask, chosen, bucket)
+
+        arith = imm_class == IMM_ARITH
+        bucket = assign(arith, self.arith_buckets, [
+            ('small', np.abs(i_imm) <= 1),
+            ('boundary', np.isin(i_imm, plan.boundary_values)),
+            ('special_pattern', np.isin(i_imm, plan.special_values) | np.isin(i_imm & 0xFFF, plan.special_values)),
+            ('medium', np.abs(i_imm) <= 32),
+            ('random_full', np.ones(w.shape, dtype=bool)),
+        ])
+        shamt = (w >> 20) & 0x1F
+        low, high = plan.shamt_range
+        bucket = assign(imm_class == IMM_SHAMT, self.shamt_buckets, [
+            ('min', shamt == low), ('max', shamt == high), ('mid', (shamt > low) & (shamt < high))])
+        symbolic = np.isin(w >> 12, plan.upper_symbolic_values)
+        bucket = assign(imm_class == IMM_UPPER, self.upper_buckets, [('symbolic', symbolic), ('random', ~symbolic)])
+        offset = np.where(self.is_store[m], s_imm, i_imm)
+        bucket = assign(imm_class == IMM_MEM, self.mem_buckets, [('near_zero', offset == 0)] + [
+            (name, (offset >= start) & (offset < stop)) for name, (start, stop) in plan.mem_ranges.items()])
+        return bucket
+
+    def bitmap(self, words) -> 'np.ndarray':
+        """Packed coverage bitmap (uint8) of one program."""
+        hit = np.zeros(len(self.bins), dtype=bool)
+        hit[self.hit_bins(words)] = True
+        return np.packbits(hit)
+
+
+class Coverage:
+    """Accumulated coverage: the OR of test bitmaps plus how many tests hit each bin."""
+
+    def __init__(self, model: CoverageModel):
+        self.model = model
+        self.bitmap = np.zeros((len(model) + 7) // 8, dtype=np.uint8)
+        self.hits = np.zeros(len(model), dtype=np.int64)
+        self.tests = 0
+
+    def add(self, bitmap: 'np.ndarray') -> int:
+        """Merge one test's bitmap; returns the number of bins it hit first."""
+        new = popcount(bitmap & ~self.bitmap)
+        self.bitmap |= bitmap
+        self.hits += np.unpackbits(bitmap, count=len(self.model)).astype(np.int64)
+        self.tests += 1
+        return new
+
+    def merge(self, other: 'Coverage'):
+        """Add another collection of the same model to this one."""
+        if other.model.signature != self.model.signature:
+            raise ValueError("cannot merge coverage of different models")
+        self.bitmap |= other.bitmap
+        self.hits += other.hits
+        self.tests += other.tests
+
+    @property
+    def hit(self) -> 'np.ndarray':
+        """Boolean hit flag per bin."""
+        return np.unpackbits(self.bitmap, count=len(self.model)).astype(bool)
+
+    @property
+    def covered(self) -> int:
+        return popcount(self.bitmap)
+
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.covered / len(self.model) if len(self.model) else 100.0
+
+    def unhit(self) -> List[str]:
+        return [name for name, hit in zip(self.model.bins, self.hit.tolist()) if not hit]
+
+    def summary(self) -> Dict[str, Dict]:
+        """Covered/total bins per coverpoint."""
+        hit = self.hit
+        rows = {}
+        for c, name in enumerate(COVERPOINTS):
+            in_point = self.model.coverpoint == c
+            total = int(in_point.sum())
+            covered = int((hit & in_point).sum())
+            rows[name] = {"covered": covered, "bins": total,
+                          "percent": round(100.0 * covered / total, 2) if total else 100.0}
+        return rows
+
+    def to_dict(self) -> Dict:
+        return {
+            "model": self.model.signature,
+            "tests": self.tests,
+            "bins": len(self.model),
+            "covered": self.covered,
+            "percent": round(self.percent, 2),
+            "coverpoints": self.summary(),
+            "hits": dict(zip(self.model.bins, self.hits.tolist())),
+        }
+
+    @classmethod
+    def from_dict(cls, model: CoverageModel, data: Dict) -> 'Coverage':
+        """Rebuild a collection written by to_dict() for the same model."""
+        if data['model'] != model.signature:
+            raise ValueError("coverage file was collected with a different metadata/config model")
+        coverage = cls(model)
+        coverage.hits = np.array([data['hits'][name] for name in model.bins], dtype=np.int64)
+        coverage.bitmap = np.packbits(coverage.hits > 0)
+        coverage.tests = data['tests']
+        return coverage
+
+
+class BinTargets(NamedTuple):
+    """Unhit bins of one mnemonic that directed generation aims at."""
+    immediate: List[str]             # Immediate bucket names
+    hazard: List[str]                # raw / waw / load_use
+    branch: List[Tuple[str, str]]    # (direction, distance bucket)
+
+
+class CoverageBias:
+    """Generation bias towards the bins a coverage collection has not hit yet.
+
+    Mnemonic weights blend the configured distribution with one proportional to
+    each mnemonic's unhit bins, strength setting the share of the latter. Once
+    a mnemonic is drawn, each of its unhit immediate, hazard and branch bins is
+    aimed at with probability strength.
+    """
+
+    def __init__(self, mnemonics: Dict[str, float], targets: Dict[str, BinTargets], strength: float):
+        self.mnemonics = mnemonics
+        self.targets = targets
+        self.strength = strength
+        self.choice = WeightedChoice(list(mnemonics), list(accumulate(mnemonics.values())))
+        self.hazards_open = any(t.hazard for t in targets.values())
+
+    @classmethod
+    def from_coverage(cls, coverage: Coverage, base: Dict[str, float],
+                      strength: float = DIRECTED_STRENGTH) -> 'CoverageBias':
+        """Bias towards coverage's unhit bins; base is the configured probability of each mnemonic."""
+        unhit = {}
+        for info, hit in zip(coverage.model.bin_info, coverage.hit.tolist()):
+            if not hit:
+                unhit.setdefault(info[1], []).append(info)
+        total = sum(map(len, unhit.values()))
+        base_total = sum(base.values())
+        mnemonics = {}
+        for mnem, p in base.items():
+            directed = len(unhit.get(mnem, ())) / total if total else 0.0
+            mnemonics[mnem] = (1 - strength) * p / base_total + strength * directed if total else p / base_total
+        targets = {mnem: BinTargets([i[2] for i in infos if i[0] == 'immediate'],
+                                    [i[2] for i in infos if i[0] == 'hazard'],
+                                    [(i[2], i[3]) for i in infos if i[0] == 'branch'])
+                   for mnem, infos in unhit.items()}
+        return cls(mnemonics, targets, strength)
+
+    def to_dict(self) -> Dict:
+        return {"strength": self.strength, "mnemonics": self.mnemonics,
+                "targets": {mnem: t._asdict() for mnem, t in self.targets.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CoverageBias':
+        """Rebuild the bias recorded in a directed test's manifest."""
+        targets = {mnem: BinTargets(t['immediate'], t['hazard'], [tuple(b) for b in t['branch']])
+                   for mnem, t in data['targets'].items()}
+        return cls(data['mnemonics'], targets, data['strength'])
+
+
+def format_report(coverage: Coverage, show_unhit: bool = True, limit: Optional[int] = 50) -> str:
+    """Per-coverpoint summary, optionally followed by the bins no test hit."""
+    lines = [f"{coverage.tests} tests, {coverage.covered}/{len(coverage.model)} bins "
+             f"({coverage.percent:.2f}%)"]
+    for name, row in coverage.summary().items():
+        lines.append(f"  {name:<10} {row['covered']:>5}/{row['bins']:<5} {row['percent']:6.2f}%")
+    unhit = coverage.unhit()
+    if show_unhit and unhit:
+        shown = unhit if limit is None else unhit[:limit]
+        lines.append(f"Unhit bins ({len(unhit)}):")
+        lines += [f"  {name}" for name in shown]
+        if len(shown) < len(unhit):
+            lines.append(f"  ... {len(unhit) - len(shown)} more")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Functional coverage of RV32I programs")
+    parser.add_argument("programs", nargs='+', help="Program images (.hex or .bin)")
+    parser.add_argument("--metadata", default="rv32i_metadata.json", help="Instruction metadata JSON")
+    parser.add_argument("--config", default="config_defaults.json", help="Config whose buckets define the bins")
+    parser.add_argument("--json", metavar="FILE", help="Write the coverage, with per-bin hit counts, as JSON")
+    parser.add_argument("--all-unhit", action="store_true", help="List every unhit bin, not just the first 50")
+    args = parser.parse_args()
+
+    with open(args.metadata) as f:
+        metadata = json.load(f)
+    _, plan = load_plan(args.config)
+    model = CoverageModel(metadata, plan)
+    coverage = Coverage(model)
+
+    start = time.perf_counter()
+    for path in args.programs:
+        coverage.add(model.bitmap(load_program(path)))
+    elapsed = time.perf_counter() - start
+
+    print(format_report(coverage, limit=None if args.all_unhit else 50))
+    print(f"Collected in {elapsed:.2f}s")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(coverage.to_dict(), f, indent=2)
+        print(f"Coverage written to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+RV32I encoding tables and instruction packers.
+Compiles rv32i_metadata.json once into integer tables and packs instructions
+either one at a time or a whole program at once with NumPy. The NumPy decoder
+goes the other way, from packed words back to metadata entries.
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only the vectorized packer needs it
+    np = None
+
+
+# Packing kinds: the format plus the I-type variants that place fields differently
+KIND_R, KIND_I, KIND_SHIFT, KIND_FENCE, KIND_SYS, KIND_S, KIND_B, KIND_U, KIND_J = range(9)
+
+
+class Encoding(NamedTuple):
+    """Integer encoding of one mnemonic, precomputed from its metadata."""
+    mnemonic: str
+    kind: int
+    opcode: int
+    funct3: int
+    funct7: int
+    base: int  # Every bit that does not depend on operands
+
+
+def _kind_of(meta: Dict) -> int:
+    """Map a metadata entry to its packing kind."""
+    fmt = meta['format']
+    if fmt == 'I':
+        if meta['immed_kind'] == 'shamt5':
+            return KIND_SHIFT
+        if meta['immed_kind'] in ['fence', 'fencei']:
+            return KIND_FENCE
+        if meta['mnemonic'] in ['ECALL', 'EBREAK']:
+            return KIND_SYS
+        return KIND_I
+    return {'R': KIND_R, 'S': KIND_S, 'B': KIND_B, 'U': KIND_U, 'J': KIND_J}[fmt]
+
+
+def compile_encodings(metadata: List[Dict]) -> Dict[str, Encoding]:
+    """Compile instruction metadata into per-mnemonic integer encodings."""
+    table = {}
+    for meta in metadata:
+        kind = _kind_of(meta)
+        opcode = int(meta['opcode'], 16)
+        funct3 = int(meta['funct3'], 16) if meta['funct3'] else 0
+        funct7 = int(meta['funct7'], 16) if meta['funct7'] else 0
+
+        base = opcode
+        if kind not in (KIND_U, KIND_J):
+            base |= funct3 << 12
+        if kind in (KIND_R, KIND_SHIFT):
+            base |= funct7 << 25
+        elif kind == KIND_FENCE and meta['immed_kind'] == 'fence':
+            base |= 0x0FF << 20  # pred/succ = iorw, iorw
+        elif kind == KIND_SYS and meta['mnemonic'] == 'EBREAK':
+            base |= 1 << 20
+
+        table[meta['mnemonic']] = Encoding(meta['mnemonic'], kind, opcode, funct3, funct7, base)
+    return table
+
+
+def pack_fields(enc: Encoding, rd: Optional[int], rs1: Optional[int], rs2: Optional[int],
+                imm: Optional[int], shamt: Optional[int]) -> int:
+    """Pack one instruction's operand fields into a 32-bit word."""
+    rd = rd or 0
+    rs1 = rs1 or 0
+    rs2 = rs2 or 0
+    imm = imm or 0
+    kind = enc.kind
+
+    if kind == KIND_R:
+        word = (rs2 << 20) | (rs1 << 15) | (rd << 7)
+    elif kind == KIND_I:
+        word = ((imm & 0xFFF) << 20) | (rs1 << 15) | (rd << 7)
+    elif kind == KIND_SHIFT:
+        word = ((shamt or 0) << 20) | (rs1 << 15) | (rd << 7)
+    elif kind == KIND_S:
+        word = (((imm >> 5) & 0x7F) << 25) | (rs2 << 20) | (rs1 << 15) | ((imm & 0x1F) << 7)
+    elif kind == KIND_B:
+        word = (((imm >> 12) & 1) << 31) | (((imm >> 5) & 0x3F) << 25) | (rs2 << 20) | \
+               (rs1 << 15) | (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 1) << 7)
+    elif kind == KIND_U:
+        word = ((imm & 0xFFFFF) << 12) | (rd << 7)
+    elif kind == KIND_J:
+        word = (((imm >> 20) & 1) << 31) | (((imm >> 12) & 0xFF) << 12) | \
+               (((imm >> 11) & 1) << 20) | (((imm >> 1) & 0x3FF) << 21) | (rd << 7)
+    elif kind == KIND_SYS:
+        word = (rs1 << 15) | (rd << 7)
+    else:  # KIND_FENCE: no operands
+        word = 0
+
+    return (enc.base | word) & 0xFFFFFFFF
+
+
+def program_arrays(instrs: List, encodings: Dict[str, Encoding]) -> Dict:
+    """Gather a program's fields into int64 arrays for pack_program()."""
+    if np is None:
+        raise RuntimeError("NumPy is required for vectorized packing (pip install numpy)")
+    encs = [encodings[obj.mnemonic] for obj in instrs]
+    return {
+        'kind': np.fromiter((e.kind for e in encs), dtype=np.int64, count=len(encs)),
+        'base': np.fromiter((e.base for e in encs), dtype=np.int64, count=len(encs)),
+        'rd': np.fromiter((obj.rd or 0 for obj in instrs), dtype=np.int64, count=len(instrs)),
+        'rs1': np.fromiter((obj.rs1 or 0 for obj in instrs), dtype=np.int64, count=len(instrs)),
+        'rs2': np.fromiter((obj.rs2 or 0 for obj in instrs), dtype=np.int64, count=len(instrs)),
+        # Shifts carry their shamt in the immediate slot (bits 24:20)
+        'imm': np.fromiter(((obj.shamt if e.kind == KIND_SHIFT else obj.imm) or 0
+                            for obj, e in zip(instrs, encs)), dtype=np.int64, count=len(instrs)),
+    }
+
+
+def pack_program(kind, base, rd, rs1, rs2, imm):
+    """Pack a whole program's fields into a uint32 array in one vectorized pass.
+
+    All arguments are equally long integer arrays; the result is bit-identical
+    to calling pack_fields() on every instruction.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required for vectorized packing (pip install numpy)")
+    kind = np.asarray(kind, dtype=np.int64)
+    rd = np.asarray(rd, dtype=np.int64)
+    rs1 = np.asarray(rs1, dtype=np.int64)
+    rs2 = np.asarray(rs2, dtype=np.int64)
+    imm = np.asarray(imm, dtype=np.int64)
+
+    regs_d = rd << 7
+    regs_s1 = rs1 << 15
+    regs_s2 = rs2 << 20
+
+    # Operand layout of each format; the kind masks pick one per instruction
+    r_type = regs_s2 | regs_s1 | regs_d
+    i_type = ((imm & 0xFFF) << 20) | regs_s1 | regs_d
+    s_type = (((imm >> 5) & 0x7F) << 25) | regs_s2 | regs_s1 | ((imm & 0x1F) << 7)
+    b_type = (((imm >> 12) & 1) << 31) | (((imm >> 5) & 0x3F) << 25) | regs_s2 | regs_s1 | \
+             (((imm >> 1) & 0xF) << 8) | (((imm >> 11) & 1) << 7)
+    u_type = ((imm & 0xFFFFF) << 12) | regs_d
+    j_type = (((imm >> 20) & 1) << 31) | (((imm >> 12) & 0xFF) << 12) | \
+             (((imm >> 11) & 1) << 20) | (((imm >> 1) & 0x3FF) << 21) | regs_d
+    sys_type = regs_s1 | regs_d
+
+    words = np.select(
+        [kind == KIND_R, (kind == KIND_I) | (kind == KIND_SHIFT), kind == KIND_S,
+         kind == KIND_B, kind == KIND_U, kind == KIND_J, kind == KIND_SYS],
+        [r_type, i_type, s_type, b_type, u_type, j_type, sys_type],
+        default=0)
+    return ((np.asarray(base, dtype=np.int64) | words) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def decode_key(word):
+    """Decode index slot of a word, or of every word of an array: opcode | funct3 << 7 | bit 30 << 10 | bit 20 << 11."""
+    return (word & 0x7F) | ((word >> 5) & 0x380) | ((word >> 20) & 0x400) | ((word >> 9) & 0x800)
+
+
+def decode_index(metadata: List[Dict]) -> List[int]:
+    """Position of the metadata entry owning every decode_key() slot, -1 if none.
+
+    Entries without funct3 or funct7 fill every value of the missing field;
+    bit 30 separates SUB/SRA/SRAI, bit 20 EBREAK from ECALL.
+    """
+    index = [-1] * (1 << 12)
+    for i, meta in enumerate(metadata):
+        opcode = int(meta['opcode'], 16)
+        funct3s = [int(meta['funct3'], 16)] if meta['funct3'] else range(8)
+        bit30s = [int(meta['funct7'], 16) >> 5] if meta['funct7'] else [0, 1]
+        bit20s = {'ECALL': [0], 'EBREAK': [1]}.get(meta['mnemonic'], [0, 1])
+        for funct3 in funct3s:
+            for bit30 in bit30s:
+                for bit20 in bit20s:
+                    index[opcode | funct3 << 7 | bit30 << 10 | bit20 << 11] = i
+    return index
+
+
+class DecodeTable(NamedTuple):
+    """Vectorized decoder from packed words to positions in a metadata list."""
+    index: 'np.ndarray'          # decode_index() of the metadata
+    checks_funct7: 'np.ndarray'  # Per position: only funct7 0x00 / 0x20 are valid (R-type, shifts)
+
+
+def compile_decoder(metadata: List[Dict]) -> DecodeTable:
+    """Build the vectorized decode table of metadata."""
+    if np is None:
+        raise RuntimeError("NumPy is required for vectorized decoding (pip install numpy)")
+    return DecodeTable(np.array(decode_index(metadata), dtype=np.int64),
+                       np.array([bool(m['funct7']) for m in metadata]))
+
+
+def decode_words(words, table: DecodeTable) -> 'np.ndarray':
+    """Metadata position of every word, -1 for words outside the table."""
+    words = np.asarray(words, dtype=np.int64) & 0xFFFFFFFF
+    m = table.index[decode_key(words)]
+    bad_funct7 = ((words >> 25) & 0x5F) != 0
+    return np.where((m >= 0) & table.checks_funct7[m] & bad_funct7, -1, m)
+
+
+def label_offsets(words) -> 'np.ndarray':
+    """Byte offset of every B- and J-type word, 0 for anything else."""
+    w = np.asarray(words, dtype=np.int64) & 0xFFFFFFFF
+    opcode = w & 0x7F
+    b_imm = (((w >> 31) & 1) << 12 | ((w >> 7) & 1) << 11 | ((w >> 25) & 0x3F) << 5 | ((w >> 8) & 0xF) << 1)
+    j_imm = (((w >> 31) & 1) << 20 | ((w >> 12) & 0xFF) << 12 | ((w >> 20) & 1) << 11 | ((w >> 21) & 0x3FF) << 1)
+    return np.select([opcode == 0x63, opcode == 0x6F],
+                     [b_imm - ((b_imm & 0x1000) << 1), j_imm - ((j_imm & 0x100000) << 1)], default=0)
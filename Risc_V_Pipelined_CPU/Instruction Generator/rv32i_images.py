@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Binary and memory-image writers for generated RV32I programs.
+Everything is written from the packed 32-bit words: raw little-endian binary,
+a minimal ELF32 executable, $readmemh/$readmemb images sized to the CPU's
+instruction memory, and Vivado .coe/.mem initialization files.
+"""
+
+import struct
+import sys
+from array import array
+from typing import Dict, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # Optional; the stdlib path produces the same bytes
+    np = None
+
+
+# reg [31:0] mem [0:63] in src/instruction_memory.v
+IMEM_DEPTH = 64
+
+# addi x0, x0, 0: padding the pipeline can fetch without side effects
+NOP_WORD = 0x00000013
+
+# Every format write_images() knows, in the order files are reported
+FORMATS = ['hex', 'bin', 'elf', 'memh', 'memb', 'coe', 'mem']
+DEFAULT_FORMATS = ['hex', 'bin']
+
+# Format -> file extension; the memory images get a _partN suffix when split
+EXTENSIONS = {'hex': '.hex', 'bin': '.bin', 'elf': '.elf', 'memh': '.memh',
+              'memb': '.memb', 'coe': '.coe', 'mem': '.mem'}
+IMAGE_FORMATS = ['memh', 'memb', 'coe', 'mem']
+
+EM_RISCV = 243
+
+
+def to_bytes(words: Sequence[int]) -> bytes:
+    """Pack words as little-endian 32-bit values."""
+    if np is not None and isinstance(words, np.ndarray):
+        return words.astype('<u4', copy=False).tobytes()
+    data = array('I', words)
+    if data.itemsize != 4:  # 'I' is 32-bit on every mainstream platform; stay correct if not
+        return struct.pack(f"<{len(words)}I", *words)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def hex_words(words: Sequence[int]) -> List[str]:
+    """8-digit hex text of each word, formatted by a single bytes.hex() call."""
+    # Reversed, the little-endian image reads most significant digit first, last word first
+    return to_bytes(words)[::-1].hex(' ', 4).split()[::-1]
+
+
+def elf32_image(words: Sequence[int], base: int = 0, entry: int = None) -> bytes:
+    """Minimal little-endian RV32 ELF executable: one PT_LOAD segment and a .text section."""
+    text = to_bytes(words)
+    entry = base if entry is None else entry
+    ehsize, phentsize, shentsize = 52, 32, 40
+    text_off = ehsize + phentsize
+    shstrtab = b"\0.text\0.shstrtab\0"
+    shstrtab_off = text_off + len(text)
+    shoff = (shstrtab_off + len(shstrtab) + 3) & ~3
+
+    ident = b"\x7fELF" + bytes([1, 1, 1, 0]) + bytes(8)  # ELFCLASS32, little-endian, version 1
+    header = struct.pack("<16sHHIIIIIHHHHHH", ident, 2, EM_RISCV, 1, entry, ehsize, shoff, 0,
+                         ehsize, phentsize, 1, shentsize, 3, 2)
+    # PT_LOAD, R+X
+    phdr = struct.pack("<IIIIIIII", 1, text_off, base, base, len(text), len(text), 5, 4)
+    sections = b"".join([
+        bytes(shentsize),                                                                   # SHN_UNDEF
+        struct.pack("<IIIIIIIIII", 1, 1, 6, base, text_off, len(text), 0, 0, 4, 0),         # .text
+        struct.pack("<IIIIIIIIII", 7, 3, 0, 0, shstrtab_off, len(shstrtab), 0, 0, 1, 0),     # .shstrtab
+    ])
+    padding = bytes(shoff - shstrtab_off - len(shstrtab))
+    return header + phdr + text + shstrtab + padding + sections
+
+
+def split_image(words: List[int], depth: int = IMEM_DEPTH, pad_word: int = NOP_WORD) -> List[List[int]]:
+    """Split a program into depth-word images, padding the last one."""
+    chunks = [words[i:i + depth] for i in range(0, max(len(words), 1), depth)]
+    chunks[-1] = chunks[-1] + [pad_word] * (depth - len(chunks[-1]))
+    return chunks
+
+
+def write_images(words: Sequence[int], prefix: str, formats: Sequence[str] = DEFAULT_FORMATS,
+                 depth: int = IMEM_DEPTH, pad_word: int = NOP_WORD) -> Dict[str, object]:
+    """Write the requested formats for one program and return their paths.
+
+    Words are formatted as hex once and shared by .hex, .memh, .coe and .mem.
+    Memory images hold exactly depth words; longer programs are split into
+    prefix_part0, prefix_part1, ... and the format maps to the list of parts.
+    """
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown output format(s): {', '.join(sorted(unknown))}")
+    words = words.tolist() if np is not None and isinstance(words, np.ndarray) else list(words)
+    files = {}
+
+    if 'bin' in formats:
+        files['bin'] = prefix + EXTENSIONS['bin']
+        with open(files['bin'], 'wb') as f:
+            f.write(to_bytes(words))
+    if 'elf' in formats:
+        files['elf'] = prefix + EXTENSIONS['elf']
+        with open(files['elf'], 'wb') as f:
+            f.write(elf32_image(words))
+
+    images = [fmt for fmt in IMAGE_FORMATS if fmt in formats]
+    if 'hex' not in formats and not images:
+        return files
+
+    hex_text = hex_words(words)
+    if 'hex' in formats:
+        files['hex'] = prefix + EXTENSIONS['hex']
+        with open(files['hex'], 'w') as f:
+            f.write("\n".join(hex_text + [""]))
+
+    if images:
+        hex_chunks = split_image(hex_text, depth, f"{pad_word:08x}")
+        word_chunks = split_image(words, depth, pad_word)
+        for fmt in images:
+            paths = []
+            for k, (hex_chunk, word_chunk) in enumerate(zip(hex_chunks, word_chunks)):
+                path = prefix + (f"_part{k}" if len(hex_chunks) > 1 else "") + EXTENSIONS[fmt]
+                with open(path, 'w') as f:
+                    f.write(_render_image(fmt, hex_chunk, word_chunk))
+                paths.append(path)
+            files[fmt] = paths if len(paths) > 1 else paths[0]
+    return files
+
+
+def _render_image(fmt: str, hex_words: List[str], words: List[int]) -> str:
+    """Text of one depth-sized memory image."""
+    if fmt == 'memh':
+        return "".join(h + "\n" for h in hex_words)
+    if fmt == 'memb':
+        return "".join(f"{w:032b}\n" for w in words)
+    if fmt == 'mem':
+        # Vivado/XPM memory init: start address, then one word per line
+        return "@00000000\n" + "".join(h + "\n" for h in hex_words)
+    # coe: Vivado Block Memory Generator
+    return ("memory_initialization_radix=16;\n"
+            "memory_initialization_vector=\n" + ",\n".join(hex_words) + ";\n")
@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+"""
+RV32I reference instruction-set simulator.
+Loads a generated .hex or .bin program at address 0 and executes it with a
+pre-decoded instruction cache: every word is decoded once into a closure that
+performs the instruction and returns the next PC, and the run loop only
+indexes that cache by PC.
+"""
+
+import argparse
+import hashlib
+import struct
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+
+MASK = 0xFFFFFFFF
+
+# Next-PC values at or above HALT_BASE stop the run; the offset says why
+HALT_BASE = 1 << 40
+HALT_REASONS = ['ecall', 'ebreak', 'fence', 'self_loop', 'misaligned_fetch', 'illegal_instruction']
+HALT = {reason: HALT_BASE + i for i, reason in enumerate(HALT_REASONS)}
+
+
+def _signed(value: int) -> int:
+    return value - ((value & 0x80000000) << 1)
+
+
+def _sext(value: int, bits: int) -> int:
+    sign = 1 << (bits - 1)
+    return (value & (sign - 1)) - (value & sign)
+
+
+# (funct3, funct7) -> result of OP; OP-IMM uses the same table with funct7 = 0
+# except for shifts, and passes the immediate as the second operand
+ALU_OPS = {
+    (0, 0x00): lambda a, b: (a + b) & MASK,
+    (0, 0x20): lambda a, b: (a - b) & MASK,
+    (1, 0x00): lambda a, b: (a << (b & 31)) & MASK,
+    (2, 0x00): lambda a, b: int(_signed(a) < _signed(b)),
+    (3, 0x00): lambda a, b: int(a < b),
+    (4, 0x00): lambda a, b: a ^ b,
+    (5, 0x00): lambda a, b: a >> (b & 31),
+    (5, 0x20): lambda a, b: (_signed(a) >> (b & 31)) & MASK,
+    (6, 0x00): lambda a, b: a | b,
+    (7, 0x00): lambda a, b: a & b,
+}
+
+BRANCH_CONDITIONS = {
+    0: lambda a, b: a == b,
+    1: lambda a, b: a != b,
+    4: lambda a, b: _signed(a) < _signed(b),
+    5: lambda a, b: _signed(a) >= _signed(b),
+    6: lambda a, b: a < b,
+    7: lambda a, b: a >= b,
+}
+
+# funct3 -> (bytes, sign-extend)
+_LOAD_SIZES = {0: (1, True), 1: (2, True), 2: (4, False), 4: (1, False), 5: (2, False)}
+_STORE_SIZES = {0: 1, 1: 2, 2: 4}
+
+
+def _sources(*regs: int) -> Tuple[int, ...]:
+    """Distinct source registers, x0 excluded (it never depends on anything)."""
+    return tuple(r for r in dict.fromkeys(regs) if r)
+
+
+def _jump_target(pc: int, offset: int) -> int:
+    """Static branch/jump target, or the HALT code it stops with."""
+    if offset == 0:
+        return HALT['self_loop']
+    target = (pc + offset) & MASK
+    return HALT['misaligned_fetch'] if target & 3 else target
+
+
+@dataclass
+class SimResult:
+    """Architectural state when a run stops."""
+    steps: int
+    pc: int
+    reason: str
+    regs: List[int]
+    memory: Dict[int, int]          # Byte address -> word, for every word that differs from the loaded program
+    seconds: float = 0.0
+    trace_lines: int = 0
+
+    @property
+    def mips(self) -> float:
+        return self.steps / self.seconds / 1e6 if self.seconds > 0 else 0.0
+
+
+@dataclass
+class RunProfile:
+    """Memory accesses and hazards of a run, from RV32ISim.profile()."""
+    raw: List[int]                  # RAW hazards by distance 1, 2, ...
+    waw: List[int]                  # WAW hazards by distance
+    load_use: int = 0               # RAW hazards on a load at distance 1
+    accesses: int = 0               # Loads and stores executed
+    useful: int = 0                 # Of those, aligned and inside the memory map
+    steps: int = 0
+    recent: List[int] = field(default_factory=list, repr=False)  # Destinations of the last instructions, newest first
+    loaded: bool = field(default=False, repr=False)              # Whether the newest one was a load
+
+    @property
+    def hazards_per_100(self) -> float:
+        return 100 * (sum(self.raw) + sum(self.waw)) / self.steps if self.steps else 0.0
+
+    def count(self, entry: 'DecodedInstruction', x: List[int], regions: List[Tuple[int, int]]):
+        """Account for entry, which is about to execute with registers x."""
+        recent = self.recent
+        self.steps += 1
+        for src in entry.srcs:
+            if src in recent:
+                distance = recent.index(src)
+                self.raw[distance] += 1
+                self.load_use += distance == 0 and self.loaded
+        if entry.rd and entry.rd in recent:
+            self.waw[recent.index(entry.rd)] += 1
+        if entry.store is not None or entry.load is not None:
+            rs1, imm, size = entry.load or (entry.store[0], entry.store[1], entry.store[3])
+            addr = (x[rs1] + imm) & MASK
+            self.accesses += 1
+            if not addr % size and any(base <= addr and addr + size <= base + length for base, length in regions):
+                self.useful += 1
+        recent.insert(0, entry.rd)
+        recent.pop()
+        self.loaded = entry.load is not None
+
+    def copy(self) -> 'RunProfile':
+        """Independent copy, to return to later."""
+        return replace(self, raw=list(self.raw), waw=list(self.waw), recent=list(self.recent))
+
+
+@dataclass
+class DecodedInstruction:
+    """One entry of the decoded-instruction cache."""
+    execute: Callable[[], int]      # Runs the instruction, returns the next PC (or a HALT code)
+    word: int
+    rd: int = 0                     # Register written, 0 if none
+    srcs: Tuple[int, ...] = ()      # Registers read, without x0
+    store: Optional[Tuple[int, int, int, int]] = None  # (rs1, imm, rs2, size) for the trace
+    load: Optional[Tuple[int, int, int]] = None          # (rs1, imm, size)
+    backward: bool = False          # A branch or jump that can go backward (any JALR)
+
+
+class RV32ISim:
+    """Executes an RV32I program loaded at address 0.
+
+    Data memory is sparse and byte addressable (little-endian words in a dict,
+    zero when never written). By default it is separate from the program, as
+    in CPU_pipelined, whose memory module offsets data accesses past the code;
+    unified=True maps the program into data memory instead, so loads can read
+    code and stores invalidate the instruction they overwrite. ECALL and EBREAK
+    stop the run, as do a branch or jump to itself, a misaligned jump target
+    or leaving the program. halt_on_fence also stops at FENCE/FENCE.I,
+    matching CPU_pipelined, which stalls fetch on those opcodes.
+    """
+
+    def __init__(self, words: List[int], unified: bool = False, halt_on_fence: bool = False):
+        self.program = [w & MASK for w in words]
+        self.unified = unified
+        self.halt_on_fence = halt_on_fence
+        self.reset()
+
+    def reset(self):
+        """Restore the loaded program, clear registers and set PC to 0."""
+        if hasattr(self, 'x') and not self.unified:
+            # Cleared in place, so the decoded closures that captured them stay valid
+            self.x[:] = [0] * 32
+            self.mem.clear()
+            self.pc = 0
+            return
+        self.x = [0] * 32
+        self.mem = {i: w for i, w in enumerate(self.program)} if self.unified else {}  # Word index -> word
+        self.pc = 0
+        # Decoded lazily: a None entry is decoded the first time the PC is fetched
+        self.code = [None] * len(self.program)
+        self._fns = [None] * len(self.program)  # Just the closures, which the fast loop indexes
+
+    def patch(self, index: int, word: int):
+        """Replace program word index; takes effect from the next reset()."""
+        self.program[index] = word & MASK
+        self.code[index] = self._fns[index] = None
+
+    # --- memory -----------------------------------------------------------
+
+    def _load_bytes(self, addr: int, size: int) -> int:
+        """Little-endian load of any alignment."""
+        value = 0
+        for i in range(size):
+            a = (addr + i) & MASK
+            value |= ((self.mem.get(a >> 2, 0) >> ((a & 3) * 8)) & 0xFF) << (8 * i)
+        return value
+
+    def _store_bytes(self, addr: int, size: int, value: int):
+        """Little-endian store of any alignment."""
+        for i in range(size):
+            a = (addr + i) & MASK
+            shift = (a & 3) * 8
+            word = self.mem.get(a >> 2, 0)
+            self._write_word(a >> 2, (word & ~(0xFF << shift) & MASK) | (((value >> (8 * i)) & 0xFF) << shift))
+
+    def _write_word(self, index: int, word: int):
+        self.mem[index] = word
+        if self.unified and index < len(self.code):
+            self.code[index] = self._fns[index] = None  # Self-modifying code: decode again on next fetch
+
+    # --- decode -----------------------------------------------------------
+
+    def fetch(self, index: int) -> DecodedInstruction:
+        """Cache entry of word index, decoding it on first use."""
+        entry = self.code[index]
+        if entry is None:
+            word = self.mem.get(index, 0) if self.unified else self.program[index]
+            entry = self.code[index] = self._decode(word, index * 4)
+            self._fns[index] = entry.execute
+        return entry
+
+    def _decode(self, word: int, pc: int) -> DecodedInstruction:
+        """Decode one word into a closure bound to its PC."""
+        x = self.x
+        mem = self.mem
+        npc = pc + 4
+        opcode = word & 0x7F
+        rd = (word >> 7) & 0x1F
+        funct3 = (word >> 12) & 0x7
+        rs1 = (word >> 15) & 0x1F
+        rs2 = (word >> 20) & 0x1F
+        funct7 = word >> 25
+        imm_i = _sext(word >> 20, 12)
+
+        def done():
+            return npc
+
+        def halt(reason):
+            code = HALT[reason]
+            return lambda: code
+
+        if opcode == 0x33:  # OP
+            fn = ALU_OPS.get((funct3, funct7))
+            if fn is None:
+                return DecodedInstruction(halt('illegal_instruction'), word)
+            if rd == 0:
+                return DecodedInstruction(done, word, 0, _sources(rs1, rs2))
+            if fn is ALU_OPS[0, 0x00]:
+                def op():
+                    x[rd] = (x[rs1] + x[rs2]) & MASK
+                    return npc
+            else:
+                def op():
+                    x[rd] = fn(x[rs1], x[rs2])
+                    return npc
+            return DecodedInstruction(op, word, rd, _sources(rs1, rs2))
+
+        if opcode == 0x13:  # OP-IMM
+            # Shifts take shamt (rs2 field) and are told apart by funct7
+            fn = ALU_OPS.get((funct3, funct7)) if funct3 in (1, 5) else ALU_OPS[funct3, 0x00]
+            imm = rs2 if funct3 in (1, 5) else imm_i & MASK
+            if fn is None:
+                return DecodedInstruction(halt('illegal_instruction'), word)
+            if rd == 0:
+                return DecodedInstruction(done, word, 0, _sources(rs1))  # NOP and other x0 writes
+            if funct3 == 0:
+                def op():
+                    x[rd] = (x[rs1] + imm) & MASK
+                    return npc
+            else:
+                def op():
+                    x[rd] = fn(x[rs1], imm)
+                    return npc
+            return DecodedInstruction(op, word, rd, _sources(rs1))
+
+        if opcode == 0x03:  # LOAD
+            size, signed = _LOAD_SIZES.get(funct3, (0, False))
+            if not size:
+                return DecodedInstruction(halt('illegal_instruction'), word)
+            load_bytes = self._load_bytes
+            value_mask = (1 << (8 * size)) - 1
+
+            def op():
+                addr = (x[rs1] + imm_i) & MASK
+                offset = addr & 3
+                if offset + size <= 4:
+                    value = (mem.get(addr >> 2, 0) >> (offset * 8)) & value_mask
+                else:
+                    value = load_bytes(addr, size)
+                if signed:
+                    value = _sext(value, 8 * size) & MASK
+                if rd:
+                    x[rd] = value
+                return npc
+            return DecodedInstruction(op, word, rd, _sources(rs1), load=(rs1, imm_i, size))
+
+        if opcode == 0x23:  # STORE
+            size = _STORE_SIZES.get(funct3)
+            if size is None:
+                return DecodedInstruction(halt('illegal_instruction'), word)
+            imm = _sext((funct7 << 5) | rd, 12)
+            store_bytes = self._store_bytes
+            write_word = self._write_word if self.unified else mem.__setitem__
+            value_mask = (1 << (8 * size)) - 1
+
+            def op():
+                addr = (x[rs1] + imm) & MASK
+                offset = addr & 3
+                if offset + size <= 4:
+                    index = addr >> 2
+                    shift = offset * 8
+                    write_word(index, (mem.get(index, 0) & ~(value_mask << shift) & MASK) |
+                               ((x[rs2] & value_mask) << shift))
+                else:
+                    store_bytes(addr, size, x[rs2])
+                return npc
+            return DecodedInstruction(op, word, 0, _sources(rs1, rs2), (rs1, imm, rs2, size))
+
+        if opcode == 0x63:  # BRANCH
+            cond = BRANCH_CONDITIONS.get(funct3)
+            if cond is None:
+                return DecodedInstruction(halt('illegal_instruction'), word)
+            imm = _sext(((word >> 31) << 12) | (((word >> 7) & 1) << 11) |
+                        (((word >> 25) & 0x3F) << 5) | (((word >> 8) & 0xF) << 1), 13)
+            target = _jump_target(pc, imm)
+
+            def op():
+                return target if cond(x[rs1], x[rs2]) else npc
+            return DecodedInstruction(op, word, 0, _sources(rs1, rs2), backward=imm < 0)
+
+        if opcode == 0x6F:  # JAL
+            imm = _sext(((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12) |
+                        (((word >> 20) & 1) << 11) | (((word >> 21) & 0x3FF) << 1), 21)
+            target = _jump_target(pc, imm)
+
+            def op():
+                if rd:
+                    x[rd] = npc
+                return target
+            return DecodedInstruction(op, word, rd, backward=imm < 0)
+
+        if opcode == 0x67 and funct3 == 0:  # JALR
+            misaligned = HALT['misaligned_fetch']
+
+            def op():
+                target = (x[rs1] + imm_i) & MASK & ~1
+                if rd:
+                    x[rd] = npc
+                return misaligned if target & 3 else target
+            return DecodedInstruction(op, word, rd, _sources(rs1), backward=True)
+
+        if opcode in (0x37, 0x17):  # LUI, AUIPC
+            value = word & 0xFFFFF000
+            if opcode == 0x17:
+                value = (pc + value) & MASK
+            if rd == 0:
+                return DecodedInstruction(done, word)
+
+            def op():
+                x[rd] = value
+                return npc
+            return DecodedInstruction(op, word, rd)
+
+        if opcode == 0x0F:  # MISC-MEM: FENCE / FENCE.I
+            return DecodedInstruction(halt('fence') if self.halt_on_fence else done, word)
+
+        if word == 0x00000073:
+            return DecodedInstruction(halt('ecall'), word)
+        if word == 0x00100073:
+            return DecodedInstruction(halt('ebreak'), word)
+        return DecodedInstruction(halt('illegal_instruction'), word)
+
+    # --- execution --------------------------------------------------------
+
+    def run(self, max_steps: int = 1_000_000, trace: Optional[TextIO] = None,
+            counts: Optional[Dict[int, int]] = None) -> SimResult:
+        """Execute until a halt condition or max_steps; optionally write a commit trace.
+
+        When counts is given, taken backward branches and jumps are tallied
+        into it by source PC, as backward_transfers() does.
+        """
+        start = time.perf_counter()
+        if trace is None:
+            steps, pc, reason = self._run_fast(max_steps, counts)
+            lines = 0
+        else:
+            steps, pc, reason, lines = self._run_traced(max_steps, trace, counts)
+        seconds = time.perf_counter() - start
+        self.pc = pc
+        return SimResult(steps, pc, reason, list(self.x), self.dirty_memory(), seconds, lines)
+
+    def stop_reason(self, pc: int, steps: int, max_steps: int) -> str:
+        """Why a run that ended at pc (a PC or HALT code) after steps instructions stopped."""
+        if pc >= HALT_BASE:
+            return HALT_REASONS[pc - HALT_BASE]
+        if pc >> 2 >= len(self.code) or pc & 3:
+            return 'pc_out_of_range'
+        return 'step_limit'
+
+    def _counted(self, index: int, counts: Dict[int, int]) -> Callable[[], int]:
+        """Closure of decoded word index that also tallies its taken backward transfers."""
+        execute = self.code[index].execute
+        pc = index * 4
+
+        def op():
+            next_pc = execute()
+            if next_pc <= pc:
+                counts[pc] = counts.get(pc, 0) + 1
+            return next_pc
+        return op
+
+    def _run_fast(self, max_steps: int, counts: Optional[Dict[int, int]] = None) -> Tuple[int, int, str]:
+        fns = self._fns
+        pc = last = self.pc
+        steps = 0
+        # Only the instructions that can go backward are wrapped to count, the
+        # rest keep running at full speed; the plain closures are put back after
+        wrapped = []
+        if counts is not None:
+            wrapped = [i for i, entry in enumerate(self.code) if entry is not None and entry.backward]
+            for i in wrapped:
+                fns[i] = self._counted(i, counts)
+        try:
+            # A halt code or a PC past the program raises IndexError on the next
+            # fetch, so the inner loop needs no per-instruction checks
+            while steps < max_steps:
+                block = min(max_steps - steps, 1 << 16)
+                i = 0
+                try:
+                    for i in range(block):
+                        # The tuple is built before assigning, so a failed fetch leaves
+                        # last at the instruction that halted
+                        last, pc = pc, fns[pc >> 2]()
+                    i = block
+                except IndexError:
+                    steps += i
+                    break
+                except TypeError:
+                    # First fetch of this PC; anything else is a real error
+                    steps += i
+                    if fns[pc >> 2] is not None:
+                        raise
+                    if self.fetch(pc >> 2).backward and counts is not None:
+                        fns[pc >> 2] = self._counted(pc >> 2, counts)
+                        wrapped.append(pc >> 2)
+                    continue
+                steps += i
+        finally:
+            for i in wrapped:
+                entry = self.code[i]
+                fns[i] = entry.execute if entry is not None else None
+        reason = self.stop_reason(pc, steps, max_steps)
+        return steps, last if pc >= HALT_BASE else pc, reason
+
+    def _run_traced(self, max_steps: int, trace: TextIO,
+                    counts: Optional[Dict[int, int]] = None) -> Tuple[int, int, str, int]:
+        x = self.x
+        pc = last = self.pc
+        steps = 0
+        lines = 0
+        while steps < max_steps and pc < HALT_BASE and pc >> 2 < len(self.code):
+            entry = self.fetch(pc >> 2)
+            store = None
+            if entry.store is not None:
+                rs1, imm, rs2, size = entry.store
+                store = ((x[rs1] + imm) & MASK, x[rs2] & ((1 << (8 * size)) - 1))
+            next_pc = entry.execute()
+            steps += 1
+            line = f"{pc:08x} ({entry.word:08x})"
+            if entry.rd:
+                line += f" x{entry.rd} {x[entry.rd]:08x}"
+            if store is not None:
+                line += f" mem {store[0]:08x} {store[1]:08x}"
+            trace.write(line + "\n")
+            lines += 1
+            if counts is not None and next_pc <= pc:
+                counts[pc] = counts.get(pc, 0) + 1
+            last, pc = pc, next_pc
+        return steps, last if pc >= HALT_BASE else pc, self.stop_reason(pc, steps, max_steps), lines
+
+    def backward_transfers(self, max_steps: int) -> Dict[int, int]:
+        """Run up to max_steps instructions from the current PC, counting taken backward branches/jumps by source PC.
+
+        Any run longer than the program has taken at least one, so this finds
+        the loops a run that hit its step limit was stuck in.
+        """
+        counts = {}
+        _, self.pc, _ = self._run_fast(max_steps, counts)
+        return counts
+
+    def profile(self, max_steps: int, regions: List[Tuple[int, int]], window: int = 3) -> 'RunProfile':
+        """Run up to max_steps instructions from the current PC, counting memory accesses and hazards.
+
+        A useful access is naturally aligned and lies inside one of regions,
+        given as (base, size) byte ranges. A source register written by one of
+        the previous window instructions is a RAW hazard at the distance of the
+        nearest such writer, the one CPU_pipelined forwards from; a load at
+        distance 1 makes it a load-use hazard. Distances are in committed
+        instructions, so stall and flush bubbles are not counted.
+        """
+        x = self.x
+        pc = self.pc
+        result = RunProfile([0] * window, [0] * window, recent=[0] * window)
+        for _ in range(max_steps):
+            if pc >= HALT_BASE or pc & 3 or pc >> 2 >= len(self.code):
+                break
+            entry = self.fetch(pc >> 2)
+            result.count(entry, x, regions)
+            pc = entry.execute()
+        self.pc = pc
+        return result
+
+    def dirty_memory(self) -> Dict[int, int]:
+        """Words written by the program (changed ones, when unified), keyed by byte address."""
+        program = self.program if self.unified else []
+        return {index * 4: word for index, word in sorted(self.mem.items())
+                if (program[index] if index < len(program) else 0) != word}
+
+
+
+class WindowSim(RV32ISim):
+    """RV32ISim over a program that arrives and is retired a piece at a time.
+
+    Word indices stay absolute: extend() appends the next words and drop()
+    forgets those before an index, so only the piece in between is held and
+    decoded. advance() runs while the PC stays inside it. The whole run is
+    kept within budget instructions of a length-word program: a backward
+    branch or jump that could take it past the budget, or back into dropped
+    words, is re-encoded by patch(index) (which returns the new word) to fall
+    through instead.
+
+    The patched program never made the transfers the instruction took
+    before, so the run returns to the state from just before its first
+    execution, saved the first time each held branch or jump that can go
+    backward runs, and goes on with the patched instruction from there.
+    Whatever ran since is discarded, so result and profile are those of a
+    run of the patched program from reset.
+    """
+
+    def __init__(self, length: int, budget: int, patch: Callable[[int], int], halt_on_fence: bool = False,
+                 profile: Optional[RunProfile] = None, regions: List[Tuple[int, int]] = ()):
+        self.length = length
+        self.budget = budget
+        self.fall_through = patch
+        self.profile = profile  # Counts every executed instruction as in profile(), if given
+        self.regions = regions
+        self.base = 0           # Index of the first held word
+        self.steps = 0
+        self.last = 0           # PC of the last instruction executed
+        self.patched: List[int] = []
+        # Index -> (steps, last, registers, memory, profile) just before its first execution
+        self.checkpoints: Dict[int, Tuple[int, int, List[int], Dict[int, int], Optional[RunProfile]]] = {}
+        super().__init__([], False, halt_on_fence)
+
+    @property
+    def end(self) -> int:
+        """Index just past the held words."""
+        return self.base + len(self.program)
+
+    def extend(self, words: List[int]):
+        """Append the words that follow the held ones."""
+        self.program.extend(w & MASK for w in words)
+        self.code.extend([None] * len(words))
+        self._fns.extend([None] * len(words))
+
+    def drop(self, index: int):
+        """Forget every word before index; the run never returns to them."""
+        count = index - self.base
+        if count > 0:
+            del self.program[:count], self.code[:count], self._fns[:count]
+            self.base = index
+            for i in [i for i in self.checkpoints if i < index]:
+                del self.checkpoints[i]
+
+    def fetch(self, index: int) -> DecodedInstruction:
+        entry = self.code[index - self.base]
+        if entry is None:
+            entry = self.code[index - self.base] = self._decode(self.program[index - self.base], index * 4)
+            self._fns[index - self.base] = entry.execute
+        return entry
+
+    def patch(self, index: int, word: int):
+        self.program[index - self.base] = word & MASK
+        self.code[index - self.base] = self._fns[index - self.base] = None
+
+    def _rewind(self, index: int) -> Tuple[int, int]:
+        """Patch index to fall through and return to its checkpoint; steps and last PC there."""
+        steps, last, regs, mem, profile = self.checkpoints.pop(index)
+        for i in [i for i, checkpoint in self.checkpoints.items() if checkpoint[0] > steps]:
+            del self.checkpoints[i]
+        # Restored in place, so the decoded closures that captured them stay valid
+        self.x[:] = regs
+        self.mem.clear()
+        self.mem.update(mem)
+        self.profile = profile
+        self.patch(index, self.fall_through(index))
+        self.patched.append(index)
+        return steps, last
+
+    def advance(self) -> Optional[SimResult]:
+        """Run until the PC leaves the held words; the result once the run is over, else None."""
+        x = self.x
+        checkpoints = self.checkpoints
+        pc, last, steps = self.pc, self.last, self.steps
+        end = self.end
+        reason = None
+        while reason is None:
+            if pc >= HALT_BASE:
+                reason = HALT_REASONS[pc - HALT_BASE]
+                break
+            index = pc >> 2
+            if index >= self.length:
+                reason = 'pc_out_of_range'
+            elif index >= end:
+                break  # Wait for the next words
+            elif steps >= self.budget:
+                reason = 'step_limit'
+            if reason is not None:
+                break
+            entry = self.code[index - self.base] or self.fetch(index)
+            if entry.backward and index not in checkpoints:
+                checkpoints[index] = (steps, last, list(x), dict(self.mem), self.profile and self.profile.copy())
+            if self.profile is not None:
+                self.profile.count(entry, x, self.regions)
+            next_pc = entry.execute()
+            steps += 1
+            if next_pc <= pc and not (next_pc >> 2 >= self.base and steps + self.length - (next_pc >> 2) <= self.budget):
+                steps, last = self._rewind(index)
+                continue  # Runs the patched instruction at pc
+            last, pc = pc, next_pc
+        self.pc, self.last, self.steps = pc, last, steps
+        if reason is None:
+            return None
+        return SimResult(steps, last if pc >= HALT_BASE else pc, reason, list(x), self.dirty_memory())
+
+
+def state_signature(regs: List[int], memory: Dict[int, int]) -> str:
+    """Short hash of a final state: x1-x31 and the written memory words."""
+    digest = hashlib.sha256()
+    digest.update(struct.pack("<31I", *regs[1:]))
+    for addr, word in sorted(memory.items()):
+        digest.update(struct.pack("<II", addr, word))
+    return digest.hexdigest()[:16]
+
+
+def load_program(path: str) -> List[int]:
+    """Read a generator .hex (one word per line) or raw little-endian .bin file."""
+    if path.endswith('.bin'):
+        with open(path, 'rb') as f:
+            data = f.read()
+        return list(struct.unpack(f"<{len(data) // 4}I", data[:len(data) // 4 * 4]))
+    with open(path, 'r') as f:
+        return [int(line, 16) for line in (raw.strip() for raw in f) if line and not line.startswith(('#', '@'))]
+
+
+def format_state(result: SimResult) -> str:
+    """Human-readable final state: stop reason, registers and written memory."""
+    lines = [f"Stopped: {result.reason} at pc 0x{result.pc:08x} after {result.steps} instructions"]
+    for row in range(0, 32, 4):
+        lines.append("  ".join(f"x{r:<2} {result.regs[r]:08x}" for r in range(row, row + 4)))
+    if result.memory:
+        lines.append("Memory written:")
+        lines.extend(f"  0x{addr:08x}: {word:08x}" for addr, word in result.memory.items())
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a generated RV32I program on the reference ISS")
+    parser.add_argument("program", help="Program image (.hex text or raw little-endian .bin)")
+    parser.add_argument("--max-steps", type=int, default=1_000_000,
+                        help="Stop after this many instructions (default: 1000000)")
+    parser.add_argument("--trace", help="Write a commit trace to this file ('-' for stdout)")
+    parser.add_argument("--unified", action="store_true",
+                        help="Map the program into data memory (loads read code, stores can modify it)")
+    parser.add_argument("--halt-on-fence", action="store_true",
+                        help="Stop at FENCE/FENCE.I like CPU_pipelined instead of treating them as no-ops")
+    parser.add_argument("--bench", type=int, metavar="RUNS",
+                        help="Run the program RUNS times without tracing and report instructions/s")
+    args = parser.parse_args()
+
+    sim = RV32ISim(load_program(args.program), unified=args.unified, halt_on_fence=args.halt_on_fence)
+
+    if args.bench:
+        steps = seconds = 0
+        for _ in range(args.bench):
+            sim.reset()
+            result = sim.run(args.max_steps)
+            steps += result.steps
+            seconds += result.seconds
+        print(f"{args.bench} runs, {steps} instructions in {seconds:.3f}s: "
+              f"{steps / seconds / 1e6:.2f} M instr/s" if seconds else "No instructions executed")
+        return
+
+    if args.trace == '-':
+        result = sim.run(args.max_steps, sys.stdout)
+    elif args.trace:
+        with open(args.trace, 'w') as f:
+            result = sim.run(args.max_steps, f)
+    else:
+        result = sim.run(args.max_steps)
+    print(format_state(result))
+    if args.trace and args.trace != '-':
+        print(f"Trace ({result.trace_lines} lines) written to: {args.trace}")
+
+
+if __name__ == "__main__":
+    main()
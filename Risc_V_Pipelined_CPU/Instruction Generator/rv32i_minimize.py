@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Delta-debugging minimizer for failing RV32I programs.
+Takes a generated program that makes a pass/fail oracle fail and removes
+instructions (ddmin) until no single instruction can be dropped without the
+failure going away. Branch and JAL offsets are re-encoded after every removal
+so control flow keeps pointing at the same instructions, and candidate
+programs are evaluated in parallel.
+
+The oracle is a shell command run once per candidate, with placeholders for
+the candidate's files, e.g. "vvp sim.vvp +prog={hex}" or "python check.py
+{bin}". Exit status 0 means the candidate still fails (it is interesting).
+"""
+
+import argparse
+import bisect
+import os
+import shutil
+import string
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from rv32i_asm import load_words
+from rv32i_encoding import KIND_B, KIND_J, Encoding, pack_fields
+from rv32i_images import FORMATS, IMEM_DEPTH, write_images
+
+
+# Operand-independent bits kept when an offset is re-encoded
+_B_KEEP = 0x01FFF07F  # opcode, funct3, rs1, rs2
+_J_KEEP = 0x00000FFF  # opcode, rd
+
+
+def branch_offset(word: int) -> Optional[int]:
+    """Byte offset of a B- or J-type word, None for any other instruction."""
+    opcode = word & 0x7F
+    if opcode == 0x63:
+        imm = ((word >> 31) << 12) | (((word >> 7) & 1) << 11) | (((word >> 25) & 0x3F) << 5) | \
+              (((word >> 8) & 0xF) << 1)
+        return imm - (1 << 13) if imm & (1 << 12) else imm
+    if opcode == 0x6F:
+        imm = ((word >> 31) << 20) | (((word >> 12) & 0xFF) << 12) | (((word >> 20) & 1) << 11) | \
+              (((word >> 21) & 0x3FF) << 1)
+        return imm - (1 << 21) if imm & (1 << 20) else imm
+    return None
+
+
+def retarget(word: int, offset: int) -> int:
+    """The same B- or J-type word with a new byte offset."""
+    if word & 0x7F == 0x63:
+        return pack_fields(Encoding('', KIND_B, 0x63, 0, 0, word & _B_KEEP), None, None, None, offset, None)
+    return pack_fields(Encoding('', KIND_J, 0x6F, 0, 0, word & _J_KEEP), None, None, None, offset, None)
+
+
+def build(words: Sequence[int], kept: Sequence[int]) -> List[int]:
+    """Program made of words[kept] (kept sorted), with branch and JAL offsets re-encoded.
+
+    A target that was removed moves to the next kept instruction, or to just
+    past the end when there is none, which is where the original program went
+    after running the removed ones. Offsets that do not land on an instruction
+    of the original program, and JALR, are left as they are.
+    """
+    out = []
+    for new, index in enumerate(kept):
+        word = words[index]
+        offset = branch_offset(word)
+        if offset is not None and offset % 4 == 0 and 0 <= index + offset // 4 <= len(words):
+            target = bisect.bisect_left(kept, index + offset // 4)
+            word = retarget(word, (target - new) * 4)
+        out.append(word)
+    return out
+
+
+class CommandOracle:
+    """Runs a shell command on each candidate; exit status 0 means it still fails.
+
+    Placeholders {hex}, {bin}, {elf}, {memh}, {memb}, {coe} and {mem} expand to
+    the candidate's files in that format, {dir} to its scratch directory. A
+    command without placeholders gets the .hex path appended.
+    """
+
+    def __init__(self, command: str, timeout: Optional[float] = None, depth: int = IMEM_DEPTH,
+                 workdir: Optional[str] = None):
+        fields = {name for _, name, _, _ in string.Formatter().parse(command) if name}
+        unknown = fields - set(FORMATS) - {'dir'}
+        if unknown:
+            raise ValueError(f"Unknown oracle placeholder(s): {', '.join(sorted(unknown))}")
+        if not fields:
+            command += " {hex}"
+            fields = {'hex'}
+        self.command = command
+        self.formats = [fmt for fmt in FORMATS if fmt in fields]
+        self.timeout = timeout
+        self.depth = depth
+        self.workdir = workdir
+
+    def __call__(self, words: List[int]) -> bool:
+        scratch = tempfile.mkdtemp(prefix="rv32i_min_", dir=self.workdir)
+        try:
+            files = write_images(words, os.path.join(scratch, "candidate"), self.formats, self.depth)
+            command = self.command.format(dir=scratch, **files)
+            try:
+                status = subprocess.run(command, shell=True, cwd=scratch, timeout=self.timeout,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+            except subprocess.TimeoutExpired:
+                return False  # A hang is a different failure
+            return status == 0
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+@dataclass
+class MinimizeResult:
+    """Outcome of one minimization."""
+    words: List[int]
+    kept: List[int]              # Indices into the original program
+    original_length: int
+    oracle_calls: int
+    cache_hits: int
+    rounds: int
+    seconds: float
+
+
+def minimize(words: Sequence[int], oracle: Callable[[List[int]], bool], workers: int = 1,
+             verbose: bool = False) -> MinimizeResult:
+    """ddmin over the instructions of words, keeping oracle(candidate) true.
+
+    Candidates of one round are evaluated workers at a time. The first
+    interesting one in ddmin order is taken, so the result does not depend on
+    workers. The result is 1-minimal: removing any single remaining
+    instruction makes the oracle pass.
+    """
+    words = list(words)
+    start = time.perf_counter()
+    cache: Dict[tuple, bool] = {}
+    stats = {'calls': 0, 'hits': 0}
+
+    def evaluate(kept: tuple) -> bool:
+        return oracle(build(words, kept))
+
+    def first_interesting(candidates: List[tuple]) -> Optional[tuple]:
+        fresh = [c for c in dict.fromkeys(candidates) if c not in cache]
+        stats['hits'] += len(candidates) - len(fresh)
+        known = next((c for c in candidates if cache.get(c)), None)
+        if known is not None:
+            return known
+        found = None
+        with ThreadPoolExecutor(max(1, workers)) as pool:
+            futures = [(c, pool.submit(evaluate, c)) for c in fresh]
+            for candidate, future in futures:
+                cache[candidate] = future.result()
+                if cache[candidate]:
+                    found = candidate
+                    for _, pending in futures:
+                        pending.cancel()
+                    break
+        # Running candidates finish before the pool closes; cancelled ones never ran
+        stats['calls'] += sum(not future.cancelled() for _, future in futures)
+        return found
+
+    kept = tuple(range(len(words)))
+    stats['calls'] += 1
+    if not evaluate(kept):
+        raise ValueError("the original program does not make the oracle fail")
+    cache[kept] = True
+
+    n = 2
+    rounds = 0
+    while len(kept) >= 2:
+        rounds += 1
+        size = len(kept)
+        bounds = [size * i // n for i in range(n + 1)]
+        chunks = [kept[bounds[i]:bounds[i + 1]] for i in range(n)]
+        found = first_interesting(chunks)
+        if found is not None:
+            kept, n = found, 2
+        else:
+            found = first_interesting([kept[:bounds[i]] + kept[bounds[i + 1]:] for i in range(n)])
+            if found is not None:
+                kept, n = found, max(n - 1, 2)
+            elif n >= size:
+                break
+            else:
+                n = min(2 * n, size)
+        if verbose:
+            print(f"  round {rounds}: {len(kept)} instructions, {stats['calls']} oracle calls")
+
+    return MinimizeResult(build(words, kept), list(kept), len(words), stats['calls'], stats['hits'],
+                          rounds, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimize a failing RV32I program with delta debugging")
+    parser.add_argument("program", help="Failing program (.S listing, .hex or .bin)")
+    parser.add_argument("--oracle", required=True,
+                        help="Shell command; exit status 0 means the candidate still fails. "
+                             "Placeholders: {hex} {bin} {elf} {memh} {memb} {coe} {mem} {dir}")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Output prefix for the minimized program (default: <program>_min)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Candidates evaluated concurrently (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds before an oracle run counts as passing (default: none)")
+    parser.add_argument("--formats", default="hex,bin",
+                        help="Formats written for the minimized program (default: %(default)s)")
+    parser.add_argument("--imem-depth", type=int, default=IMEM_DEPTH,
+                        help="Words per memory image, for the oracle and the output (default: %(default)s)")
+    parser.add_argument("--metadata", default="rv32i_metadata.json", help="Instruction metadata JSON, for .S input")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print progress after every round")
+    args = parser.parse_args()
+
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(FORMATS)}")
+    try:
+        oracle = CommandOracle(args.oracle, args.timeout, args.imem_depth)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        words = load_words(args.program, args.metadata)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Minimizing {len(words)} instructions from {args.program} with {args.workers} worker(s)...")
+    try:
+        result = minimize(words, oracle, args.workers, args.verbose)
+    except ValueError as e:
+        parser.error(str(e))
+
+    prefix = args.output or os.path.splitext(args.program)[0] + "_min"
+    files = write_images(result.words, prefix, formats, args.imem_depth)
+    print(f"Reduced {result.original_length} -> {len(result.words)} instructions in {result.rounds} rounds, "
+          f"{result.oracle_calls} oracle calls ({result.cache_hits} cached), {result.seconds:.1f}s")
+    print(f"Kept original instructions: {', '.join(map(str, result.kept))}")
+    for kind, path in files.items():
+        print(f"{kind.capitalize()} written to: {', '.join(path) if isinstance(path, list) else path}")
+
+
+if __name__ == "__main__":
+    main()
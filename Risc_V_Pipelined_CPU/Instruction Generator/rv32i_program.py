@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Compact program container for the per-instruction generator.
+A Program keeps one typed array per instruction field (mnemonic index,
+registers, immediate, label target, packed word) instead of one object per
+instruction, and renders assembly text only when it is asked for.
+InstructionView reads and writes one row under the attribute names of
+InstructionObject, so code written against instruction objects keeps working.
+"""
+
+from array import array
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Callable, Dict, Iterator, List, Optional
+
+from rv32i_encoding import KIND_SHIFT, Encoding, np
+
+
+# Stored in place of None: registers, shamt and label targets are never
+# negative, and no immediate comes near -2**31
+_NO_REG = -1
+_NO_IMM = -(1 << 31)
+
+
+@dataclass
+class InstructionObject:
+    """Represents a single RISC-V instruction with all necessary fields."""
+    mnemonic: str
+    format: str
+    category: str
+    rd: Optional[int] = None
+    rs1: Optional[int] = None
+    rs2: Optional[int] = None
+    imm: Optional[int] = None
+    shamt: Optional[int] = None
+    label_target_index: Optional[int] = None
+    label_name: Optional[str] = None
+    raw_word: int = 0
+    assembly_text: str = ""
+    metadata: Optional[Dict] = None
+
+
+def render_fields(meta: Dict, rd: Optional[int], rs1: Optional[int], rs2: Optional[int], imm: Optional[int],
+                  shamt: Optional[int], label_name: Optional[str]) -> str:
+    """Assembly text of one instruction from its metadata entry and fields."""
+    mnem = meta['mnemonic'].lower()
+    if mnem in ['ecall', 'ebreak', 'fence', 'fence.i']:
+        return mnem
+
+    operands = []
+    for op in meta['operand_pattern']:
+        if op == 'rd':
+            operands.append(f"x{rd}")
+        elif op == 'rs1':
+            operands.append(f"x{rs1}")
+        elif op == 'rs2':
+            operands.append(f"x{rs2}")
+        elif op == 'imm':
+            operands.append(str(imm))
+        elif op == 'shamt':
+            operands.append(str(shamt))
+        elif op == 'imm20':
+            operands.append(f"0x{imm:x}")
+        elif op == 'label':
+            operands.append(label_name if label_name else "L_?")
+        elif 'imm(rs1)' in op:
+            operands.append(f"{imm}(x{rs1})")
+        elif op == 'pred_succ':
+            operands.append("iorw, iorw")  # Default fence
+
+    if operands:
+        return f"{mnem} {', '.join(operands)}"
+    return mnem
+
+
+def render_assembly(obj) -> str:
+    """Assembly text of an instruction object or view."""
+    return render_fields(obj.metadata, obj.rd, obj.rs1, obj.rs2, obj.imm, obj.shamt, obj.label_name)
+
+
+def _column(values: array, missing: int) -> 'np.ndarray':
+    """int64 copy of a field array, with 0 where the field is missing."""
+    out = np.array(values, dtype=np.int64)
+    out[out == missing] = 0
+    return out
+
+
+def _optional_field(name: str, missing: int, doc: str) -> property:
+    """Property over Program.<name>[row] that maps the missing marker to None."""
+    values = attrgetter(name)
+
+    def get(self):
+        program = self.program
+        value = values(program)[self.index - program.base]
+        return None if value == missing else value
+
+    def set(self, value):
+        program = self.program
+        values(program)[self.index - program.base] = missing if value is None else value
+    return property(get, set, doc=doc)
+
+
+def _metadata_field(key: Optional[str], doc: str) -> property:
+    """Property reading metadata[key] of the row's mnemonic (the entry itself for key None).
+
+    Only the entry and the mnemonic can be assigned; both select a new mnemonic.
+    """
+    def get(self):
+        program = self.program
+        meta = program.metadata[program.op[self.index - program.base]]
+        return meta if key is None else meta[key]
+
+    def set(self, value):
+        program = self.program
+        program.op[self.index - program.base] = program.op_index[value if key else value['mnemonic']]
+    return property(get, set if key in (None, 'mnemonic') else None, doc=doc)
+
+
+class Lines:
+    """Text lines rendered on demand each time they are iterated."""
+    __slots__ = ('render',)
+
+    def __init__(self, render: Callable[[], Iterator[str]]):
+        self.render = render
+
+    def __iter__(self) -> Iterator[str]:
+        return self.render()
+
+
+class InstructionView:
+    """One instruction of a Program, with the attributes of InstructionObject.
+
+    format, category and metadata follow the mnemonic; label_name follows the
+    label target, and assembly_text is rendered from the fields on every read.
+    """
+    __slots__ = ('program', 'index')
+
+    def __init__(self, program: 'Program', index: int):
+        self.program = program
+        self.index = index
+
+    rd = _optional_field('rd', _NO_REG, "Destination register, None if the instruction has none")
+    rs1 = _optional_field('rs1', _NO_REG, "First source register, None if none")
+    rs2 = _optional_field('rs2', _NO_REG, "Second source register, None if none")
+    imm = _optional_field('imm', _NO_IMM, "Immediate (byte offset for branches and jumps), None if none")
+    shamt = _optional_field('shamt', _NO_REG, "Shift amount, None if none")
+    label_target_index = _optional_field('target', _NO_REG, "Index of the branch or jump target, None if none")
+
+    metadata = _metadata_field(None, "Metadata entry of the mnemonic; assigning one changes the mnemonic")
+    mnemonic = _metadata_field('mnemonic', "Mnemonic; assigning one changes format, category and metadata too")
+    format = _metadata_field('format', "Instruction format, from the metadata")
+    category = _metadata_field('category', "Instruction category, from the metadata")
+
+    @property
+    def label_name(self) -> Optional[str]:
+        target = self.label_target_index
+        return None if target is None else f"L{target}"
+
+    @property
+    def raw_word(self) -> int:
+        return self.program.word[self.index - self.program.base]
+
+    @raw_word.setter
+    def raw_word(self, word: int):
+        self.program.word[self.index - self.program.base] = word
+
+    @property
+    def assembly_text(self) -> str:
+        return render_assembly(self)
+
+    def to_object(self) -> InstructionObject:
+        """A detached InstructionObject with the same fields."""
+        return InstructionObject(self.mnemonic, self.format, self.category, self.rd, self.rs1, self.rs2,
+                                 self.imm, self.shamt, self.label_target_index, self.label_name,
+                                 self.raw_word, self.assembly_text, self.metadata)
+
+    def __repr__(self) -> str:
+        return f"InstructionView({self.index}: {self.assembly_text})"
+
+
+class Program:
+    """A generated program as parallel typed arrays, one row per instruction.
+
+    Rows are addressed by their index in the program. trim() drops rows from
+    the front while keeping those indices, so a streamed program only holds
+    the instructions that are still in flight.
+    """
+
+    def __init__(self, metadata: List[Dict]):
+        self.metadata = metadata
+        self.op_index = {m['mnemonic']: i for i, m in enumerate(metadata)}
+        self.base = 0                # Index of the first row held
+        self.op = array('B')         # Position in metadata
+        self.rd = array('b')
+        self.rs1 = array('b')
+        self.rs2 = array('b')
+        self.shamt = array('b')
+        self.imm = array('i')
+        self.target = array('i')     # label_target_index
+        self.word = array('I')       # Packed instruction, 0 until packed
+
+    def _arrays(self) -> List[array]:
+        return [self.op, self.rd, self.rs1, self.rs2, self.shamt, self.imm, self.target, self.word]
+
+    def append(self, meta: Dict, rd: Optional[int] = None, rs1: Optional[int] = None, rs2: Optional[int] = None,
+               imm: Optional[int] = None, shamt: Optional[int] = None,
+               target: Optional[int] = None) -> InstructionView:
+        """Add an instruction with the given operands (none by default) and return its view."""
+        self.op.append(self.op_index[meta['mnemonic']])
+        self.rd.append(_NO_REG if rd is None else rd)
+        self.rs1.append(_NO_REG if rs1 is None else rs1)
+        self.rs2.append(_NO_REG if rs2 is None else rs2)
+        self.shamt.append(_NO_REG if shamt is None else shamt)
+        self.imm.append(_NO_IMM if imm is None else imm)
+        self.target.append(_NO_REG if target is None else target)
+        self.word.append(0)
+        return InstructionView(self, self.base + len(self.op) - 1)
+
+    def trim(self, index: int):
+        """Drop every row before index; their views must no longer be used."""
+        count = index - self.base
+        if count > 0:
+            for column in self._arrays():
+                del column[:count]
+            self.base = index
+
+    def __len__(self) -> int:
+        return self.base + len(self.op)
+
+    def __getitem__(self, index: int) -> InstructionView:
+        if index < 0:
+            index += len(self)
+        if not self.base <= index < len(self):
+            raise IndexError(f"instruction {index} is not held (rows {self.base}..{len(self) - 1})")
+        return InstructionView(self, index)
+
+    def __iter__(self) -> Iterator[InstructionView]:
+        return (InstructionView(self, index) for index in range(self.base, len(self)))
+
+    def listing(self, format_line: Callable[[str, int], str], stop: Optional[int] = None,
+                labels: Optional[set] = None) -> Lines:
+        """Lines of the .S listing for the rows before stop (all rows held by default).
+
+        Each instruction is format_line(assembly text, packed word), preceded by
+        L<index>: when it is in labels (every label target held by default).
+        Text is rendered straight from the arrays, without views.
+        """
+        count = (len(self) if stop is None else stop) - self.base
+
+        def render() -> Iterator[str]:
+            targets = set(self.target) - {_NO_REG} if labels is None else labels
+            columns = [column[:count] for column in self._arrays()]
+            for index, (op, rd, rs1, rs2, shamt, imm, target, word) in enumerate(zip(*columns), self.base):
+                if index in targets:
+                    yield f"L{index}:"
+                text = render_fields(self.metadata[op], rd, rs1, rs2, imm, shamt,
+                                     None if target == _NO_REG else f"L{target}")
+                yield format_line(text, word)
+        return Lines(render)
+
+    def hex_lines(self) -> Lines:
+        """One 8-digit hex line per packed word."""
+        return Lines(lambda: (f"{word:08x}" for word in self.word))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the field arrays."""
+        return sum(column.itemsize * len(column) for column in self._arrays())
+
+    def column(self, name: str) -> 'np.ndarray':
+        """Writable NumPy view of one field array (rows held); release it before appending."""
+        values = getattr(self, name)
+        return np.frombuffer(values, dtype=values.typecode)
+
+    def field_arrays(self, encodings: Dict[str, Encoding], stop: Optional[int] = None) -> Dict:
+        """The rows held before stop as int64 arrays for rv32i_encoding.pack_program(), without a per-row gather."""
+        if np is None:
+            raise RuntimeError("NumPy is required for vectorized packing (pip install numpy)")
+        count = (len(self) if stop is None else stop) - self.base
+        encs = [encodings[m['mnemonic']] for m in self.metadata]
+        op = np.array(self.op[:count], dtype=np.intp)
+        kind = np.array([e.kind for e in encs], dtype=np.int64)[op]
+        field = lambda values, missing: _column(values[:count], missing)
+        return {
+            'kind': kind,
+            'base': np.array([e.base for e in encs], dtype=np.int64)[op],
+            'rd': field(self.rd, _NO_REG),
+            'rs1': field(self.rs1, _NO_REG),
+            'rs2': field(self.rs2, _NO_REG),
+            # Shifts carry their shamt in the immediate slot (bits 24:20)
+            'imm': np.where(kind == KIND_SHIFT, field(self.shamt, _NO_REG), field(self.imm, _NO_IMM)),
+        }
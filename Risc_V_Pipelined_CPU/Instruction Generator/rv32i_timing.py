@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Cycle-approximate timing model of src/CPU_pipelined.v.
+Runs a generated program on the reference ISS and charges every executed
+instruction the cycles the pipeline would spend on it: one issue slot, plus
+the memory-port stall of loads and stores and the flush of taken branches and
+jumps. Reports cycles, CPI, stalls by cause, flushes and forwarding.
+"""
+
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List
+
+from rv32i_iss import BRANCH_CONDITIONS, HALT_BASE, RV32ISim, load_program
+
+
+# CPU_pipelined latches IF/ID and EX/MEM on the rising edge and ID/EX and
+# MEM/WB on the falling edge, so an instruction spends one cycle in each of
+# IF, ID+EX and MEM+WB.
+
+# Cycles after the last fetch until that instruction has written back
+DRAIN_CYCLES = 2
+
+# A load or store in EX raises stall: the next fetch waits one cycle because
+# instructions and data share the single port of memory.v
+MEM_STALL_CYCLES = 1
+
+# PCSrc comes from EX/MEM, by which time IF/ID and ID/EX hold two
+# wrong-path instructions; both are squashed
+FLUSH_CYCLES = 2
+
+STALL_CAUSES = ['load_use', 'load', 'store']
+FLUSH_KINDS = ['branch', 'jal', 'jalr']
+FORWARD_PATHS = ['ex_mem', 'mem_wb']
+
+# Timing classes of an instruction word
+K_ALU, K_LOAD, K_STORE, K_BRANCH, K_JAL, K_JALR, K_HALT = range(7)
+
+
+@dataclass
+class TimingResult:
+    """Cycle accounting of one program run."""
+    instructions: int = 0           # Retired, not counting the FENCE/SYSTEM fetch that halts the core
+    cycles: int = 0
+    stalls: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(STALL_CAUSES, 0))
+    flushes: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(FLUSH_KINDS, 0))
+    forwards: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(FORWARD_PATHS, 0))
+    stop: str = ''
+    wrong_path_halt: bool = False   # Halted on a FENCE/SYSTEM fetched in a taken branch's shadow
+
+    @property
+    def cpi(self) -> float:
+        return self.cycles / self.instructions if self.instructions else 0.0
+
+    @property
+    def flushed_instructions(self) -> int:
+        return FLUSH_CYCLES * sum(self.flushes.values())
+
+    def merge(self, other: 'TimingResult'):
+        """Add another run's counts to this one."""
+        self.instructions += other.instructions
+        self.cycles += other.cycles
+        for totals, counts in [(self.stalls, other.stalls), (self.flushes, other.flushes),
+                               (self.forwards, other.forwards)]:
+            for key, value in counts.items():
+                totals[key] += value
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data['cpi'] = round(self.cpi, 4)
+        data['flushed_instructions'] = self.flushed_instructions
+        return data
+
+
+def _classify(word: int):
+    """(kind, rd written or 0, registers read, branch (cond, rs1, rs2) or None) of one word."""
+    opcode = word & 0x7F
+    rd = (word >> 7) & 0x1F
+    funct3 = (word >> 12) & 0x7
+    rs1 = (word >> 15) & 0x1F
+    rs2 = (word >> 20) & 0x1F
+    if opcode == 0x33:
+        return K_ALU, rd, (rs1, rs2), None
+    if opcode == 0x13:
+        return K_ALU, rd, (rs1,), None
+    if opcode in (0x37, 0x17):
+        return K_ALU, rd, (), None
+    if opcode == 0x03:
+        return K_LOAD, rd, (rs1,), None
+    if opcode == 0x23:
+        return K_STORE, 0, (rs1, rs2), None
+    if opcode == 0x63:
+        return K_BRANCH, 0, (rs1, rs2), (BRANCH_CONDITIONS.get(funct3), rs1, rs2)
+    if opcode == 0x6F:
+        return K_JAL, rd, (), None
+    if opcode == 0x67:
+        return K_JALR, rd, (rs1,), None
+    if opcode in (0x0F, 0x73):
+        return K_HALT, 0, (), None  # Fetching one stalls CPU_pipelined for good
+    return K_ALU, 0, (), None
+
+
+class PipelineModel:
+    """Timing model of CPU_pipelined for one program image."""
+
+    def __init__(self, words: List[int]):
+        self.words = [w & 0xFFFFFFFF for w in words]
+        # Reads of x0 never forward; drop them once here
+        self.info = [(kind, rd, tuple(r for r in srcs if r), branch)
+                     for kind, rd, srcs, branch in map(_classify, self.words)]
+
+    def run(self, max_steps: int = 1_000_000) -> TimingResult:
+        """Execute the program on the ISS and count the cycles CPU_pipelined would take."""
+        sim = RV32ISim(self.words, halt_on_fence=True)
+        x = sim.x
+        fetch = sim.fetch
+        info = self.info
+        n = len(info)
+        result = TimingResult()
+        stalls, flushes, forwards = result.stalls, result.flushes, result.forwards
+
+        pc = 0
+        slots = 0
+        prev1 = prev2 = 0  # rd of the last two issue slots; 0 for bubbles and non-writes
+        while True:
+            index = pc >> 2
+            if pc >= HALT_BASE or index >= n or pc & 3 or result.instructions >= max_steps:
+                result.stop = sim.stop_reason(pc, result.instructions, max_steps)
+                break
+            kind, rd, srcs, branch = info[index]
+            if kind == K_HALT:
+                result.stop = sim.stop_reason(fetch(index).execute(), result.instructions, max_steps)
+                break
+
+            for r in srcs:
+                if r == prev1:
+                    forwards['ex_mem'] += 1
+                elif r == prev2:
+                    forwards['mem_wb'] += 1
+            taken = kind in (K_JAL, K_JALR)
+            if kind == K_BRANCH and branch[0] is not None:
+                # From the registers before executing: a taken branch to pc + 4 still flushes
+                taken = branch[0](x[branch[1]], x[branch[2]])
+            next_pc = fetch(index).execute()
+            result.instructions += 1
+            slots += 1
+            prev2, prev1 = prev1, rd
+
+            if kind == K_LOAD or kind == K_STORE:
+                slots += MEM_STALL_CYCLES
+                if kind == K_STORE:
+                    stalls['store'] += MEM_STALL_CYCLES
+                elif rd and next_pc >> 2 < n and rd in info[next_pc >> 2][2]:
+                    stalls['load_use'] += MEM_STALL_CYCLES
+                else:
+                    stalls['load'] += MEM_STALL_CYCLES
+                prev2, prev1 = prev1, 0
+            elif taken:
+                slots += FLUSH_CYCLES
+                flushes['branch' if kind == K_BRANCH else 'jal' if kind == K_JAL else 'jalr'] += 1
+                prev2 = prev1 = 0
+                # A FENCE/SYSTEM fetched on the wrong path stalls the PC before the redirect
+                if any(index + k < n and info[index + k][0] == K_HALT for k in range(1, FLUSH_CYCLES + 1)):
+                    result.wrong_path_halt = True
+                    result.stop = 'wrong_path_halt'
+                    break
+            pc = next_pc
+
+        result.cycles = slots + DRAIN_CYCLES if result.instructions else 0
+        return result
+
+
+def format_table(rows: List[tuple]) -> str:
+    """Per-program table: (name, TimingResult) rows."""
+    header = (f"{'program':<28} {'instr':>8} {'cycles':>8} {'CPI':>6} {'ld-use':>7} {'load':>6} "
+              f"{'store':>6} {'flush':>6} {'fwd1':>6} {'fwd2':>6}  stop")
+    lines = [header]
+    for name, r in rows:
+        lines.append(f"{name[-28:]:<28} {r.instructions:>8} {r.cycles:>8} {r.cpi:>6.3f} "
+                     f"{r.stalls['load_use']:>7} {r.stalls['load']:>6} {r.stalls['store']:>6} "
+                     f"{sum(r.flushes.values()):>6} {r.forwards['ex_mem']:>6} {r.forwards['mem_wb']:>6}  {r.stop}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict CPU_pipelined cycles and CPI for generated programs")
+    parser.add_argument("programs", nargs='+', help="Program images (.hex or .bin)")
+    parser.add_argument("--max-steps", type=int, default=1_000_000,
+                        help="Instructions to model per program (default: 1000000)")
+    parser.add_argument("--summary", action="store_true", help="Print only the totals")
+    parser.add_argument("--json", metavar="FILE", help="Also write per-program and total results as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = [(path, PipelineModel(load_program(path)).run(args.max_steps)) for path in args.programs]
+    elapsed = time.perf_counter() - start
+
+    total = TimingResult()
+    for _, r in rows:
+        total.merge(r)
+    if not args.summary:
+        print(format_table(rows))
+        print()
+    print(f"{len(rows)} programs, {total.instructions} instructions, {total.cycles} cycles, CPI {total.cpi:.3f}")
+    print("Stall cycles: " + ", ".join(f"{k} {v}" for k, v in total.stalls.items()))
+    print("Flushes: " + ", ".join(f"{k} {v}" for k, v in total.flushes.items()) +
+          f" ({total.flushed_instructions} instructions squashed)")
+    print("Forwarded operands: " + ", ".join(f"{k} {v}" for k, v in total.forwards.items()))
+    wrong_path = sum(r.wrong_path_halt for _, r in rows)
+    if wrong_path:
+        print(f"{wrong_path} program(s) halt on a FENCE/SYSTEM fetched in a taken branch's shadow")
+    print(f"Modelled in {elapsed:.2f}s ({len(rows) / elapsed * 60:.0f} programs/min)" if elapsed > 0 else "")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"programs": {path: r.to_dict() for path, r in rows}, "total": total.to_dict()}, f, indent=2)
+        print(f"Results written to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
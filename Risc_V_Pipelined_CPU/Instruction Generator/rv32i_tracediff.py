@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Commit-trace comparator between the reference ISS and RTL waveform dumps.
+Streams a VCD of CPU_pipelined (memory-mapped, a regex scan that only stops
+on timestamps and the handful of watched signals), rebuilds the register-file
+writes it performed, and compares them in order against the writes the
+program makes on the reference ISS. Reports the first divergence with the
+commits around it. Memory use does not depend on the size of the dump.
+"""
+
+import argparse
+import mmap
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice, zip_longest
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from rv32i_iss import HALT_BASE, RV32ISim, load_program
+
+
+# Signals read from the dump, as suffixes of their hierarchical names
+DEFAULT_SIGNALS = {
+    'clk': 'reg_file.clk',
+    'rst': 'reg_file.rst',
+    'write_enable': 'reg_file.regWriteEnable',
+    'write_reg': 'reg_file.writeReg',
+    'write_data': 'reg_file.writeData',
+    'pc': 'MEM_WB_PC',  # Optional; commits carry no PC when it is not dumped
+}
+OPTIONAL_SIGNALS = ['pc']
+
+# Bytes of the dump scanned between releases of the pages already read
+SCAN_WINDOW = 16 << 20
+_MADV_DONTNEED = getattr(mmap, 'MADV_DONTNEED', None)  # Not on Windows or before Python 3.8
+
+
+class Commit(NamedTuple):
+    """One register-file write: x[rd] = value by the instruction at pc."""
+    rd: int
+    value: Optional[int]   # None when the dump has x/z bits
+    pc: Optional[int]      # None when unknown
+    time: Optional[int]    # Dump time of the falling clock edge; None for ISS commits
+
+    def __str__(self) -> str:
+        value = "xxxxxxxx" if self.value is None else f"{self.value:08x}"
+        where = "" if self.pc is None else f"pc {self.pc:08x}  "
+        when = "" if self.time is None else f"  @{self.time}"
+        return f"{where}x{self.rd:<2} = {value}{when}"
+
+
+class VcdHeader(NamedTuple):
+    """Declarations of a VCD: hierarchical name -> (id code, width), and the timescale."""
+    variables: Dict[str, Tuple[str, int]]
+    timescale: str
+    body_offset: int
+
+
+def read_header(data) -> VcdHeader:
+    """Parse the declarations of a VCD held in a bytes-like object (e.g. an mmap)."""
+    end = data.find(b'$enddefinitions')
+    if end < 0:
+        raise ValueError("not a VCD file: no $enddefinitions")
+    body = data.find(b'$end', end + len(b'$enddefinitions'))
+    tokens = bytes(data[:end]).decode('ascii', 'replace').split()
+    scope: List[str] = []
+    variables = {}
+    timescale = ''
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == '$scope':
+            scope.append(tokens[i + 2])
+            i += 3
+        elif token == '$upscope':
+            scope.pop()
+            i += 1
+        elif token == '$var':
+            # $var <type> <width> <id> <name> [<range>] $end
+            width, code, name = int(tokens[i + 2]), tokens[i + 3], tokens[i + 4]
+            variables['.'.join(scope + [name])] = (code, width)
+            i += 5
+        elif token == '$timescale':
+            j = tokens.index('$end', i)
+            timescale = ''.join(tokens[i + 1:j])
+            i = j
+        i += 1
+    return VcdHeader(variables, timescale, body + len(b'$end'))
+
+
+def resolve_signals(variables: Dict[str, Tuple[str, int]], wanted: Dict[str, str]) -> Dict[str, str]:
+    """Id code of every wanted role, matching each name as a suffix of a hierarchical name."""
+    codes = {}
+    for role, suffix in wanted.items():
+        matches = sorted(name for name in variables if name == suffix or name.endswith('.' + suffix))
+        if not matches:
+            if role in OPTIONAL_SIGNALS:
+                continue
+            raise ValueError(f"signal '{suffix}' ({role}) is not in the dump; name it with --signal {role}=...")
+        # Several scopes may see the same net; they share one id code
+        if len({variables[name][0] for name in matches}) > 1:
+            raise ValueError(f"signal '{suffix}' ({role}) is ambiguous: {', '.join(matches[:4])}; "
+                             f"name it with --signal {role}=...")
+        codes[role] = variables[matches[0]][0]
+    return codes
+
+
+def _value(bits: bytes) -> Optional[int]:
+    try:
+        return int(bits, 2)
+    except ValueError:
+        return None  # x or z bits
+
+
+def rtl_commits(path: str, signals: Dict[str, str] = DEFAULT_SIGNALS) -> Iterator[Commit]:
+    """Register-file writes recorded in a VCD, in order.
+
+    register_file writes on the falling clock edge, with the MEM/WB values
+    from before that edge, so at every timestamp where clk falls the watched
+    signals are sampled as they settled at the end of the previous timestamp.
+    Writes to x0 and writes during reset are skipped. The dump is scanned in
+    windows whose pages are released once read, so memory stays bounded.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = read_header(data)
+        codes = resolve_signals(header.variables, signals)
+        roles: Dict[bytes, List[str]] = {}
+        for role, code in codes.items():
+            roles.setdefault(code.encode(), []).append(role)
+        ids = b'|'.join(re.escape(code) for code in sorted(roles, key=len, reverse=True))
+        # Timestamps, and scalar or vector changes of the watched ids only; everything
+        # else is skipped by the regex engine without reaching Python
+        change = re.compile(rb'\n(?:#(\d+)|([01xzXZ])(' + ids + rb')|[bB]([01xzXZ]+) (' + ids + rb'))(?=\r?$)',
+                            re.MULTILINE)
+
+        current: Dict[str, Optional[int]] = dict.fromkeys(codes)
+        settled = dict(current)  # Values at the end of the previous timestamp
+        now = 0
+        pos = header.body_offset  # The newline before the first value change
+        while pos < len(data):
+            # Windows end at a newline, which starts the next window's first match
+            end = data.find(b'\n', pos + SCAN_WINDOW)
+            end = len(data) if end < 0 else end
+            for match in change.finditer(data, pos, end):
+                stamp, scalar, scalar_id, vector, vector_id = match.groups()
+                if stamp is None:
+                    value = _value(scalar if scalar is not None else vector)
+                    for role in roles[scalar_id or vector_id]:
+                        current[role] = value
+                    continue
+                # End of the timestamp that started at now: did clk fall in it?
+                if settled['clk'] == 1 and current['clk'] == 0:
+                    commit = _sample(settled, now)
+                    if commit is not None:
+                        yield commit
+                settled = dict(current)
+                now = int(stamp)
+            if _MADV_DONTNEED is not None:
+                data.madvise(_MADV_DONTNEED, 0, end - end % mmap.PAGESIZE)
+            pos = end
+        if settled['clk'] == 1 and current['clk'] == 0:
+            commit = _sample(settled, now)
+            if commit is not None:
+                yield commit
+
+
+def _sample(value: Dict[str, Optional[int]], now: int) -> Optional[Commit]:
+    """The write register_file performs on a falling edge at now, if any."""
+    if value.get('rst') or value['write_enable'] != 1 or not value['write_reg']:
+        return None
+    return Commit(value['write_reg'], value['write_data'], value.get('pc'), now)
+
+
+def iss_commits(words: List[int], max_steps: int = 1_000_000) -> Iterator[Commit]:
+    """Register writes of a program on the reference ISS, which stops at FENCE/SYSTEM like CPU_pipelined."""
+    sim = RV32ISim(words, halt_on_fence=True)
+    x = sim.x
+    n = len(words)
+    pc = 0
+    for _ in range(max_steps):
+        if pc >= HALT_BASE or pc & 3 or pc >> 2 >= n:
+            return
+        entry = sim.fetch(pc >> 2)
+        next_pc = entry.execute()
+        if entry.rd:
+            yield Commit(entry.rd, x[entry.rd], pc, None)
+        pc = next_pc
+
+
+def trace_commits(path: str) -> Iterator[Commit]:
+    """Register writes of an rv32i_iss.py --trace file."""
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 4 and fields[2].startswith('x'):
+                yield Commit(int(fields[2][1:]), int(fields[3], 16), int(fields[0], 16), None)
+
+
+@dataclass
+class TraceDiff:
+    """Result of comparing two commit streams."""
+    matched: int
+    expected: Optional[Commit] = None        # First differing commit; None when that stream ended
+    actual: Optional[Commit] = None
+    before: Tuple[Commit, ...] = ()          # Matching commits just before the divergence
+    expected_after: Tuple[Commit, ...] = ()
+    actual_after: Tuple[Commit, ...] = ()
+    check_pc: bool = True
+
+    @property
+    def diverged(self) -> bool:
+        return self.expected is not None or self.actual is not None
+
+
+def _same(expected: Commit, actual: Commit, check_pc: bool) -> bool:
+    if expected.rd != actual.rd or expected.value != actual.value:
+        return False
+    return not check_pc or expected.pc is None or actual.pc is None or expected.pc == actual.pc
+
+
+def compare(expected: Iterator[Commit], actual: Iterator[Commit], context: int = 5,
+            check_pc: bool = True) -> TraceDiff:
+    """Walk both commit streams in step and stop at the first commit that differs."""
+    expected, actual = iter(expected), iter(actual)
+    recent = deque(maxlen=context)
+    matched = 0
+    for exp, act in zip_longest(expected, actual):
+        if exp is not None and act is not None and _same(exp, act, check_pc):
+            recent.append(act)
+            matched += 1
+            continue
+        return TraceDiff(matched, exp, act, tuple(recent), tuple(islice(expected, context)),
+                         tuple(islice(actual, context)), check_pc)
+    return TraceDiff(matched, check_pc=check_pc)
+
+
+def format_diff(diff: TraceDiff) -> str:
+    """Human-readable report of a comparison."""
+    if not diff.diverged:
+        return f"Traces match: {diff.matched} register writes"
+    lines = [f"First divergence at register write #{diff.matched}:"]
+    lines.append(f"  expected: {diff.expected if diff.expected is not None else '(end of expected trace)'}")
+    lines.append(f"  actual:   {diff.actual if diff.actual is not None else '(end of RTL trace)'}")
+    if diff.expected is not None and diff.actual is not None:
+        what = [name for name, differs in [
+            ("register", diff.expected.rd != diff.actual.rd),
+            ("value", diff.expected.value != diff.actual.value),
+            ("pc", diff.check_pc and None not in (diff.expected.pc, diff.actual.pc) and
+             diff.expected.pc != diff.actual.pc)] if differs]
+        lines.append(f"  differs in: {', '.join(what)}")
+    if diff.before:
+        lines.append("Matching writes before it:")
+        lines += [f"  #{diff.matched - len(diff.before) + i:<6} {c}" for i, c in enumerate(diff.before)]
+    for title, commits in [("Expected next", diff.expected_after), ("Actual next", diff.actual_after)]:
+        if commits:
+            lines.append(f"{title}:")
+            lines += [f"  {c}" for c in commits]
+    return "\n".join(lines)
+
+
+def write_vcd(commits: Iterator[Commit], out: TextIO, period: int = 10):
+    """Write a minimal VCD in which register_file performs the given writes, one per clock.
+
+    It declares the same hierarchy as CPU_pipelined_tb (cpu_inst.reg_file and
+    cpu_inst.MEM_WB_PC), so it exercises the comparator without an RTL run.
+    """
+    out.write("$timescale 1ns $end\n$scope module CPU_pipelined_tb $end\n$scope module cpu_inst $end\n"
+              "$var wire 32 & MEM_WB_PC [31:0] $end\n$scope module reg_file $end\n"
+              "$var wire 1 ! clk $end\n$var wire 1 \" rst $end\n$var wire 1 # regWriteEnable $end\n"
+              "$var wire 5 $ writeReg [4:0] $end\n$var wire 32 % writeData [31:0] $end\n"
+              "$upscope $end\n$upscope $end\n$upscope $end\n$enddefinitions $end\n")
+    half = period // 2
+    out.write("#0\n$dumpvars\n0!\n1\"\n0#\nb0 $\nb0 %\nb0 &\n$end\n")
+    out.write(f"#{half}\n1!\n#{period}\n0!\n0\"\n")
+    t = period
+    for commit in commits:
+        value = 'x' * 32 if commit.value is None else format(commit.value, 'b')
+        # MEM/WB values appear after a rising edge and are written on the next falling edge
+        out.write(f"#{t + half}\n1!\n1#\nb{commit.rd:b} $\nb{value} %\nb{(commit.pc or 0):b} &\n")
+        t += period
+        out.write(f"#{t}\n0!\n")
+    out.write(f"#{t + half}\n1!\n0#\n#{t + period}\n0!\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare RTL register writes in a VCD against the reference ISS")
+    parser.add_argument("vcd", help="Waveform dump of CPU_pipelined (or a file to write with --synthesize)")
+    parser.add_argument("--expected", required=True,
+                        help="Program (.hex/.bin) to run on the ISS, or an rv32i_iss.py --trace file (.trace)")
+    parser.add_argument("--max-steps", type=int, default=1_000_000,
+                        help="Instructions to run on the ISS (default: 1000000)")
+    parser.add_argument("--context", type=int, default=5, help="Commits shown around the divergence (default: 5)")
+    parser.add_argument("--no-pc", action="store_true", help="Compare only registers and values, not PCs")
+    parser.add_argument("--signal", action="append", default=[], metavar="ROLE=NAME",
+                        help=f"Hierarchical name (or suffix) of a signal; roles: {', '.join(DEFAULT_SIGNALS)}")
+    parser.add_argument("--synthesize", action="store_true",
+                        help="Write a synthetic VCD of the expected writes to VCD instead of comparing")
+    args = parser.parse_args()
+
+    signals = dict(DEFAULT_SIGNALS)
+    for item in args.signal:
+        role, _, name = item.partition('=')
+        if role not in DEFAULT_SIGNALS or not name:
+            parser.error(f"--signal expects ROLE=NAME with ROLE one of {', '.join(DEFAULT_SIGNALS)}")
+        signals[role] = name
+
+    def expected() -> Iterator[Commit]:
+        if args.expected.endswith('.trace'):
+            return trace_commits(args.expected)
+        return iss_commits(load_program(args.expected), args.max_steps)
+
+    if args.synthesize:
+        with open(args.vcd, 'w') as f:
+            write_vcd(expected(), f)
+        print(f"Synthetic VCD written to: {args.vcd}")
+        return
+
+    start = time.perf_counter()
+    try:
+        diff = compare(expected(), rtl_commits(args.vcd, signals), args.context, not args.no_pc)
+    except ValueError as e:
+        parser.error(str(e))
+    print(format_diff(diff))
+    print(f"Compared in {time.perf_counter() - start:.2f}s")
+    raise SystemExit(1 if diff.diverged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,66 +4,101 @@ RISC-V RV32I Random Test Generator
 Generates random instruction sequences with configurable weights, hazards, and loops.
 """
 
+import gc
 import json
 import random
+import tempfile
 import time
 import os
+import multiprocessing
+import tracemalloc
+from collections import Counter, deque
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, field
-
-
-@dataclass
-class InstructionObject:
-    """Represents a single RISC-V instruction with all necessary fields."""
-    mnemonic: str
-    format: str
-    category: str
-    rd: Optional[int] = None
-    rs1: Optional[int] = None
-    rs2: Optional[int] = None
-    imm: Optional[int] = None
-    shamt: Optional[int] = None
-    label_target_index: Optional[int] = None
-    label_name: Optional[str] = None
-    raw_word: int = 0
-    assembly_text: str = ""
-    metadata: Optional[Dict] = None
+
+from rv32i_encoding import KIND_R, KIND_SHIFT, compile_encodings, pack_fields, pack_program, program_arrays, np
+from rv32i_bulk import BulkEngine
+from rv32i_config import (HAZARD_DISTANCES, SYSTEM_LIMITS, WEIGHT_CATEGORIES, ConfigError, SamplingPlan, WeightedChoice,
+                          load_plan, mnemonic_probabilities)
+from rv32i_coverage import Coverage, CoverageBias, CoverageModel, format_report
+from rv32i_images import DEFAULT_FORMATS, FORMATS, IMEM_DEPTH, hex_words, to_bytes, write_images
+from rv32i_iss import ALU_OPS, MASK, RunProfile, RV32ISim, SimResult, WindowSim, state_signature
+from rv32i_program import InstructionObject, InstructionView, Program
+
+
+def _signed32(value: int) -> int:
+    """value as a signed 32-bit integer."""
+    return ((value + 0x80000000) & MASK) - 0x80000000
 
 
 class RV32IGenerator:
     """Main generator class for RV32I instruction tests."""
     
+    # Map weight categories to metadata categories
+    WEIGHT_CATEGORIES = WEIGHT_CATEGORIES
+    
+    ENGINES = ['python', 'numpy']
+    
     def __init__(self, metadata_path: str = "rv32i_metadata.json", 
-                 config_path: str = "config_defaults.json"):
+                 config_path: str = "config_defaults.json",
+                 seed: Optional[int] = None, engine: str = 'python'):
         """Initialize generator with metadata and config."""
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}' (expected one of {self.ENGINES})")
+        self.engine = engine
+        self._bulk = None  # BulkEngine, built on first use
+        self._coverage_model = None  # CoverageModel, built on first use
+        self.bias: Optional[CoverageBias] = None  # Set for coverage-directed generation
         self.metadata = self._load_metadata(metadata_path)
-        self.config = self._load_config(config_path)
-        self.rng = self._make_rng()
-        self.seed_used = self.rng.random()  # Store for manifest
+        self.config, self.plan = self._load_config(config_path)
+        if seed is not None and not self.config['seed_policy']['external_seed_allowed']:
+            raise ValueError("External seeds are disabled by seed_policy.external_seed_allowed")
+        self.seed_used = self._make_seed() if seed is None else seed  # Store for manifest
+        self.rng = self._make_rng(self.seed_used)
         
         # Category to mnemonic mapping
         self.category_map = self._build_category_map()
+        self.meta_by_mnemonic = {m['mnemonic']: m for m in self.metadata}
+        self._system_limit = {mnem: key for key, mnemonics in SYSTEM_LIMITS.items() for mnem in mnemonics}
+        
+        # Integer encoding tables, compiled once instead of parsed per instruction
+        self.encodings = compile_encodings(self.metadata)
+        self._jal_meta = next(m for m in self.metadata if m['mnemonic'] == 'JAL')
+        # Offsets at or beyond these fall back to +4: B-type 13-bit, J-type 21-bit signed
+        self._offset_limits = np.array([{'B': 4096, 'J': 1 << 20}.get(m['format'], 1 << 31)
+                                        for m in self.metadata], dtype=np.int64) if np is not None else None
         
-        # Track state for hazard injection
-        self.last_rd = None
-        self.last_was_load = False
+        # Program being generated, one typed array per field
+        self.program = Program(self.metadata)
+        
+        # Track state for hazard injection: (rd, is load) of the latest instructions, newest first
+        self._scoreboard = deque(maxlen=len(HAZARD_DISTANCES))
         self.backward_branch_count = 0
+        self._system_counts = Counter()  # Instructions per SYSTEM_LIMITS group so far
+        self._held_system = deque()  # Metadata of the ones not placed yet
+        self._reset_values()
         
     def _load_metadata(self, path: str) -> List[Dict]:
         """Load instruction metadata from JSON."""
         with open(path, 'r') as f:
             return json.load(f)
     
-    def _load_config(self, path: str) -> Dict:
-        """Load configuration from JSON."""
-        with open(path, 'r') as f:
-            return json.load(f)
+    def _load_config(self, path: str) -> Tuple[Dict, SamplingPlan]:
+        """Load configuration from JSON, validated and compiled into a sampling plan."""
+        return load_plan(path)
     
-    def _make_rng(self) -> random.Random:
-        """Create PRNG with auto-generated seed from time and PID."""
-        seed = (int(time.time_ns()) ^ os.getpid()) & 0xFFFFFFFFFFFFFFFF
+    def _make_seed(self) -> int:
+        """Auto-generate a 64-bit integer seed from time and PID."""
+        return (int(time.time_ns()) ^ os.getpid()) & 0xFFFFFFFFFFFFFFFF
+    
+    def _make_rng(self, seed: int) -> random.Random:
+        """Create PRNG from an integer seed."""
         return random.Random(seed)
     
+    def reseed(self, seed: int):
+        """Use a new seed for subsequent tests (used per test in campaigns)."""
+        self.seed_used = seed
+        self.rng = self._make_rng(seed)
+    
     def _build_category_map(self) -> Dict[str, List[Dict]]:
         """Build mapping from category to list of instruction metadata."""
         cat_map = {}
@@ -74,100 +109,94 @@ class RV32IGenerator:
             cat_map[cat].append(meta)
         return cat_map
     
-    def _weighted_choice(self, weights: Dict[str, float]) -> str:
-        """Choose a key from weights dict based on probabilities."""
-        items = list(weights.items())
-        keys = [k for k, v in items]
-        vals = [v for k, v in items]
-        return self.rng.choices(keys, weights=vals, k=1)[0]
+    def mnemonic_probabilities(self) -> Dict[str, float]:
+        """Fold the weight -> category -> mnemonic choices into one distribution."""
+        return mnemonic_probabilities(self.metadata, self.plan)
+    
+    def _weighted_choice(self, choice: WeightedChoice) -> str:
+        """Choose a key from a precompiled weight table."""
+        return choice.pick(self.rng)
     
     def _choose_register(self) -> int:
         """Choose a random register (uniform x0..x31)."""
         return self.rng.randint(0, 31)
     
+    def _choose_destination(self) -> int:
+        """Choose rd; avoids x0 while directed generation still aims at hazard bins."""
+        if self.bias is not None and self.bias.hazards_open:
+            return self.rng.randint(1, 31)
+        return self._choose_register()
+    
     def _choose_sp_biased_base(self) -> int:
         """Choose base register for memory ops (sp-biased)."""
-        if self.rng.random() < self.config['register_policy']['sp_usage_fraction_in_memory_ops']:
+        if self.rng.random() < self.plan.sp_fraction:
             return 2  # x2 = sp
         return self.rng.randint(1, 31)  # Avoid x0 as base
     
-    def _choose_imm_arith(self) -> int:
-        """Choose arithmetic immediate from buckets."""
-        buckets = self.config['immediates']['arith']
-        choice = self._weighted_choice({
-            'small': buckets['small'],
-            'boundary': buckets['boundary'],
-            'medium': buckets['medium'],
-            'random_full': buckets['random_full'],
-            'special_pattern': buckets['special_pattern']
-        })
+    def _choose_imm_arith(self, choice: Optional[str] = None) -> int:
+        """Choose arithmetic immediate from buckets (from the given bucket when directed)."""
+        if choice is None:
+            choice = self._weighted_choice(self.plan.arith_buckets)
         
         if choice == 'small':
             return self.rng.choice([-1, 0, 1])
         elif choice == 'boundary':
-            return self.rng.choice(buckets['boundary_values'])
+            return self.rng.choice(self.plan.boundary_values)
         elif choice == 'medium':
             return self.rng.randint(-32, 32)
         elif choice == 'special_pattern':
-            return self.rng.choice(buckets['special_values'])
+            return self.rng.choice(self.plan.special_values)
         else:  # random_full
             return self.rng.randint(-2048, 2047)
     
-    def _choose_shamt(self) -> int:
-        """Choose shift amount (uniform 0..31)."""
-        return self.rng.randint(0, 31)
+    def _choose_shamt(self, choice: Optional[str] = None) -> int:
+        """Choose shift amount (uniform over immediates.shift min..max, or its min/mid/max bucket)."""
+        low, high = self.plan.shamt_range
+        if choice == 'min':
+            return low
+        elif choice == 'max':
+            return high
+        elif choice == 'mid':
+            return self.rng.randint(low + 1, high - 1)
+        return self.rng.randint(low, high)
     
-    def _choose_mem_offset(self) -> int:
+    def _choose_mem_offset(self, choice: Optional[str] = None) -> int:
         """Choose memory offset with alignment."""
-        mem_cfg = self.config['immediates']['memory_offset']
-        choice = self._weighted_choice({
-            'near_zero': mem_cfg['near_zero'],
-            'small_range': mem_cfg['small_range'],
-            'mid_range': mem_cfg['mid_range'],
-            'far_range': mem_cfg['far_range']
-        })
+        if choice is None:
+            choice = self._weighted_choice(self.plan.mem_buckets)
         
         if choice == 'near_zero':
             offset = 0
-        elif choice == 'small_range':
-            offset = self.rng.randrange(4, mem_cfg['small_range_max'], 4)
-        elif choice == 'mid_range':
-            offset = self.rng.randrange(64, mem_cfg['mid_range_max'], 4)
-        else:  # far_range
-            offset = self.rng.randrange(256, mem_cfg['far_range_max'], 4)
+        else:  # small_range, mid_range, far_range
+            start, stop = self.plan.mem_ranges[choice]
+            offset = self.rng.randrange(start, stop, 4)
         
         # Ensure within 12-bit signed range
         return min(max(offset, -2048), 2047)
     
-    def _choose_upper20(self) -> int:
+    def _choose_upper20(self, choice: Optional[str] = None) -> int:
         """Choose 20-bit upper immediate."""
-        upper_cfg = self.config['immediates']['upper20']
-        if self.rng.random() < upper_cfg['symbolic_fraction']:
-            base = self.rng.choice(upper_cfg['symbolic_bases'])
-            return (base >> 12) & 0xFFFFF
+        if choice is None:
+            choice = 'symbolic' if self.rng.random() < self.plan.upper_symbolic_fraction else 'random'
+        if choice == 'symbolic':
+            return self.rng.choice(self.plan.upper_symbolic_values)
         else:
             return self.rng.randint(0, 0xFFFFF)
     
-    def _choose_branch_target(self, current_idx: int, max_idx: int) -> int:
-        """Choose branch target index."""
-        br_cfg = self.config['branch_offsets']
-        distance_type = self._weighted_choice({
-            'near': br_cfg['near'],
-            'mid': br_cfg['mid'],
-            'far': br_cfg['far']
-        })
-        
-        if distance_type == 'near':
-            max_dist = br_cfg['near_max_bytes'] // 4
-        elif distance_type == 'mid':
-            max_dist = br_cfg['mid_max_bytes'] // 4
-        else:
-            max_dist = br_cfg['far_max_bytes'] // 4
+    def _choose_branch_target(self, current_idx: int, max_idx: int,
+                              choice: Optional[Tuple[str, str]] = None) -> int:
+        """Choose branch target index (in the given (direction, distance) bucket when directed and possible)."""
+        if choice is not None:
+            target = self._directed_branch_target(current_idx, max_idx, *choice)
+            if target is not None:
+                return target
+        distance_type = self._weighted_choice(self.plan.branch_distances)
+        max_dist = self.plan.branch_max_dist[distance_type]
         
         # Choose direction
-        if br_cfg['allow_backward'] and self.rng.random() < 0.5 and current_idx > 0:
+        if self.plan.allow_backward and self.rng.random() < 0.5 and current_idx > 0:
             # Backward (potential loop)
-            if self.backward_branch_count < self.config['loops']['max_backward_depth']:
+            if self.backward_branch_count < self.plan.max_backward_depth:
                 distance = self.rng.randint(1, min(max_dist, current_idx))
                 target = current_idx - distance
                 self.backward_branch_count += 1
@@ -177,6 +206,23 @@ class RV32IGenerator:
         distance = self.rng.randint(1, min(max_dist, max_idx - current_idx - 1))
         return min(current_idx + distance, max_idx - 1)
     
+    def _directed_branch_target(self, current_idx: int, max_idx: int, direction: str,
+                                distance_type: str) -> Optional[int]:
+        """Target at a distance inside one distance bucket, None when it does not fit here."""
+        names = self.plan.branch_distances.keys
+        position = names.index(distance_type)
+        low = self.plan.branch_max_dist[names[position - 1]] + 1 if position else 1
+        if direction == 'backward':
+            high = min(self.plan.branch_max_dist[distance_type], current_idx)
+            if high < low or self.backward_branch_count >= self.plan.max_backward_depth:
+                return None
+            self.backward_branch_count += 1
+            return current_idx - self.rng.randint(low, high)
+        high = min(self.plan.branch_max_dist[distance_type], max_idx - current_idx - 1)
+        if high < low:
+            return None
+        return current_idx + self.rng.randint(low, high)
+    
     def _select_mnemonic_in_category(self, category: str) -> Dict:
         """Select a random mnemonic from given category."""
         candidates = self.category_map.get(category, [])
@@ -185,172 +231,295 @@ class RV32IGenerator:
             return next(m for m in self.metadata if m['mnemonic'] == 'ADDI')
         return self.rng.choice(candidates)
     
-    def _apply_hazard_injection(self, obj: InstructionObject, prev: Optional[InstructionObject]):
-        """Apply hazard injection based on probabilities."""
-        if not prev:
-            return
+    def _producer(self, distances: WeightedChoice) -> Optional[int]:
+        """Destination of the instruction a drawn distance back, None if there is none."""
+        distance = int(self._weighted_choice(distances))
+        return self._scoreboard[distance - 1][0] if distance <= len(self._scoreboard) else None
+    
+    def _apply_hazard_injection(self, obj: InstructionObject, forced: List[str] = ()):
+        """Apply hazard injection based on probabilities; forced hazards are always applied.
         
-        hazard_cfg = self.config['hazards']
+        Producers come from the scoreboard of recent destinations, at a distance
+        drawn from hazards.raw_distance / waw_distance, so the EX/MEM, MEM/WB
+        and register-file paths all get exercised. rs2 draws its own RAW, so
+        both forwarding muxes can be busy at once. Forced hazards aim at the
+        coverage bins, which are on the previous instruction.
+        """
+        board = self._scoreboard
+        if not board:
+            return
         
-        # RAW dependency
-        if self.rng.random() < hazard_cfg['raw_dependency_prob']:
-            if prev.rd is not None and prev.rd != 0:
+        # RAW dependency (a load-use hazard is a RAW on a load)
+        aimed = 'raw' in forced or ('load_use' in forced and board[0][1])
+        if self.rng.random() < self.plan.raw_prob or aimed:
+            rd = board[0][0] if aimed else self._producer(self.plan.raw_distances)
+            if rd:
                 if obj.rs1 is not None:
-                    obj.rs1 = prev.rd
+                    obj.rs1 = rd
                 elif obj.rs2 is not None:
-                    obj.rs2 = prev.rd
+                    obj.rs2 = rd
+        if obj.rs1 is not None and obj.rs2 is not None and self.rng.random() < self.plan.raw_prob:
+            rd = self._producer(self.plan.raw_distances)
+            if rd:
+                obj.rs2 = rd
         
         # WAW (write-after-write)
-        if self.rng.random() < hazard_cfg['waw_repeat_prob']:
-            if prev.rd is not None and obj.rd is not None:
-                obj.rd = prev.rd
+        if self.rng.random() < self.plan.waw_prob or 'waw' in forced:
+            if obj.rd is not None:
+                rd = board[0][0] if 'waw' in forced else self._producer(self.plan.waw_distances)
+                if rd is not None:
+                    obj.rd = rd
         
         # Load-use hazard
-        if self.last_was_load and self.rng.random() < hazard_cfg['load_use_prob']:
-            if self.last_rd is not None and obj.rs1 is not None:
-                obj.rs1 = self.last_rd
+        rd, was_load = board[0]
+        if was_load and self.rng.random() < self.plan.load_use_prob:
+            if rd is not None and obj.rs1 is not None:
+                obj.rs1 = rd
     
-    def _pack_instruction(self, obj: InstructionObject) -> int:
-        """Pack instruction object into 32-bit word."""
-        meta = obj.metadata
-        opcode = int(meta['opcode'], 16)
-        funct3 = int(meta['funct3'], 16) if meta['funct3'] else 0
-        funct7 = int(meta['funct7'], 16) if meta['funct7'] else 0
-        
-        fmt = meta['format']
-        
-        if fmt == 'R':
-            word = (funct7 << 25) | (obj.rs2 << 20) | (obj.rs1 << 15) | \
-                   (funct3 << 12) | (obj.rd << 7) | opcode
-        
-        elif fmt == 'I':
-            imm = obj.imm if obj.imm is not None else 0
-            # Handle shifts specially (funct7 in upper bits)
-            if meta['immed_kind'] == 'shamt5':
-                shamt = obj.shamt if obj.shamt is not None else 0
-                word = (funct7 << 25) | (shamt << 20) | (obj.rs1 << 15) | \
-                       (funct3 << 12) | (obj.rd << 7) | opcode
-            elif meta['mnemonic'] in ['ECALL', 'EBREAK']:
-                # System instructions have specific immediate values
-                sys_imm = 0 if meta['mnemonic'] == 'ECALL' else 1
-                word = (sys_imm << 20) | (obj.rs1 if obj.rs1 else 0) << 15 | \
-                       (funct3 << 12) | (obj.rd if obj.rd else 0) << 7 | opcode
-            else:
-                imm12 = imm & 0xFFF
-                word = (imm12 << 20) | (obj.rs1 << 15) | (funct3 << 12) | \
-                       (obj.rd << 7) | opcode
-        
-        elif fmt == 'S':
-            imm = obj.imm if obj.imm is not None else 0
-            imm_hi = (imm >> 5) & 0x7F
-            imm_lo = imm & 0x1F
-            word = (imm_hi << 25) | (obj.rs2 << 20) | (obj.rs1 << 15) | \
-                   (funct3 << 12) | (imm_lo << 7) | opcode
-        
-        elif fmt == 'B':
-            # Branch offset encoding
-            offset = obj.imm if obj.imm is not None else 0
-            bit12 = (offset >> 12) & 1
-            bit11 = (offset >> 11) & 1
-            bits10_5 = (offset >> 5) & 0x3F
-            bits4_1 = (offset >> 1) & 0xF
-            word = (bit12 << 31) | (bits10_5 << 25) | (obj.rs2 << 20) | \
-                   (obj.rs1 << 15) | (funct3 << 12) | (bits4_1 << 8) | \
-                   (bit11 << 7) | opcode
-        
-        elif fmt == 'U':
-            imm20 = (obj.imm if obj.imm is not None else 0) & 0xFFFFF
-            word = (imm20 << 12) | (obj.rd << 7) | opcode
-        
-        elif fmt == 'J':
-            # JAL offset encoding
-            offset = obj.imm if obj.imm is not None else 0
-            bit20 = (offset >> 20) & 1
-            bits10_1 = (offset >> 1) & 0x3FF
-            bit11 = (offset >> 11) & 1
-            bits19_12 = (offset >> 12) & 0xFF
-            word = (bit20 << 31) | (bits19_12 << 12) | (bit11 << 20) | \
-                   (bits10_1 << 21) | (obj.rd << 7) | opcode
+    def _reset_values(self):
+        """Start value tracking over: registers and data memory hold 0 when a test starts."""
+        self.values: List[Optional[int]] = [0] * 32  # Known register contents, None when unknown
+        self.memory: Dict[int, Optional[int]] = {}  # Word address -> known contents, None when unknown
+        self._zeroed = True  # Whether words missing from memory still hold 0
+        self._shared = False  # Whether memory is also held by a pending branch target (copied before writing)
+        self._arriving: Dict[int, Tuple] = {}  # Forward branch target -> (values, memory, zeroed) branched with
+        self._recent = deque(maxlen=self._label_window() + 1)  # (index, obj, address) of the latest instructions
+        self._stored = deque(maxlen=8)  # Latest store addresses, reused by loads and stores
+    
+    @staticmethod
+    def _merge(a: Tuple, b: Tuple) -> Tuple:
+        """What two (values, memory, zeroed) states agree on; a's memory when both share it."""
+        values = a[0] if a[0] == b[0] else [x if x == y else None for x, y in zip(a[0], b[0])]
+        if a[1] is b[1] and a[2] == b[2]:
+            return values, a[1], a[2]
+        memory = {}
+        for word in a[1].keys() | b[1].keys():
+            x = a[1].get(word, 0 if a[2] else None)
+            memory[word] = x if x == b[1].get(word, 0 if b[2] else None) else None
+        return values, memory, a[2] and b[2]
+    
+    def _join_values(self, index: int):
+        """Merge the state forward branches bring to index into the fall-through state."""
+        arriving = self._arriving.pop(index, None)
+        if arriving is not None:
+            memory = self.memory
+            self.values, self.memory, self._zeroed = self._merge((self.values, self.memory, self._zeroed), arriving)
+            self._shared = self._shared and self.memory is memory
+    
+    def _forget(self, registers, words=None):
+        """Mark registers and memory words unknown, here and at every pending branch target.
         
+        words=None forgets all of memory.
+        """
+        for values, memory, _ in [(self.values, self.memory, None), *self._arriving.values()]:
+            for r in registers:
+                values[r] = None
+            for word in words if words is not None else ():
+                memory[word] = None
+        if words is None:
+            self.memory, self._zeroed, self._shared = {}, False, False
+            self._arriving = {target: (values, {}, False) for target, (values, _, _) in self._arriving.items()}
+    
+    def _load_value(self, address: int, funct3: int) -> Optional[int]:
+        """Known result of a naturally aligned load, or None."""
+        word = self.memory.get(address >> 2, 0 if self._zeroed else None)
+        if word is None:
+            return None
+        bits = 8 << (funct3 & 3)
+        value = (word >> (8 * (address & 3))) & ((1 << bits) - 1)
+        if not funct3 & 4 and bits < 32:  # LB, LH sign-extend
+            value = (value ^ (1 << (bits - 1))) - (1 << (bits - 1))
+        return value & MASK
+    
+    def _store_value(self, address: int, funct3: int, value: Optional[int]):
+        """Record a naturally aligned store of value (None when unknown)."""
+        if self._shared:
+            self.memory, self._shared = dict(self.memory), False
+        word = address >> 2
+        bits = 8 << (funct3 & 3)
+        old = 0 if bits == 32 else self.memory.get(word, 0 if self._zeroed else None)
+        if value is None or old is None:
+            self.memory[word] = None
         else:
-            word = 0x00000013  # NOP fallback
+            shift = 8 * (address & 3)
+            mask = ((1 << bits) - 1) << shift
+            self.memory[word] = (old & ~mask & MASK) | ((value << shift) & mask)
+    
+    def _mem_bucket(self, offset: int) -> Optional[str]:
+        """immediates.memory_offset bucket of an offset, as the coverage model bins it."""
+        if offset == 0:
+            return 'near_zero'
+        return next((name for name, (start, stop) in self.plan.mem_ranges.items() if start <= offset < stop), None)
+    
+    def _choose_mem_address(self, size: int) -> int:
+        """Choose a naturally aligned address inside the memory map."""
+        choice = self._weighted_choice(self.plan.mem_addresses)
+        if choice == 'reuse' and self._stored:
+            return self.rng.choice(self._stored) & -size
+        regions = self.plan.memory_regions
+        base, length = regions[0] if len(regions) == 1 else \
+            self.rng.choices(regions, weights=[length for _, length in regions])[0]
+        if choice == 'boundary':
+            return self.rng.choice([base, base + length - size])
+        return base + self.rng.randrange(0, length - size + 1, size)
+    
+    def _choose_mapped_base(self, rs1: int, address: int, bucket: Optional[str] = None) -> Optional[int]:
+        """Base register whose known value reaches address with a 12-bit offset, or None.
         
-        return word & 0xFFFFFFFF
+        rs1 is kept when it reaches (so injected hazards survive), otherwise sp
+        is preferred as configured. When directed at an offset bucket, registers
+        that give an offset in that bucket come first.
+        """
+        reach = [r for r, value in enumerate(self.values)
+                 if value is not None and -2048 <= _signed32(address - value) <= 2047]
+        if bucket is not None:
+            reach = [r for r in reach if self._mem_bucket(_signed32(address - self.values[r])) == bucket] or reach
+        if rs1 in reach:
+            return rs1
+        if not reach:
+            return None
+        if 2 in reach and self.rng.random() < self.plan.sp_fraction:
+            return 2
+        return self.rng.choice(reach)
+    
+    def _place_memory_access(self, obj: InstructionObject, bucket: Optional[str] = None) -> Optional[int]:
+        """Point a load/store at an address of the memory map; returns the address, None if none was reachable."""
+        size = 1 << (self.encodings[obj.mnemonic].funct3 & 3)
+        address = self._choose_mem_address(size)
+        base = self._choose_mapped_base(obj.rs1, address, bucket)
+        if base is None:
+            # Only regions x0 cannot reach (base 2048 and up) can run out of registers
+            obj.imm = self._choose_mem_offset(bucket)
+            return None
+        obj.rs1 = base
+        obj.imm = _signed32(address - self.values[base])
+        if obj.category == 'store':
+            self._stored.append(address)
+        return address
     
-    def _render_assembly(self, obj: InstructionObject, label_map: Dict[int, str]) -> str:
-        """Render instruction object to assembly text."""
-        meta = obj.metadata
-        mnem = meta['mnemonic'].lower()
+    def _track_values(self, obj: InstructionObject, index: int, length: int, address: Optional[int]):
+        """Update the known register and memory values after obj and follow its branch or jump.
         
-        # Special cases
-        if mnem in ['ecall', 'ebreak']:
-            return mnem
-        elif mnem == 'fence':
-            return "fence"
-        elif mnem == 'fence.i':
-            return "fence.i"
+        A forward target receives the state at the branch. A backward one
+        closes a loop: registers and words written inside it are forgotten, and
+        loads and stores inside it whose base may change between iterations are
+        rebased on x0 so every iteration still hits the address chosen for it.
+        """
+        values = self.values
+        enc = self.encodings[obj.mnemonic]
+        pc = index * 4
+        jump_target = None  # JALR target index, computed before rd is overwritten
+        if enc.opcode == 0x67 and values[obj.rs1] is not None:
+            target = (values[obj.rs1] + (_signed32(obj.imm << 20) >> 20)) & MASK & ~1
+            jump_target = target >> 2 if not target & 3 and target >> 2 < length else -1
         
-        # Build operand list
-        pattern = meta['operand_pattern']
-        operands = []
-        
-        for op in pattern:
-            if op == 'rd':
-                operands.append(f"x{obj.rd}")
-            elif op == 'rs1':
-                operands.append(f"x{obj.rs1}")
-            elif op == 'rs2':
-                operands.append(f"x{obj.rs2}")
-            elif op == 'imm':
-                operands.append(str(obj.imm))
-            elif op == 'shamt':
-                operands.append(str(obj.shamt))
-            elif op == 'imm20':
-                operands.append(f"0x{obj.imm:x}")
-            elif op == 'label':
-                operands.append(obj.label_name if obj.label_name else "L_?")
-            elif 'imm(rs1)' in op:
-                operands.append(f"{obj.imm}(x{obj.rs1})")
-            elif op == 'pred_succ':
-                operands.append("iorw, iorw")  # Default fence
+        if enc.opcode == 0x23:  # STORE
+            if address is None:
+                self._forget((), None)  # Somewhere outside the map; trust nothing
+            else:
+                self._store_value(address, enc.funct3, values[obj.rs2])
+        if obj.rd:
+            if enc.opcode in (0x33, 0x13):  # OP, OP-IMM
+                a = values[obj.rs1]
+                if enc.kind == KIND_R:
+                    b = values[obj.rs2]
+                else:
+                    b = obj.shamt if enc.kind == KIND_SHIFT else _signed32(obj.imm << 20) >> 20 & MASK
+                values[obj.rd] = None if a is None or b is None else ALU_OPS[enc.funct3, enc.funct7](a, b)
+            elif enc.opcode == 0x03:  # LOAD
+                values[obj.rd] = None if address is None else self._load_value(address, enc.funct3)
+            elif enc.opcode == 0x37:  # LUI
+                values[obj.rd] = (obj.imm & 0xFFFFF) << 12
+            elif enc.opcode == 0x17:  # AUIPC
+                values[obj.rd] = (pc + ((obj.imm & 0xFFFFF) << 12)) & MASK
+            elif enc.opcode in (0x6F, 0x67):  # JAL, JALR link
+                values[obj.rd] = pc + 4
+            else:  # Anything not modelled
+                values[obj.rd] = None
+        self._recent.append((index, obj, address))
         
-        if operands:
-            return f"{mnem} {', '.join(operands)}"
-        return mnem
+        target = obj.label_target_index if enc.opcode != 0x67 else jump_target
+        if enc.opcode == 0x67 and (target is None or 0 <= target <= index):
+            # Unknown or backward indirect jump: anything may have changed
+            self._forget(range(1, 32), None)
+        elif target is not None and target > index:
+            state = (list(values), self.memory, self._zeroed)
+            arriving = self._arriving.get(target)
+            self._arriving[target] = state = state if arriving is None else self._merge(state, arriving)
+            self._shared = self._shared or state[1] is self.memory
+        elif target is not None and target >= 0:
+            body = [(k, other, addr) for k, other, addr in self._recent if k >= target]
+            written = {other.rd for _, other, _ in body if other.rd}
+            words = set()
+            for k, other, addr in body:
+                if addr is None:
+                    words = None if other.category == 'store' else words
+                    continue
+                # The base may differ on the next iteration if the loop writes it, or if a
+                # branch from outside the loop reaches the body with a different value
+                base = values[other.rs1]
+                if other.rs1 in written or base is None or (base + other.imm) & MASK != addr:
+                    if addr > 2047:  # Out of x0's reach: this access may move
+                        words = None if other.category == 'store' else words
+                        continue
+                    row = self.program[k]
+                    row.rs1 = other.rs1 = 0
+                    row.imm = other.imm = addr
+                if other.category == 'store' and words is not None:
+                    words.add(addr >> 2)
+            self._forget(written, words)
+    
+    def _pack_instruction(self, obj: InstructionView) -> int:
+        """Pack instruction object into 32-bit word."""
+        return pack_fields(self.encodings[obj.mnemonic], obj.rd, obj.rs1, obj.rs2, obj.imm, obj.shamt)
+    
+    def pack_program(self, instrs) -> List[int]:
+        """Pack a whole Program (or list of instruction objects), vectorized with NumPy when it is installed."""
+        if np is None:
+            return [self._pack_instruction(obj) for obj in instrs]
+        arrays = instrs.field_arrays(self.encodings) if isinstance(instrs, Program) else \
+            program_arrays(instrs, self.encodings)
+        return pack_program(**arrays).tolist()
     
     def generate_instruction(self, index: int, length: int, 
-                            prev: Optional[InstructionObject]) -> InstructionObject:
-        """Generate a single random instruction."""
-        # Choose category
-        category = self._weighted_choice(self.config['weights'])
-        
-        # Map weight categories to metadata categories
-        cat_mapping = {
-            'alu_logic': ['alu', 'compare'],
-            'load': ['load'],
-            'store': ['store'],
-            'branch': ['branch'],
-            'jump': ['jump'],
-            'upper': ['upper'],
-            'system': ['system'],
-            'pseudo_nop': ['pseudo'],
-            'fence': ['system'],
-            'ecall_ebreak': ['system']
-        }
+                            prev: Optional[InstructionView]) -> InstructionView:
+        """Generate a single random instruction as the next row of self.program."""
+        if self.plan.memory_map:
+            self._join_values(index)
+        if self.bias is None:
+            # Choose category
+            category = self._weighted_choice(self.plan.categories)
+            
+            valid_cats = self.WEIGHT_CATEGORIES.get(category, ['alu'])
+            actual_cat = self.rng.choice(valid_cats)
+            
+            # Select mnemonic
+            meta = self._select_mnemonic_in_category(actual_cat)
+        else:
+            # Coverage-directed: one draw over all mnemonics, weighted towards unhit bins
+            meta = self.meta_by_mnemonic[self._weighted_choice(self.bias.choice)]
+        limit = self._system_limit.get(meta['mnemonic'])
+        if limit is not None:
+            # FENCE and system calls halt the run, so the ones within their system_freq cap
+            # are held for the tail; every draw becomes ADDI here, as for an empty category
+            if self._system_counts[limit] < self.plan.system_caps[limit]:
+                self._system_counts[limit] += 1
+                self._held_system.append(meta)
+            meta = self.meta_by_mnemonic['ADDI']
+        if self._held_system and index >= length - 1 - len(self._held_system):
+            meta = self._held_system.popleft()  # The tail ends just before the last instruction
+        targets = self.bias.targets.get(meta['mnemonic']) if self.bias is not None else None
         
-        valid_cats = cat_mapping.get(category, ['alu'])
-        actual_cat = self.rng.choice(valid_cats)
+        def aim(bins: List):
+            """One of the unhit bins to aim at, or None to sample as configured."""
+            if not bins or self.rng.random() >= self.bias.strength:
+                return None
+            return self.rng.choice(bins)
         
-        # Select mnemonic
-        meta = self._select_mnemonic_in_category(actual_cat)
+        imm_bucket = aim(targets.immediate) if targets else None
         
-        # Create instruction object
-        obj = InstructionObject(
-            mnemonic=meta['mnemonic'],
-            format=meta['format'],
-            category=meta['category'],
-            metadata=meta
-        )
+        # Operands are drawn into a plain object and written to the program once they are final
+        obj = InstructionObject(meta['mnemonic'], meta['format'], meta['category'], metadata=meta)
         
         # Fill operands based on pattern
         pattern = meta['operand_pattern']
@@ -358,115 +527,728 @@ class RV32IGenerator:
         for op in pattern:
             if op == 'rd':
                 if meta['mnemonic'] == 'JAL' and \
-                   self.rng.random() < self.config['register_policy']['ra_usage_fraction_in_jal']:
+                   self.rng.random() < self.plan.ra_fraction:
                     obj.rd = 1  # x1 = ra
                 else:
-                    obj.rd = self._choose_register()
+                    obj.rd = self._choose_destination()
             elif op == 'rs1':
                 obj.rs1 = self._choose_register()
             elif op == 'rs2':
                 obj.rs2 = self._choose_register()
             elif op == 'imm':
-                obj.imm = self._choose_imm_arith()
+                obj.imm = self._choose_imm_arith(imm_bucket)
             elif op == 'shamt':
-                obj.shamt = self._choose_shamt()
+                obj.shamt = self._choose_shamt(imm_bucket)
             elif op == 'imm20':
-                obj.imm = self._choose_upper20()
+                obj.imm = self._choose_upper20(imm_bucket)
             elif 'imm(rs1)' in op:
                 obj.rs1 = self._choose_sp_biased_base()
-                obj.imm = self._choose_mem_offset()
+                if not self.plan.memory_map:
+                    obj.imm = self._choose_mem_offset(imm_bucket)
             elif op == 'label':
                 # Branch/jump target (will resolve later)
                 if index < length - 1:
-                    obj.label_target_index = self._choose_branch_target(index, length)
+                    obj.label_target_index = self._choose_branch_target(
+                        index, length, aim(targets.branch) if targets else None)
                 else:
                     obj.label_target_index = index  # Self-loop if at end
         
         # Apply hazard injection
-        self._apply_hazard_injection(obj, prev)
+        self._apply_hazard_injection(obj, [h for h in targets.hazard if aim([h])] if targets else ())
+        
+        # Aim loads/stores at the memory map once their base register is final
+        address = None
+        if self.plan.memory_map and meta['category'] in ('load', 'store'):
+            address = self._place_memory_access(obj, imm_bucket)
+        view = self.program.append(meta, obj.rd, obj.rs1, obj.rs2, obj.imm, obj.shamt, obj.label_target_index)
+        if self.plan.memory_map:
+            self._track_values(obj, index, length, address)
         
         # Track for next iteration
-        self.last_rd = obj.rd
-        self.last_was_load = (meta['category'] == 'load')
+        self._scoreboard.appendleft((obj.rd, meta['category'] == 'load'))
         
-        return obj
+        return view
     
-    def generate_test(self, length: int) -> Dict:
+    def generate_test(self, length: int, verbose: bool = True) -> Dict:
         """Generate a complete test of N instructions."""
-        print(f"Generating {length} RV32I instructions...")
+        if self.engine == 'numpy':
+            return self.generate_bulk(length, verbose)
+        if verbose:
+            print(f"Generating {length} RV32I instructions...")
         
-        # Reset state
+        # Reset state; restarting the PRNG makes the output a pure function of
+        # (seed, config, metadata, length) so any test can be regenerated on demand
+        self.rng = self._make_rng(self.seed_used)
         self.backward_branch_count = 0
-        self.last_rd = None
-        self.last_was_load = False
+        self._scoreboard.clear()
+        self._system_counts.clear()
+        self._held_system.clear()
+        self._reset_values()
         
-        # Generate instructions
-        instrs = []
+        # Generate instructions into a fresh program, so earlier results stay valid
+        program = self.program = Program(self.metadata)
         prev = None
         for i in range(length):
-            obj = self.generate_instruction(i, length, prev)
-            instrs.append(obj)
-            prev = obj
-        
-        # Resolve labels
-        label_map = {}
-        for obj in instrs:
-            if obj.label_target_index is not None:
-                target_idx = obj.label_target_index
-                if target_idx not in label_map:
-                    label_map[target_idx] = f"L{target_idx}"
-                obj.label_name = label_map[target_idx]
+            prev = self.generate_instruction(i, length, prev)
         
         # Compute offsets and pack
-        for i, obj in enumerate(instrs):
-            if obj.label_target_index is not None:
-                pc_current = i * 4
-                pc_target = obj.label_target_index * 4
-                offset = pc_target - pc_current
-                
-                # Validate offset range
-                if obj.format == 'B':
-                    # B-type: 13-bit signed, multiple of 2
-                    if abs(offset) >= 4096:
-                        offset = 4  # Fallback to small forward
-                elif obj.format == 'J':
-                    # J-type: 21-bit signed, multiple of 2
-                    if abs(offset) >= (1 << 20):
-                        offset = 4  # Fallback
-                
-                obj.imm = offset
-            
-            # Pack instruction
-            obj.raw_word = self._pack_instruction(obj)
-            obj.assembly_text = self._render_assembly(obj, label_map)
-        
-        # Generate output
-        asm_lines = []
-        for i, obj in enumerate(instrs):
-            if i in label_map:
-                asm_lines.append(f"{label_map[i]}:")
-            asm_lines.append(f"    {obj.assembly_text:<30}  # 0x{obj.raw_word:08x}")
+        self._finalize_program(program)
         
-        hex_lines = [f"{obj.raw_word:08x}" for obj in instrs]
+        # Run it on the reference ISS, patching loops that exceed the budget
+        words = program.word.tolist()
+        expected = self._simulate(words, lambda index: self._patch_fall_through(program, index), verbose)
         
         # Create manifest
-        manifest = {
+        manifest = self._make_manifest(length)
+        manifest["expected"] = expected
+        
+        # The listing and hex lines are rendered from the program when they are written
+        return {
+            "assembly": program.listing(_asm_line),
+            "hex": program.hex_lines(),
+            "manifest": manifest,
+            "instructions": program,
+            "words": words
+        }
+    
+    def generate_bulk(self, length: int, verbose: bool = True) -> Dict:
+        """Generate a complete test with the NumPy bulk engine.
+        
+        The result has the same assembly/hex/manifest entries as generate_test,
+        with the field arrays and packed words in place of instruction objects.
+        """
+        if verbose:
+            print(f"Generating {length} RV32I instructions (numpy engine)...")
+        if self._bulk is None:
+            self._bulk = BulkEngine(self)
+        
+        fields = self._bulk.sample(length, self.seed_used)
+        words = self._bulk.pack(fields)
+        
+        def patch(index: int) -> int:
+            self._bulk.fall_through(fields, index)
+            meta = self.metadata[fields['mnemonic'][index]]
+            rd, rs1, rs2, imm = (int(fields[name][index]) for name in ['rd', 'rs1', 'rs2', 'imm'])
+            return pack_fields(self.encodings[meta['mnemonic']], rd, rs1, rs2, imm, None)
+        
+        expected = self._simulate(words.tolist(), patch, verbose)
+        if expected['patched_loops']:
+            words = self._bulk.pack(fields)
+        self.backward_branch_count = fields['backward_branches']
+        manifest = self._make_manifest(length)
+        manifest["expected"] = expected
+        
+        return {
+            "assembly": self._bulk.render(fields, words),
+            "hex": hex_words(words),
+            "manifest": manifest,
+            "fields": fields,
+            "words": words
+        }
+    
+    def _dynamic_budget(self, length: int) -> int:
+        """Most instructions a test may execute: loops.max_dynamic_multiplier x its length."""
+        return int(self.plan.max_dynamic_multiplier * length)
+    
+    def _simulate(self, words: List[int], patch, verbose: bool = False) -> Dict:
+        """Run a finished program on the reference ISS and return its expected final state.
+        
+        The ISS stops at FENCE, ECALL and EBREAK like CPU_pipelined. While the
+        program runs past the dynamic budget, its most-taken backward branch or
+        jump is re-encoded to fall through; patch(index) does that and returns
+        the new word. words is updated in place.
+        """
+        budget = self._dynamic_budget(len(words))
+        patched = []
+        sim = RV32ISim(words, halt_on_fence=True)
+        while True:
+            # Tally the backward edges as it goes, to see which ones a run that hits the budget kept taking
+            counts = {}
+            result = sim.run(budget, counts=counts)
+            if result.reason != 'step_limit':
+                break
+            index = max(counts, key=counts.get) >> 2
+            words[index] = patch(index)
+            sim.patch(index, words[index])
+            sim.reset()
+            patched.append(index)
+        
+        # Replay the final run once more to see where its loads and stores went and what it forwarded
+        sim.reset()
+        profile = sim.profile(result.steps, self.plan.memory_regions, len(HAZARD_DISTANCES))
+        return self._expected(result, budget, patched, profile, verbose)
+    
+    def _expected(self, result: SimResult, budget: int, patched: List[int], profile: RunProfile,
+                  verbose: bool = False) -> Dict:
+        """Manifest 'expected' entry of a finished run and the profile of its instructions."""
+        hazards = _hazard_counts(profile.raw, profile.waw, profile.load_use, profile.steps)
+        if verbose:
+            print(f"Simulated: {result.reason} after {result.steps} instructions (budget {budget}), "
+                  f"{len(patched)} loop(s) patched")
+            if profile.accesses:
+                print(f"Memory ops: {profile.useful}/{profile.accesses} executed loads/stores hit the memory map "
+                      f"({100 * profile.useful / profile.accesses:.1f}%)")
+            print(_format_hazards(hazards))
+        return {
+            "model": "rv32i_iss",
+            "stop": result.reason,
+            "pc": f"0x{result.pc:08x}",
+            "dynamic_instructions": result.steps,
+            "dynamic_budget": budget,
+            "patched_loops": patched,
+            "regs": {f"x{i}": f"0x{v:08x}" for i, v in enumerate(result.regs) if i},
+            "memory": {f"0x{addr:08x}": f"0x{word:08x}" for addr, word in result.memory.items()},
+            "memory_ops": {"executed": profile.accesses, "useful": profile.useful},
+            "hazards": hazards,
+            "signature": state_signature(result.regs, result.memory)
+        }
+    
+    def _patch_fall_through(self, instrs: Program, index: int) -> int:
+        """Re-encode the branch or jump at index to continue with the next instruction.
+        
+        JALR becomes JAL to the next instruction, which keeps its link write;
+        the last instruction becomes a self-loop, the end-of-test idiom.
+        """
+        obj = instrs[index]
+        if obj.label_target_index is not None and obj.label_target_index < index:
+            self.backward_branch_count -= 1
+        if obj.mnemonic == 'JALR':
+            obj.metadata = self._jal_meta
+            obj.rs1 = None
+        obj.label_target_index = min(index + 1, len(instrs) - 1)
+        self._finalize_instruction(obj, index)
+        return obj.raw_word
+    
+    def _finalize_instruction(self, obj: InstructionView, index: int):
+        """Resolve the label offset of one instruction, then pack it (assembly is rendered on demand)."""
+        if obj.label_target_index is not None:
+            pc_current = index * 4
+            pc_target = obj.label_target_index * 4
+            offset = pc_target - pc_current
+            
+            # Validate offset range
+            if obj.format == 'B':
+                # B-type: 13-bit signed, multiple of 2
+                if abs(offset) >= 4096:
+                    offset = 4  # Fallback to small forward
+            elif obj.format == 'J':
+                # J-type: 21-bit signed, multiple of 2
+                if abs(offset) >= (1 << 20):
+                    offset = 4  # Fallback
+            
+            obj.imm = offset
+        
+        # Pack instruction
+        obj.raw_word = self._pack_instruction(obj)
+    
+    def _finalize_program(self, program: Program, stop: Optional[int] = None):
+        """_finalize_instruction() for every row held before stop, vectorized when NumPy is installed."""
+        stop = len(program) if stop is None else stop
+        if np is None:
+            for index in range(program.base, stop):
+                self._finalize_instruction(program[index], index)
+            return
+        count = stop - program.base
+        target = program.column('target')[:count]
+        sites = np.flatnonzero(target >= 0)
+        offset = (target[sites].astype(np.int64) - sites - program.base) * 4
+        offset[np.abs(offset) >= self._offset_limits[program.column('op')[sites]]] = 4  # Fallback to small forward
+        program.column('imm')[sites] = offset
+        program.column('word')[:count] = pack_program(**program.field_arrays(self.encodings, stop))
+    
+    def _make_manifest(self, length: int) -> Dict:
+        """Create the manifest of the test being generated."""
+        return {
             "generator": "RV32I Random Test Generator",
             "version": "1.0",
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "seed": self.seed_used,
+            "engine": self.engine,
             "length": length,
             "weights": self.config['weights'],
-            "backward_branches": self.backward_branch_count
+            "backward_branches": self.backward_branch_count,
+            **({"directed": self.bias.to_dict()} if self.bias is not None else {})
         }
+    
+    def _label_window(self) -> int:
+        """Largest branch/jump distance in instructions, i.e. the label lookahead window."""
+        return max(self.plan.branch_max_dist.values())
+    
+    def generate_stream(self, length: int, tests_dir: str, name: str,
+                        buffer_size: int = 1 << 20, verbose: bool = True) -> Dict:
+        """Generate a test and write .S/.hex/.bin incrementally in constant memory.
         
-        return {
-            "assembly": asm_lines,
-            "hex": hex_lines,
-            "manifest": manifest,
-            "instructions": instrs
+        Branch targets are never further than the configured far distance, so only
+        that many instructions are held back to receive backward labels. The ISS
+        runs each chunk before it is written and patches loops as it goes (see
+        rv32i_iss.WindowSim). The run stays within the dynamic budget and
+        'expected' is that of the written program run from reset, but a loop may
+        be patched at a different branch than generate_test() picks. With the
+        same patches the output is that of generate_test() + write_test_outputs()
+        for the same seed.
+        """
+        if verbose:
+            print(f"Streaming {length} RV32I instructions...")
+        
+        # Same reset as generate_test so both paths draw identical sequences
+        self.rng = self._make_rng(self.seed_used)
+        self.backward_branch_count = 0
+        self._scoreboard.clear()
+        self._system_counts.clear()
+        self._held_system.clear()
+        self._reset_values()
+        
+        manifest = self._make_manifest(length)
+        manifest["stream"] = True  # Loops are patched online, so --replay must stream too
+        files = {
+            "asm": os.path.join(tests_dir, f"{name}.S"),
+            "hex": os.path.join(tests_dir, f"{name}.hex"),
+            "bin": os.path.join(tests_dir, f"{name}.bin"),
+            "manifest": os.path.join(tests_dir, f"{name}_manifest.json")
         }
+        window_size = self._label_window() + 1
+        chunk = max(window_size, 4096)
+        labels = Counter()  # Branches and jumps per label target that has not been written yet
+        # Rows are final once they are out of reach of labels and value tracking; the
+        # ISS then runs them, and they are written and dropped a chunk at a time once
+        # no loop can branch back to them
+        program = self.program = Program(self.metadata)
+        window = len(HAZARD_DISTANCES)
+        result = None  # Set once the run is over
+        unlooped = 0   # Backward branches patched away, left out of backward_branch_count until the end
+        
+        def patch(index: int) -> int:
+            nonlocal unlooped
+            old = program[index].label_target_index
+            count = self.backward_branch_count
+            word = self._patch_fall_through(program, index)
+            # Generation draws against the unpatched count, as in generate_test
+            unlooped += count - self.backward_branch_count
+            self.backward_branch_count = count
+            if old is not None and old >= program.base:
+                labels[old] -= 1
+                if not labels[old]:
+                    del labels[old]
+            labels[program[index].label_target_index] += 1
+            return word
+        
+        sim = WindowSim(length, self._dynamic_budget(length), patch, halt_on_fence=True,
+                        profile=RunProfile([0] * window, [0] * window, recent=[0] * window),
+                        regions=self.plan.memory_regions)
+        
+        with open(files["asm"], 'w', buffering=buffer_size) as asm_f, \
+             open(files["hex"], 'w', buffering=buffer_size) as hex_f, \
+             open(files["bin"], 'wb', buffering=buffer_size) as bin_f:
+            asm_f.write(_asm_header(manifest))
+            
+            def flush(stop: int):
+                nonlocal result
+                self._finalize_program(program, stop)
+                if result is None:
+                    sim.extend(program.word[sim.end - program.base:stop - program.base])
+                    result = sim.advance()
+                # While the run goes on, a backward branch from stop on may still reach window_size rows back
+                written = stop if result is not None else stop - window_size
+                asm_f.writelines(line + '\n' for line in program.listing(_asm_line, written, labels))
+                words = program.word[:written - program.base]
+                hex_f.write("".join(f"{w:08x}\n" for w in words))
+                bin_f.write(to_bytes(words))
+                for index in range(program.base, written):
+                    labels.pop(index, None)
+                program.trim(written)
+                sim.drop(written)
+            
+            prev = None
+            for i in range(length):
+                prev = self.generate_instruction(i, length, prev)
+                if prev.label_target_index is not None:
+                    labels[prev.label_target_index] += 1
+                if i + 1 - program.base >= 2 * window_size + chunk:
+                    flush(i + 1 - window_size)
+            flush(length)
+            manifest["expected"] = self._expected(result, sim.budget, sim.patched, sim.profile, verbose)
+            asm_f.write(_asm_trailer(manifest))
+        
+        self.backward_branch_count -= unlooped
+        manifest["backward_branches"] = self.backward_branch_count
+        with open(files["manifest"], 'w') as f:
+            json.dump(manifest, f, indent=2)
+        
+        if verbose:
+            for kind, path in files.items():
+                print(f"{kind.capitalize()} written to: {path}")
+        return {"manifest": manifest, "files": files}
+    
+    def run_campaign(self, num_tests: int, length: int, workers: int = 1,
+                     tests_dir: str = "tests", prefix: str = "campaign",
+                     campaign_seed: Optional[int] = None, verbose: bool = True,
+                     formats: List[str] = DEFAULT_FORMATS, depth: int = IMEM_DEPTH,
+                     coverage: bool = False, saturate: int = 0, directed: int = 0,
+                     target: Optional[float] = None, prior: Optional[Dict] = None) -> Dict:
+        """Generate num_tests programs across a process pool and write a consolidated index.
+        
+        With coverage, every test's coverage bitmap is merged into
+        <prefix>_coverage.json and each index entry records how many bins it
+        hit first. saturate > 0 ends the campaign early once that many
+        consecutive tests have added no new bin, target once the given coverage
+        percentage is reached. directed > 0 generates in batches of that many
+        tests, each biased towards the bins still unhit after the previous
+        ones. prior is a coverage file (Coverage.to_dict()) to start from. All
+        of these imply coverage.
+        """
+        if campaign_seed is None:
+            campaign_seed = (int(time.time_ns()) ^ os.getpid()) & 0xFFFFFFFFFFFFFFFF
+        if directed and self.engine != 'python':
+            raise ValueError("Coverage-directed generation needs the python engine")
+        os.makedirs(tests_dir, exist_ok=True)
+        staged = bool(saturate or directed or target)  # Needs coverage while the campaign runs
+        coverage = coverage or staged or prior is not None
+        
+        # Small shards keep workers balanced; every test's seed depends only on
+        # (campaign_seed, index), so undirected results do not change with the worker count
+        shard_size = max(1, min(64, (directed or num_tests) // (workers * 4) or 1))
+        shards = [(start, min(start + shard_size, num_tests), length, campaign_seed, tests_dir, prefix,
+                   formats, depth, coverage, None)
+                  for start in range(0, num_tests, shard_size)]
+        
+        start_time = time.perf_counter()
+        entries = []
+        collected = None
+        if coverage:
+            collected = Coverage.from_dict(self.coverage_model(), prior) if prior else Coverage(self.coverage_model())
+        saturated_at = reached_at = None
+        stale = 0  # Consecutive tests without a new bin
+        batches = []  # Coverage after each directed batch
+        
+        def merge(shard_entries: List[Dict]):
+            """Merge coverage in test order and note saturation and the target."""
+            nonlocal saturated_at, reached_at, stale
+            for entry in shard_entries:
+                entry['new_bins'] = collected.add(entry.pop('coverage'))
+                stale = 0 if entry['new_bins'] else stale + 1
+                if saturate and saturated_at is None and stale >= saturate:
+                    saturated_at = entry['index']
+                if target and reached_at is None and collected.percent >= target:
+                    reached_at = entry['index']
+        
+        pool = multiprocessing.Pool(workers, initializer=_campaign_worker_init, initargs=(self,)) \
+            if workers > 1 else None
+        if pool is None:
+            _campaign_worker_init(self)
+        try:
+            if not staged:
+                for shard_entries in (pool.imap_unordered(_campaign_worker_run, shards) if pool
+                                      else map(_campaign_worker_run, shards)):
+                    entries.extend(shard_entries)
+            else:
+                # Waves of one shard per worker (or one directed batch), so nothing far past
+                # the stopping point is generated and each batch sees the coverage before it
+                step = -(-directed // shard_size) if directed else workers
+                for wave in range(0, len(shards), step):
+                    group = shards[wave:wave + step]
+                    if directed:
+                        bias = CoverageBias.from_coverage(collected, self.mnemonic_probabilities())
+                        group = [shard[:-1] + (bias,) for shard in group]
+                    for shard_entries in (pool.map(_campaign_worker_run, group) if pool
+                                          else map(_campaign_worker_run, group)):
+                        entries.extend(shard_entries)
+                        merge(shard_entries)
+                        if pool is None and (saturated_at is not None or reached_at is not None):
+                            break
+                    if directed:
+                        batches.append({"tests": len(entries), "covered": collected.covered})
+                    if saturated_at is not None or reached_at is not None:
+                        break
+        finally:
+            if pool is not None:
+                pool.terminate()
+            else:
+                self.bias = None  # Set per shard by _campaign_worker_run
+        elapsed = time.perf_counter() - start_time
+        entries.sort(key=lambda e: e['index'])
+        if coverage and not staged:
+            merge(entries)
+        
+        index = {
+            "generator": "RV32I Random Test Generator",
+            "version": "1.0",
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "campaign_seed": campaign_seed,
+            "num_tests": len(entries),  # Fewer than requested when coverage stopped the campaign
+            "length": length,
+            "workers": workers,
+            "elapsed_seconds": round(elapsed, 3),
+            "programs_per_sec": round(len(entries) / elapsed, 2) if elapsed > 0 else None,
+            "instructions_per_sec": round(len(entries) * length / elapsed, 2) if elapsed > 0 else None,
+            "weights": self.config['weights'],
+            "memory_ops": _memory_ops_summary(entries),
+            "hazards": _hazard_summary(entries),
+            "tests": entries
+        }
+        if coverage:
+            coverage_file = os.path.join(tests_dir, f"{prefix}_coverage.json")
+            with open(coverage_file, 'w') as f:
+                json.dump(collected.to_dict(), f, indent=2)
+            index["coverage"] = {"bins": len(collected.model), "covered": collected.covered,
+                                 "percent": round(collected.percent, 2), "saturated_at": saturated_at,
+                                 "target": target, "target_reached_at": reached_at,
+                                 "directed_batch": directed, "file": coverage_file}
+            if directed:
+                index["coverage"]["batches"] = batches
+        index_file = os.path.join(tests_dir, f"{prefix}_index.json")
+        with open(index_file, 'w') as f:
+            json.dump(index, f, indent=2)
+        
+        if verbose:
+            print(f"Campaign: {index['num_tests']} tests x {length} instructions with {workers} worker(s) "
+                  f"in {elapsed:.2f}s ({index['programs_per_sec']} programs/s, "
+                  f"{index['instructions_per_sec']} instructions/s)")
+            memory_ops = index['memory_ops']
+            if memory_ops['executed']:
+                print(f"Memory ops: {memory_ops['useful']}/{memory_ops['executed']} executed loads/stores "
+                      f"hit the memory map ({memory_ops['useful_percent']}%)")
+            print(_format_hazards(index['hazards']))
+            if coverage:
+                if saturated_at is not None:
+                    print(f"Coverage saturated: no new bins in the {saturate} tests up to test {saturated_at}")
+                if reached_at is not None:
+                    print(f"Target coverage {target}% reached at test {reached_at}")
+                print(format_report(collected, limit=20))
+                print(f"Coverage written to: {coverage_file}")
+            print(f"Index written to: {index_file}")
+        return index
+    
+    def coverage_model(self) -> CoverageModel:
+        """Coverage model of this generator's metadata and config, built on first use."""
+        if self._coverage_model is None:
+            self._coverage_model = CoverageModel(self.metadata, self.plan)
+        return self._coverage_model
+
+
+def campaign_test_seed(campaign_seed: int, index: int) -> int:
+    """Derive the seed of test `index` in a campaign (splitmix64 mix)."""
+    z = (campaign_seed + (index + 1) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return z ^ (z >> 31)
+
+
+def _memory_ops_summary(entries: List[Dict]) -> Dict:
+    """Executed and useful loads/stores summed over a campaign's tests."""
+    executed = sum(entry['memory_ops']['executed'] for entry in entries)
+    useful = sum(entry['memory_ops']['useful'] for entry in entries)
+    return {"executed": executed, "useful": useful,
+            "useful_percent": round(100 * useful / executed, 2) if executed else None}
+
+
+def _hazard_counts(raw: List[int], waw: List[int], load_use: int, steps: int) -> Dict:
+    """Manifest form of executed RAW/WAW hazards by distance."""
+    return {"raw": dict(zip(HAZARD_DISTANCES, raw)), "waw": dict(zip(HAZARD_DISTANCES, waw)),
+            "load_use": load_use, "instructions": steps,
+            "per_100": round(100 * (sum(raw) + sum(waw)) / steps, 2) if steps else 0.0}
+
+
+def _hazard_summary(entries: List[Dict]) -> Dict:
+    """Executed hazards summed over a campaign's tests."""
+    hazards = [entry['hazards'] for entry in entries]
+    return _hazard_counts([sum(h['raw'][d] for h in hazards) for d in HAZARD_DISTANCES],
+                          [sum(h['waw'][d] for h in hazards) for d in HAZARD_DISTANCES],
+                          sum(h['load_use'] for h in hazards), sum(h['instructions'] for h in hazards))
+
+
+def _format_hazards(hazards: Dict) -> str:
+    """One-line report of _hazard_counts()."""
+    by_distance = lambda counts: "/".join(str(counts[d]) for d in HAZARD_DISTANCES)
+    return (f"Hazards: {hazards['per_100']} per 100 instructions; RAW at distance "
+            f"{'/'.join(HAZARD_DISTANCES)}: {by_distance(hazards['raw'])} ({hazards['load_use']} load-use), "
+            f"WAW: {by_distance(hazards['waw'])}")
+
+
+_campaign_generator: Optional[RV32IGenerator] = None
+
+
+def _campaign_worker_init(generator: RV32IGenerator):
+    """Keep one generator per worker so metadata/config are loaded once, not per test."""
+    global _campaign_generator
+    _campaign_generator = generator
+
+
+def _campaign_worker_run(shard: Tuple) -> List[Dict]:
+    """Generate and write the tests of one shard of the campaign index range."""
+    start, stop, length, campaign_seed, tests_dir, prefix, formats, depth, coverage, bias = shard
+    _campaign_generator.bias = bias
+    entries = []
+    for i in range(start, stop):
+        seed = campaign_test_seed(campaign_seed, i)
+        _campaign_generator.reseed(seed)
+        result = _campaign_generator.generate_test(length, verbose=False)
+        name = f"{prefix}_{i:06d}"
+        files = write_test_outputs(result, tests_dir, name, verbose=False, formats=formats, depth=depth)
+        entries.append({
+            "index": i,
+            "name": name,
+            "seed": seed,
+            "backward_branches": result['manifest']['backward_branches'],
+            "signature": result['manifest']['expected']['signature'],
+            "memory_ops": result['manifest']['expected']['memory_ops'],
+            "hazards": result['manifest']['expected']['hazards'],
+            "files": files
+        })
+        if coverage:
+            # Packed bitmap; the parent merges it in test order and drops it from the entry
+            entries[-1]["coverage"] = _campaign_generator.coverage_model().bitmap(result['words'])
+    return entries
+
 
+_ASM_TRAILER = "\n# End of test\n"
+
+
+def _asm_line(text: str, word: int) -> str:
+    """One instruction line of the .S listing."""
+    return f"    {text:<30}  # 0x{word:08x}"
+
+
+def _asm_trailer(manifest: Dict) -> str:
+    """Trailer of a generated .S file, listing the expected final state when the test was simulated."""
+    expected = manifest.get('expected')
+    if not expected:
+        return _ASM_TRAILER
+    regs = [f"{name:<3} = {value}" for name, value in expected['regs'].items()]
+    lines = [f"# Expected final state: {expected['stop']} at pc {expected['pc']} "
+             f"after {expected['dynamic_instructions']} instructions"]
+    lines += ["#   " + "  ".join(regs[i:i + 4]) for i in range(0, len(regs), 4)]
+    lines += [f"#   mem[{addr}] = {word}" for addr, word in expected['memory'].items()]
+    lines.append(f"# Signature: {expected['signature']}")
+    return "\n" + "\n".join(lines) + "\n# End of test\n"
+
+
+def _asm_header(manifest: Dict) -> str:
+    """Header of a generated .S file."""
+    return ("# Auto-generated RISC-V RV32I test\n"
+            f"# Generated: {manifest['timestamp']}\n"
+            f"# Seed: {manifest['seed']}\n"
+            f"# Instructions: {manifest['length']}\n\n"
+            ".text\n"
+            ".globl _start\n"
+            "_start:\n")
+
+
+def write_test_outputs(result: Dict, tests_dir: str, name: str, verbose: bool = True,
+                       formats: List[str] = DEFAULT_FORMATS, depth: int = IMEM_DEPTH) -> Dict[str, str]:
+    """Write the .S listing, the requested binary/image formats and the manifest of one test."""
+    # Write assembly file
+    asm_file = os.path.join(tests_dir, f"{name}.S")
+    with open(asm_file, 'w') as f:
+        f.write(_asm_header(result['manifest']))
+        listing = "\n".join(result['assembly'])
+        f.write(listing + "\n" if listing else "")
+        f.write(_asm_trailer(result['manifest']))
+    
+    # Binary and memory images, all from the packed words
+    images = write_images(result['words'], os.path.join(tests_dir, name), formats, depth)
+    
+    # Write manifest
+    manifest_file = os.path.join(tests_dir, f"{name}_manifest.json")
+    with open(manifest_file, 'w') as f:
+        json.dump(result['manifest'], f, indent=2)
+    
+    files = {"asm": asm_file, **images, "manifest": manifest_file}
+    if verbose:
+        for kind, path in files.items():
+            print(f"{kind.capitalize()} written to: {', '.join(path) if isinstance(path, list) else path}")
+    return files
+
+def benchmark_packing(gen: RV32IGenerator, length: int, repeats: int = 5):
+    """Time the scalar packer against the vectorized one and check they agree bit for bit."""
+    instrs = gen.generate_test(length, verbose=False)['instructions']
+    
+    def best_of(fn) -> float:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+    
+    scalar_words = [gen._pack_instruction(obj) for obj in instrs]
+    rows = [("scalar", best_of(lambda: [gen._pack_instruction(obj) for obj in instrs]))]
+    if np is None:
+        print("NumPy not installed; only the scalar packer is available.")
+    else:
+        arrays = instrs.field_arrays(gen.encodings)
+        if pack_program(**arrays).tolist() != scalar_words:
+            raise AssertionError("vectorized packer disagrees with the scalar packer")
+        rows.append(("vectorized (gather + pack)", best_of(lambda: gen.pack_program(instrs))))
+        rows.append(("vectorized (pack only)", best_of(lambda: pack_program(**arrays))))
+    
+    print(f"{'packer':<27} {'ms':>9} {'Minstr/s':>9}")
+    for label, seconds in rows:
+        print(f"{label:<27} {seconds * 1000:9.2f} {length / seconds / 1e6:9.2f}")
+
+def benchmark_memory(gen: RV32IGenerator, length: int):
+    """Compare bytes per instruction of a Program with one InstructionObject per instruction."""
+    def retained(build) -> Tuple[object, int]:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            value = build()
+            gc.collect()
+            return value, tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+    
+    start = time.perf_counter()
+    program = gen.generate_test(length, verbose=False)['instructions']
+    elapsed = time.perf_counter() - start
+    program, program_bytes = retained(lambda: gen.generate_test(length, verbose=False)['instructions'])
+    objects, object_bytes = retained(lambda: [view.to_object() for view in program])
+    if [obj.raw_word for obj in objects] != program.word.tolist():
+        raise AssertionError("instruction objects disagree with the program arrays")
+    
+    print(f"{'representation':<27} {'bytes/instr':>11} {'MB':>8}")
+    print(f"{'InstructionObject list':<27} {object_bytes / length:11.1f} {object_bytes / 1e6:8.2f}")
+    print(f"{'Program (typed arrays)':<27} {program_bytes / length:11.1f} {program_bytes / 1e6:8.2f}")
+    print(f"Field arrays alone: {program.nbytes / length:.1f} bytes/instr; "
+          f"generate_test: {elapsed * 1000:.1f} ms ({length / elapsed / 1e6:.2f} Minstr/s)")
+
+def benchmark_engines(gen: RV32IGenerator, length: int, repeats: int = 3):
+    """Compare instructions/sec of the per-instruction and bulk engines."""
+    def best_of(fn) -> float:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+    
+    # A full test includes writing it out: the python engine renders its listing only then
+    engine = gen.engine
+    scratch = tempfile.TemporaryDirectory()
+    
+    def generate(name: str) -> Dict:
+        gen.engine = name
+        return gen.generate_test(length, verbose=False)
+    
+    def full_test(name: str):
+        write_test_outputs(generate(name), scratch.name, "bench", verbose=False)
+    
+    rows = [("python: generate", best_of(lambda: generate('python'))),
+            ("python: full test", best_of(lambda: full_test('python')))]
+    if np is None:
+        print("NumPy not installed; only the python engine is available.")
+    else:
+        bulk = BulkEngine(gen)
+        rows.append(("numpy: sample + hazards", best_of(lambda: bulk.sample(length, gen.seed_used))))
+        rows.append(("numpy: + pack", best_of(lambda: bulk.pack(bulk.sample(length, gen.seed_used)))))
+        rows.append(("numpy: generate", best_of(lambda: generate('numpy'))))
+        rows.append(("numpy: full test", best_of(lambda: full_test('numpy'))))
+    gen.engine = engine
+    scratch.cleanup()
+    
+    print(f"{'engine / stage':<25} {'ms':>9} {'Minstr/s':>9}")
+    for label, seconds in rows:
+        print(f"{label:<25} {seconds * 1000:9.2f} {length / seconds / 1e6:9.2f}")
 
 def main():
     """Main entry point."""
@@ -477,59 +1259,140 @@ def main():
                        help='Number of instructions to generate (default: 100)')
     parser.add_argument('-o', '--output', type=str, default='test',
                        help='Output file prefix (default: test)')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='Integer seed for reproducible output (default: time/PID mix)')
+    parser.add_argument('--replay', type=str, default=None, metavar='MANIFEST',
+                       help='Regenerate the test described by a manifest (uses its seed and length)')
+    parser.add_argument('--stream', action='store_true',
+                       help='Write outputs incrementally in constant memory (for very long programs)')
+    parser.add_argument('--campaign', type=int, default=0, metavar='N',
+                       help='Generate N tests as a regression campaign (default: single test)')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1,
+                       help='Worker processes for campaign mode (default: CPU count)')
+    parser.add_argument('--campaign-seed', type=int, default=None,
+                       help='Base seed of the campaign (default: time/PID mix)')
+    parser.add_argument('--scaling', action='store_true',
+                       help='Report campaign throughput for 1, 2, 4, ... up to --workers processes')
+    parser.add_argument('--coverage', action='store_true',
+                       help='Collect functional coverage of the campaign into <prefix>_coverage.json')
+    parser.add_argument('--saturate', type=int, default=0, metavar='N',
+                       help='Stop the campaign once N consecutive tests add no coverage bin (implies --coverage)')
+    parser.add_argument('--directed', type=int, default=0, metavar='BATCH',
+                       help='Coverage-directed campaign: bias each batch of BATCH tests towards unhit bins')
+    parser.add_argument('--target-coverage', type=float, default=None, metavar='PCT',
+                       help='Stop the campaign once coverage reaches PCT percent (implies --coverage)')
+    parser.add_argument('--coverage-from', type=str, default=None, metavar='FILE',
+                       help='Start from the coverage accumulated in a previous <prefix>_coverage.json')
+    parser.add_argument('--bench-pack', action='store_true',
+                       help='Benchmark scalar vs vectorized packing on an -n instruction program')
+    parser.add_argument('--bench-memory', action='store_true',
+                       help='Measure memory per instruction of an -n instruction program, arrays vs objects')
+    parser.add_argument('--engine', choices=RV32IGenerator.ENGINES, default='python',
+                       help='Sampling engine: per-instruction (python) or bulk arrays (numpy)')
+    parser.add_argument('--bench-engines', action='store_true',
+                       help='Compare instructions/sec of both engines on an -n instruction test')
+    parser.add_argument('--config', type=str, default='config_defaults.json',
+                       help='Generator config JSON (default: config_defaults.json)')
+    parser.add_argument('--check-config', action='store_true',
+                       help='Validate the config, list keys that have no effect, and exit')
+    parser.add_argument('--formats', type=str, default=','.join(DEFAULT_FORMATS),
+                       help=f"Comma-separated output formats from {','.join(FORMATS)} "
+                            "(default: %(default)s; the .S listing and manifest are always written)")
+    parser.add_argument('--imem-depth', type=int, default=IMEM_DEPTH,
+                       help='Words per memh/memb/coe/mem image; longer programs are split (default: %(default)s)')
     
     args = parser.parse_args()
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(FORMATS)}")
     
     # Create tests directory if it doesn't exist
     tests_dir = "tests"
     os.makedirs(tests_dir, exist_ok=True)
     
+    if args.replay:
+        with open(args.replay, 'r') as f:
+            replay_manifest = json.load(f)
+        if not isinstance(replay_manifest.get('seed'), int):
+            parser.error(f"{args.replay} has no integer seed; it predates reproducible seeding")
+        args.seed = replay_manifest['seed']
+        args.num_instructions = replay_manifest['length']
+        args.engine = replay_manifest.get('engine', 'python')
+        args.stream = args.stream or replay_manifest.get('stream', False)
+        replay_bias = replay_manifest.get('directed')
+    
     # Create generator
-    gen = RV32IGenerator()
+    try:
+        gen = RV32IGenerator(config_path=args.config, seed=args.seed, engine=args.engine)
+        if args.engine == 'numpy' and np is not None:
+            gen._bulk = BulkEngine(gen)  # Built up front, so a config it cannot follow is reported here
+    except (ConfigError, ValueError) as e:
+        parser.error(str(e))
     
-    # Generate test
-    result = gen.generate_test(args.num_instructions)
+    if args.replay and replay_bias:
+        gen.bias = CoverageBias.from_dict(replay_bias)
     
-    # Write assembly file
-    asm_file = os.path.join(tests_dir, f"{args.output}.S")
-    with open(asm_file, 'w') as f:
-        f.write("# Auto-generated RISC-V RV32I test\n")
-        f.write(f"# Generated: {result['manifest']['timestamp']}\n")
-        f.write(f"# Seed: {result['manifest']['seed']}\n")
-        f.write(f"# Instructions: {result['manifest']['length']}\n\n")
-        f.write(".text\n")
-        f.write(".globl _start\n")
-        f.write("_start:\n")
-        for line in result['assembly']:
-            f.write(line + '\n')
-        f.write("\n# End of test\n")
-    
-    print(f"Assembly written to: {asm_file}")
-    
-    # Write hex file
-    hex_file = os.path.join(tests_dir, f"{args.output}.hex")
-    with open(hex_file, 'w') as f:
-        for line in result['hex']:
-            f.write(line + '\n')
-    
-    print(f"Hex written to: {hex_file}")
-    
-    # Write binary file
-    bin_file = os.path.join(tests_dir, f"{args.output}.bin")
-    with open(bin_file, 'w') as f:
-        for hex_word in result['hex']:
-            word = int(hex_word, 16)
-            binary = format(word, '032b')
-            f.write(binary + '\n')
-    
-    print(f"Binary written to: {bin_file}")
+    if args.check_config:
+        print(f"{args.config}: valid")
+        for warning in gen.plan.warnings:
+            print(f"  warning: {warning}")
+        return
+    if gen.plan.warnings:
+        print(f"Note: {len(gen.plan.warnings)} config keys have no effect (see --check-config)")
     
-    # Write manifest
-    manifest_file = os.path.join(tests_dir, f"{args.output}_manifest.json")
-    with open(manifest_file, 'w') as f:
-        json.dump(result['manifest'], f, indent=2)
+    if args.bench_engines:
+        benchmark_engines(gen, args.num_instructions)
+        return
+    
+    if args.bench_pack:
+        benchmark_packing(gen, args.num_instructions)
+        return
+    
+    if args.bench_memory:
+        benchmark_memory(gen, args.num_instructions)
+        return
+    
+    if args.campaign:
+        if args.scaling:
+            counts = []
+            w = 1
+            while w < args.workers:
+                counts.append(w)
+                w *= 2
+            counts.append(args.workers)
+            print(f"{'workers':>7} {'programs/s':>11} {'instructions/s':>15}")
+            for w in counts:
+                index = gen.run_campaign(args.campaign, args.num_instructions, w, tests_dir,
+                                         args.output, args.campaign_seed, verbose=False,
+                                         formats=formats, depth=args.imem_depth)
+                print(f"{w:>7} {index['programs_per_sec']:>11} {index['instructions_per_sec']:>15}")
+        else:
+            prior = None
+            if args.coverage_from:
+                with open(args.coverage_from, 'r') as f:
+                    prior = json.load(f)
+            if args.directed and args.engine != 'python':
+                parser.error("--directed biases the per-instruction sampler; use --engine python")
+            gen.run_campaign(args.campaign, args.num_instructions, args.workers, tests_dir,
+                             args.output, args.campaign_seed, formats=formats, depth=args.imem_depth,
+                             coverage=args.coverage, saturate=args.saturate, directed=args.directed,
+                             target=args.target_coverage, prior=prior)
+        return
+    
+    if args.stream:
+        if args.engine != 'python':
+            parser.error("--stream generates instruction by instruction; use --engine python")
+        if not set(formats) <= {'hex', 'bin'}:
+            parser.error("--stream writes only the hex and bin formats")
+        gen.generate_stream(args.num_instructions, tests_dir, args.output)
+        print(f"\nGeneration complete! Generated {args.num_instructions} instructions.")
+        return
+    
+    # Generate test
+    result = gen.generate_test(args.num_instructions)
     
-    print(f"Manifest written to: {manifest_file}")
+    write_test_outputs(result, tests_dir, args.output, formats=formats, depth=args.imem_depth)
     print(f"\nGeneration complete! Generated {args.num_instructions} instructions.")
 
 